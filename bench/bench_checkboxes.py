@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Micro-benchmark of the PR type checkbox scan on large PR descriptions.
+
+Compares the old per-label `re.search('.*- \\[ ?x ?\\] <text> .*')` loop with the
+compiled single pass scanner, cold and with the body hash memo warm.
+
+Usage:
+  python bench/bench_checkboxes.py [<number of bodies>] [<body size in KB>]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+from lib import checkboxes
+from lib import prstore
+
+LABEL_NAMES = {"type:bug": "Bug fix", "type:enhancement": "Enhancement", "type:experimental-feature":
+               "Experimental feature", "type:new_feature": "New feature", "type:cleanup": "Cleanup",
+               "type:breaking_change": "Breaking change"}
+
+WORDS = ['cloudstack', 'vm', 'volume', 'snapshot', 'network', 'kvm', 'xenserver', 'fix', 'the', 'a', 'of',
+         'management', 'server', 'agent', 'router', 'template', 'zone', 'pod', 'cluster', 'host']
+
+
+def make_body(size_kb, ticked):
+    lines = ['### Description', '']
+    while sum(len(l) for l in lines) < size_kb * 1024:
+        lines.append(' '.join(random.choice(WORDS) for i in range(16)))
+    lines.append('')
+    lines.append('### Types of changes')
+    for label, text in LABEL_NAMES.items():
+        mark = 'x' if label == ticked else ' '
+        lines.append('- [%s] %s (non-breaking change)' % (mark, text))
+    lines.extend(' '.join(random.choice(WORDS) for i in range(16)) for i in range(20))
+    return '\n'.join(lines)
+
+
+def old_scan(body):
+    ticked = set()
+    for label, text in LABEL_NAMES.items():
+        if re.search('.*- \\[ ?x ?\\] ' + text + ' .*', str(body), re.I):
+            ticked.add(label)
+    return frozenset(ticked)
+
+
+def timed(name, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print("%-28s %8.1f ms  %8.1f us/body" % (name, elapsed * 1000, elapsed * 1000000 / count))
+    return elapsed
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    size_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    random.seed(1)
+    labels = list(LABEL_NAMES) + [None]
+    prs = []
+    for number in range(count):
+        body = make_body(size_kb, random.choice(labels))
+        prs.append({'number': number, 'body': body, 'body_hash': prstore.body_hash(body)})
+    print("%s bodies of ~%s KB\n" % (count, size_kb))
+
+    old_results = []
+    old = timed('per-label re.search', count, lambda: old_results.extend(old_scan(pr['body']) for pr in prs))
+
+    scanner = checkboxes.CheckboxScanner(LABEL_NAMES)
+    new_results = []
+    new = timed('single pass, cold', count, lambda: new_results.extend(scanner.ticked(pr) for pr in prs))
+    warm = timed('single pass, memo warm', count, lambda: [scanner.ticked(pr) for pr in prs])
+
+    if old_results != new_results:
+        sys.exit("ERROR: scanner results differ from the per-label search")
+    print("\nspeedup cold %.1fx, warm %.0fx" % (old / new, old / max(warm, 1e-9)))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Cold start benchmark of the repo mirror (bin/lib/mirror.py).
+
+Builds a bare repo with file contents, history from before the previous release and
+a release tag, served over file:// with partial clone allowed, then populates a new
+mirror from it with each `--mirror_filter`. Reports the time, the size of the mirror
+and the commits of the release window, which must be the same for every filter.
+
+Usage:
+  bench_mirror.py [--commits=<arg>] [--files=<arg>] [--filters=<arg>] [--workdir=<arg>]
+  bench_mirror.py (-h | --help)
+Options:
+  -h --help                 Show this screen.
+  --commits=<arg>           Commits in the repo, the release is at three quarters [default: 2000].
+  --files=<arg>             Files in the tree, each commit changes a few [default: 200].
+  --filters=<arg>           Comma separated mirror filters [default: none,blob:none,tree:0].
+  --workdir=<arg>           Where the repo and the mirrors go [default: /tmp/acsn-mirror-bench].
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'bin'))
+
+BRANCH = 'main'
+RELEASE_TAG = '4.19.0.0'
+
+
+def build_repo(path, commits, files, seed=1):
+    """
+    Bare repo at `path` with `commits` commits a day apart changing a few of `files`
+    files each. Returns the release commit SHA.
+    """
+    import pygit2
+    from corpus import signature
+
+    rng = random.Random(seed)
+    shutil.rmtree(path, ignore_errors=True)
+    repo = pygit2.init_repository(path, bare=True)
+    contents = dict(('src/file%s.java' % n, os.urandom(2048)) for n in range(files))
+    start = datetime(2022, 1, 1)
+    parent = []
+    release_sha = None
+    for n in range(commits):
+        for name in rng.sample(sorted(contents), 3):
+            contents[name] = os.urandom(2048)
+        src = repo.TreeBuilder()
+        for name, data in contents.items():
+            src.insert(name.split('/')[1], repo.create_blob(data), pygit2.GIT_FILEMODE_BLOB)
+        root = repo.TreeBuilder()
+        root.insert('src', src.write(), pygit2.GIT_FILEMODE_TREE)
+        sig = signature(start + timedelta(days=n))
+        parent = [repo.create_commit(None, sig, sig, 'Change %s (#%s)\n' % (n, n), root.write(), parent)]
+        if n == commits * 3 // 4:
+            release_sha = str(parent[0])
+            repo.create_tag(RELEASE_TAG, parent[0], pygit2.GIT_OBJECT_COMMIT, sig, RELEASE_TAG)
+    repo.create_reference('refs/heads/' + BRANCH, parent[0], force=True)
+    repo.set_head('refs/heads/' + BRANCH)
+    for name, value in (('uploadpack.allowfilter', 'true'), ('uploadpack.allowanysha1inwant', 'true')):
+        subprocess.run(['git', '--git-dir', path, 'config', name, value], check=True)
+    subprocess.run(['git', '--git-dir', path, 'gc', '--quiet'], check=True)
+    return release_sha
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(path) for name in names)
+
+
+def main():
+    import docopt
+    from lib import mirror
+    from lib import processors
+
+    args = docopt.docopt(__doc__)
+    workdir = args['--workdir']
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    repo_dir = os.path.join(workdir, 'repo.git')
+    print("Building a %s commit repo in %s" % (args['--commits'], repo_dir))
+    release_sha = build_repo(repo_dir, int(args['--commits']), int(args['--files']))
+
+    results = []
+    for object_filter in args['--filters'].split(','):
+        mirror_dir = os.path.join(workdir, 'mirror-' + object_filter.replace(':', ''))
+        shutil.rmtree(mirror_dir, ignore_errors=True)
+        started = time.time()
+        mirror_repo = mirror.ensure_mirror('file://' + repo_dir, mirror_dir, BRANCH, release=release_sha,
+                                           object_filter=None if object_filter == 'none' else object_filter)
+        seconds = time.time() - started
+        window = [commit['hash'] for commit in processors.walk_commits(mirror_repo, BRANCH, release_sha)]
+        results.append((object_filter, seconds, dir_size(mirror_dir), len(mirror.shallow_commits(mirror_dir)),
+                        window))
+
+    print("\n%-10s %9s %10s %8s %8s" % ('filter', 'time', 'size', 'shallow', 'window'))
+    for object_filter, seconds, size, shallow, window in results:
+        print("%-10s %8.2fs %8.1fMB %8s %8s" % (object_filter, seconds, size / 1024.0 / 1024, shallow, len(window)))
+    if len(set(tuple(result[4]) for result in results)) > 1:
+        sys.exit("\nThe release window differs between filters")
+    print("\nThe release window is the same for every filter")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Cold start benchmark of the container entrypoint (bin/acs_entrypoint.py).
+
+Each mode is run the way the container runs it, config in the environment, against
+a local stand-in Github (lib.standin) serving a small corpus. The startup time is from
+launching the process to the run's metrics starting, which is after the imports, the
+config and the mode's own setup and before the first API call. It is measured on a
+copy of bin/ compiled ahead of time, as in the image, and on one without bytecode.
+The old two step start (create_config.py writing conf.txt, then the script) is timed
+for comparison.
+
+Usage:
+  bench_startup.py [--modes=<arg>] [--runs=<arg>] [--size=<arg>] [--workdir=<arg>] [--budget=<arg>]
+  bench_startup.py (-h | --help)
+Options:
+  -h --help                 Show this screen.
+  --modes=<arg>             Comma separated run modes [default: labels,report,combined].
+  --runs=<arg>              Runs per mode, the fastest counts [default: 5].
+  --size=<arg>              Corpus size [default: 200].
+  --workdir=<arg>           Where the corpus, the bin copies and the outputs go [default: /tmp/acsn-startup].
+  --budget=<arg>            Exit 1 when a mode's compiled startup is over this many seconds [default: 0.5].
+"""
+
+import compileall
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BIN_DIR = os.path.join(BENCH_DIR, '..', 'bin')
+sys.path.insert(0, BIN_DIR)
+
+# the file each mode writes its metrics to, under tmp_dir/docker_output
+METRICS_FILES = {'report': 'prs.metrics.json', 'combined': 'prs.metrics.json', 'labels': 'labels.metrics.json',
+                 'daemon': 'prs.metrics.json'}
+
+
+def copy_bin(workdir, name, compiled):
+    """
+    A copy of bin/ without any bytecode, compiled ahead of time if `compiled`
+    """
+    target = os.path.join(workdir, name)
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(BIN_DIR, target, ignore=shutil.ignore_patterns('__pycache__'))
+    if compiled:
+        compileall.compile_dir(target, quiet=1)
+    return target
+
+
+def mode_env(server, data, run_dir, mode):
+    env = dict((key, value) for key, value in os.environ.items() if key in ('PATH', 'HOME', 'LANG'))
+    env.update({'run_mode': mode, 'gh_token': 'bench', 'prev_release_commit_sha': data['prev_release_sha'],
+                'branch': 'main', 'gh_api_url': server.url, 'tmp_dir': run_dir, 'destination': run_dir,
+                'mirror_dir': run_dir + '/mirror', 'store_file': run_dir + '/acs_prs.db', 'http_cache_mb': '0'})
+    return env
+
+
+def time_startup(bin_dir, env, mode, compiled):
+    """
+    Seconds from launching the entrypoint to its metrics starting
+    """
+    output_dir = env['tmp_dir'] + '/docker_output'
+    shutil.rmtree(output_dir, ignore_errors=True)
+    if not compiled:
+        env = dict(env, PYTHONDONTWRITEBYTECODE='1')
+    launched = time.time()
+    child = subprocess.run([sys.executable, os.path.join(bin_dir, 'acs_entrypoint.py')], env=env,
+                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    if child.returncode != 0:
+        print(child.stdout[-2000:])
+        sys.exit("Startup benchmark run failed for %s" % mode)
+    with open(os.path.join(output_dir, METRICS_FILES[mode])) as metrics_file:
+        return json.load(metrics_file)['started'] - launched
+
+
+def time_create_config(bin_dir, env):
+    """
+    Seconds the old start spent on its own interpreter writing conf.txt
+    """
+    started = time.time()
+    subprocess.run([sys.executable, os.path.join(bin_dir, 'create_config.py')], env=env, check=True)
+    return time.time() - started
+
+
+def main():
+    import docopt
+    import run_bench
+    from lib import standin
+
+    args = docopt.docopt(__doc__)
+    modes = args['--modes'].split(',')
+    runs = int(args['--runs'])
+    workdir = args['--workdir']
+    budget = float(args['--budget'])
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+
+    data = run_bench.load_corpus(workdir, int(args['--size']))
+    server = standin.start(prs=data['records'], git_url=data['git_url'], commits=data['commits'])
+    compiled_bin = copy_bin(workdir, 'bin-compiled', True)
+    source_bin = copy_bin(workdir, 'bin-source', False)
+
+    over = []
+    print("%-10s %10s %10s" % ('mode', 'compiled', 'source'))
+    for mode in modes:
+        run_dir = os.path.join(workdir, 'run-' + mode)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.makedirs(run_dir)
+        env = mode_env(server, data, run_dir, mode)
+        # the first run fills the PR store and the mirror, startup doesn't depend on them
+        time_startup(compiled_bin, env, mode, True)
+        compiled = min(time_startup(compiled_bin, env, mode, True) for run in range(runs))
+        source = min(time_startup(source_bin, env, mode, False) for run in range(runs))
+        print("%-10s %9.3fs %9.3fs" % (mode, compiled, source))
+        if compiled > budget:
+            over.append("%s: %.3fs" % (mode, compiled))
+    config_step = min(time_create_config(compiled_bin, mode_env(server, data, workdir, 'report'))
+                      for run in range(runs))
+    print("\nThe old separate create_config.py interpreter took another %.3fs" % config_step)
+    server.shutdown()
+
+    if over:
+        print("\nOver the %.2fs startup budget: %s" % (budget, ', '.join(over)))
+        sys.exit(1)
+    print("\nAll modes start within the %.2fs budget" % budget)
+
+
+if __name__ == '__main__':
+    main()
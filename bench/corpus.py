@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Synthetic PR corpus and git repo for the benchmarks.
+
+The corpus is a list of PR records (see lib.prstore) with CloudStack style labels,
+PR template bodies with type checkboxes, draft flags and ages. The repo is a bare
+git repo with one commit per merged PR (merge_commit_sha points at it), a previous
+release commit, and reverts and re-applied reverts in the release window.
+"""
+
+import os
+import random
+from datetime import datetime, timedelta
+
+import pygit2
+
+TYPES = [('type:bug', 'Bug fix', 40), ('type:enhancement', 'Enhancement', 20),
+         ('type:new_feature', 'New feature', 5), ('type:cleanup', 'Cleanup', 10), (None, None, 25)]
+SEVERITIES = ['BLOCKER', 'Critical', 'Major', 'Minor', 'Trivial']
+CHECKBOXES = ['Breaking change', 'New feature', 'Bug fix', 'Enhancement', 'Cleanup', 'Experimental feature']
+WORDS = ['cloudstack', 'vm', 'volume', 'snapshot', 'network', 'kvm', 'xenserver', 'vmware', 'fix', 'the',
+         'management', 'server', 'agent', 'router', 'template', 'zone', 'pod', 'cluster', 'host', 'api', 'ui']
+
+RELEASE_AGE_DAYS = 180
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for i in range(words))
+
+
+def body(rng, ticked):
+    lines = ['### Description', '', sentence(rng, 12), '']
+    lines.extend(sentence(rng, 14) for i in range(rng.randint(2, 40)))
+    lines.extend(['', '### Types of changes', ''])
+    for text in CHECKBOXES:
+        lines.append('- [%s] %s (description of change)' % ('x' if text == ticked else ' ', text))
+    lines.extend(['', '### How Has This Been Tested?', '', sentence(rng, 20)])
+    return '\n'.join(lines)
+
+
+def generate_corpus(count, seed=1, now=None):
+    """
+    Return (records, prev_release_date) for `count` PRs
+    """
+    rng = random.Random(seed)
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    prev_release_date = now - timedelta(days=RELEASE_AGE_DAYS)
+    weights = [t[2] for t in TYPES]
+    records = []
+    for number in range(1, count + 1):
+        # PR numbers grow with time, newer PRs are more likely to still be open
+        created_at = now - timedelta(days=(count - number) * 1500.0 / count + rng.random() * 30)
+        label, text, weight = rng.choices(TYPES, weights)[0]
+        labels = []
+        if label:
+            labels.append(label)
+            if label == 'type:bug' and rng.random() < 0.8:
+                labels.append('Severity:' + rng.choice(SEVERITIES))
+        ticked = text if text and rng.random() < 0.8 else rng.choice(CHECKBOXES + [None])
+        roll = rng.random()
+        if roll < 0.15 or created_at > now - timedelta(days=7):
+            state = 'open'
+        elif roll < 0.3:
+            state = 'closed'
+        else:
+            state = 'merged'
+        draft = state == 'open' and rng.random() < 0.2
+        if draft and rng.random() < 0.5:
+            labels.append('wip')
+        if state == 'open' and created_at < now - timedelta(days=365) and rng.random() < 0.5:
+            labels.append('age:1year_plus')
+        merged_at = None
+        if state == 'merged':
+            merged_at = min(now, created_at + timedelta(days=rng.random() * 20, seconds=rng.randint(0, 86400)))
+        updated_at = min(now, (merged_at or created_at) + timedelta(days=rng.random() * 5))
+        records.append({
+            'number': number,
+            'title': sentence(rng, rng.randint(4, 10)).capitalize(),
+            'body': body(rng, ticked),
+            'labels': labels,
+            'draft': draft,
+            'state': state,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'merged_at': merged_at,
+            'merge_commit_sha': None,
+            'base_ref': 'main',
+            'author': 'user%s' % rng.randint(1, 300),
+        })
+    return records, prev_release_date
+
+
+def signature(when):
+    return pygit2.Signature('Someone', 'someone@example.com', int((when - datetime(1970, 1, 1)).total_seconds()), 0)
+
+
+def build_repo(path, records, prev_release_date, seed=1, branch='main'):
+    """
+    Create the bare repo at `path` and fill in merge_commit_sha on the merged records.
+    Returns the previous release commit SHA.
+    """
+    rng = random.Random(seed)
+    repo = pygit2.init_repository(path, bare=True)
+    tree = repo.TreeBuilder().write()
+    merged = sorted((r for r in records if r['state'] == 'merged'), key=lambda r: r['merged_at'])
+    events = [(r['merged_at'], 'pr', r) for r in merged]
+    events.append((prev_release_date, 'release', None))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    parent = []
+    prev_release_sha = None
+    for when, kind, record in events:
+        sig = signature(when)
+        if kind == 'release':
+            oid = repo.create_commit(None, sig, sig, 'Release previous version\n', tree, parent)
+            prev_release_sha = str(oid)
+            parent = [oid]
+            continue
+        oid = repo.create_commit(None, sig, sig, '%s (#%s)\n' % (record['title'], record['number']), tree, parent)
+        record['merge_commit_sha'] = str(oid)
+        parent = [oid]
+        if when > prev_release_date and rng.random() < 0.02:
+            # revert it, and sometimes put it back again
+            revert_sig = signature(when + timedelta(seconds=1))
+            message = 'Revert "%s (#%s)"\n\nThis reverts commit %s.\n' % (record['title'], record['number'], oid)
+            revert = repo.create_commit(None, revert_sig, revert_sig, message, tree, parent)
+            parent = [revert]
+            if rng.random() < 0.3:
+                again_sig = signature(when + timedelta(seconds=2))
+                message = 'Revert "Revert "%s (#%s)""\n\nThis reverts commit %s.\n' % (
+                    record['title'], record['number'], str(revert)[:10])
+                parent = [repo.create_commit(None, again_sig, again_sig, message, tree, parent)]
+    repo.create_reference('refs/heads/' + branch, parent[0], force=True)
+    repo.set_head('refs/heads/' + branch)
+    return prev_release_sha
+
+
+def commit_dates(path, shas):
+    repo = pygit2.Repository(path)
+    dates = {}
+    for sha in shas:
+        commit = repo[sha]
+        dates[sha] = datetime.utcfromtimestamp(commit.author.time)
+    return dates
+
+
+if __name__ == '__main__':
+    records, prev_release_date = generate_corpus(1000)
+    print("%s PRs, %s open, %s merged since %s" % (
+        len(records), len([r for r in records if r['state'] == 'open']),
+        len([r for r in records if r['merged_at'] and r['merged_at'] >= prev_release_date]), prev_release_date))
+    print(os.linesep.join(records[-1]['body'].splitlines()[-12:]))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+End-to-end benchmark of the combined report and label run against a local
+stand-in Github (lib.standin) serving a synthetic corpus (bench/corpus.py).
+
+Each scenario runs the container entrypoint (bin/acs_entrypoint.py) in its own
+process, config in the environment as in the image, so the run plan, the HTTP cache
+and the classifier rules file are wired up the way a real run does it, and peak RSS
+is per run: a cold run with an empty PR store, HTTP cache and no mirror, then a warm
+run reusing them. The timings are the phases of the run's metrics file, `import` is
+the time to the run starting. Labels are reconciled in dry run mode so the corpus
+stays the same between runs.
+
+Usage:
+  run_bench.py [--sizes=<arg>] [--fetch_modes=<arg>] [--workdir=<arg>]
+               [--save_baseline=<file>] [--baseline=<file>] [--threshold=<arg>]
+  run_bench.py (-h | --help)
+Options:
+  -h --help                 Show this screen.
+  --sizes=<arg>             Comma separated corpus sizes [default: 1000,10000,50000].
+  --fetch_modes=<arg>       Comma separated fetch modes to run [default: graphql].
+  --workdir=<arg>           Where corpora, repos, stores and outputs go [default: /tmp/acsn-bench].
+  --save_baseline=<file>    Write the results to this JSON file.
+  --baseline=<file>         Compare against a saved baseline and exit 1 on a regression.
+  --threshold=<arg>         Allowed slowdown / RSS growth in percent [default: 20].
+
+API call counts are compared exactly, any extra call is a regression.
+"""
+
+import contextlib
+import json
+import os
+import pickle
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'bin'))
+
+REPO_NAME = 'apache/cloudstack'
+BRANCH = 'main'
+PHASES = ['connect', 'mirror', 'plan', 'sync', 'revert_index', 'reach', 'report', 'labels']
+REQUIRED_TABLES = str(['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs'])
+CLASSIFIER_RULES = os.path.join(BENCH_DIR, '..', 'classifier_rules.example')
+
+
+def load_corpus(workdir, size):
+    """
+    Generate the corpus and its git repo once per size, later runs load the pickle
+    """
+    import corpus
+    corpus_dir = os.path.join(workdir, 'corpus-%s' % size)
+    pickle_file = os.path.join(corpus_dir, 'corpus.pickle')
+    if os.path.isfile(pickle_file):
+        with open(pickle_file, 'rb') as f:
+            return pickle.load(f)
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    os.makedirs(corpus_dir)
+    print("Generating %s PR corpus in %s" % (size, corpus_dir))
+    records, prev_release_date = corpus.generate_corpus(size)
+    repo_dir = os.path.join(corpus_dir, 'repo.git')
+    prev_release_sha = corpus.build_repo(repo_dir, records, prev_release_date)
+    shas = [r['merge_commit_sha'] for r in records if r['merge_commit_sha']] + [prev_release_sha]
+    data = {'records': records, 'prev_release_sha': prev_release_sha, 'git_url': 'file://' + repo_dir,
+            'commits': corpus.commit_dates(repo_dir, shas)}
+    with open(pickle_file, 'wb') as f:
+        pickle.dump(data, f)
+    return data
+
+
+def run_child(spec):
+    """
+    Run the container entrypoint in `combined` mode in this process and return the
+    measurements, the phase timings are the run's own metrics
+    """
+    started = time.time()
+    import acs_entrypoint
+    environ = {'run_mode': 'combined', 'gh_token': spec['gh_token'], 'repo_name': REPO_NAME, 'branch': BRANCH,
+               'prev_release_commit_sha': spec['prev_release_sha'], 'gh_api_url': spec['api_url'],
+               'fetch_mode': spec['fetch_mode'], 'tmp_dir': spec['output_dir'], 'destination': spec['output_dir'],
+               'mirror_dir': spec['mirror_dir'], 'store_file': spec['store_file'],
+               'http_cache_file': spec['http_cache_file'], 'classifier_rules': CLASSIFIER_RULES,
+               'required_tables': REQUIRED_TABLES, 'output_file_name': 'prs.txt'}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        acs_entrypoint.main(environ)
+    with open(os.path.join(spec['output_dir'], 'docker_output', 'prs.metrics.json')) as metrics_file:
+        run_metrics = json.load(metrics_file)
+
+    timings = {'import': run_metrics['started'] - started}
+    for name in PHASES:
+        timings[name] = run_metrics['phases'].get(name, {}).get('seconds', 0.0)
+    counters = run_metrics['counters']
+    return {'timings': timings, 'prs': counters.get('prs_processed', 0),
+            'http_cache_hits': counters.get('http_cache_hits', 0),
+            'http_cache_misses': counters.get('http_cache_misses', 0),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def run_scenario(server, data, workdir, size, fetch_mode, warm):
+    run_dir = os.path.join(workdir, 'run-%s-%s' % (size, fetch_mode))
+    if not warm:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.makedirs(run_dir)
+    spec = {'api_url': server.url, 'gh_token': 'bench', 'fetch_mode': fetch_mode,
+            'prev_release_sha': data['prev_release_sha'], 'store_file': run_dir + '/acs_prs.db',
+            'mirror_dir': run_dir + '/mirror', 'http_cache_file': run_dir + '/acs_http_cache.db',
+            'output_dir': run_dir}
+    server.reset_counts()
+    started = time.time()
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(spec)],
+                           stdout=subprocess.PIPE, universal_newlines=True)
+    wall = time.time() - started
+    if child.returncode != 0:
+        sys.exit("Benchmark run failed for %s PRs (%s)" % (size, fetch_mode))
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result['wall'] = wall
+    result['api_calls'] = dict(server.endpoints)
+    return result
+
+
+def print_result(name, result):
+    timings = result['timings']
+    print("%-28s wall %7.2fs  rss %7.1fMB  api %5d  | %s" % (
+        name, result['wall'], result['peak_rss_kb'] / 1024.0, sum(result['api_calls'].values()),
+        '  '.join('%s %.2fs' % (p, timings[p]) for p in ['import'] + PHASES)))
+    print("%-28s %s PRs, HTTP cache %s hits %s misses, calls: %s" % (
+        '', result['prs'], result['http_cache_hits'], result['http_cache_misses'],
+        ', '.join('%s=%s' % item for item in sorted(result['api_calls'].items()))))
+
+
+def regressions(results, baseline, threshold):
+    """
+    Compare the results with a baseline, returns a list of regression messages
+    """
+    found = []
+    limit = 1 + threshold / 100.0
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        measures = [('wall', result['wall'], base['wall']), ('peak_rss_kb', result['peak_rss_kb'], base['peak_rss_kb'])]
+        measures.extend((p, result['timings'][p], base['timings'].get(p, 0)) for p in PHASES)
+        for measure, value, base_value in measures:
+            # ignore noise on phases that only take a few milliseconds
+            if value > base_value * limit and value - base_value > 0.05:
+                found.append("%s: %s %.2f -> %.2f" % (name, measure, base_value, value))
+        for endpoint, calls in sorted(result['api_calls'].items()):
+            if calls > base['api_calls'].get(endpoint, 0):
+                found.append("%s: %s calls %s -> %s" % (name, endpoint, base['api_calls'].get(endpoint, 0), calls))
+    return found
+
+
+def main():
+    import docopt
+    from lib import standin
+
+    args = docopt.docopt(__doc__)
+    workdir = args['--workdir']
+    sizes = [int(size) for size in args['--sizes'].split(',')]
+    fetch_modes = args['--fetch_modes'].split(',')
+    threshold = float(args['--threshold'])
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+
+    results = {}
+    for size in sizes:
+        data = load_corpus(workdir, size)
+        server = standin.start(prs=data['records'], repo_name=REPO_NAME, git_url=data['git_url'],
+                               commits=data['commits'])
+        try:
+            for fetch_mode in fetch_modes:
+                for warm in (False, True):
+                    name = '%s-%s-%s' % (size, fetch_mode, 'warm' if warm else 'cold')
+                    results[name] = run_scenario(server, data, workdir, size, fetch_mode, warm)
+                    print_result(name, results[name])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    if args['--save_baseline']:
+        with open(args['--save_baseline'], 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("\nBaseline saved to %s" % args['--save_baseline'])
+
+    if args['--baseline']:
+        with open(args['--baseline']) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, threshold)
+        if found:
+            print("\nRegressions over %s%%:" % threshold)
+            for message in found:
+                print("- " + message)
+            sys.exit(1)
+        print("\nNo regressions over %s%% against %s" % (threshold, args['--baseline']))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        print(json.dumps(run_child(json.loads(sys.argv[2]))))
+    else:
+        main()
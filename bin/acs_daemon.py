@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Keeps the PR report and the label reconciliation up to date from Github webhooks.
+
+Starts like acs_newsletter.py (PR store sync, revert index, report and labels), then
+applies `pull_request` and `label` deliveries (see lib.webhook) as they come in. An
+event updates the PR store, re-runs the report rows and the label check of the PRs it
+touched only and renders again only the sections whose rows changed. A merged PR
+fetches the mirror and walks just the new commits for reverts. Everything is rebuilt
+from a PR store sync every `--refresh_hours`, which also ages the open PRs and picks
+up deliveries that were missed.
+
+Add a repository webhook (content type application/json, "Pull requests" and "Labels"
+events) for http://<host>:<webhook_port>/ with `--webhook_secret` as its secret. The
+daemon won't listen without a secret, and deliveries for another repo are refused.
+
+Usage:
+  acs_daemon.py [--config=<config.json>]
+                [-t <arg> | --gh_token=<arg>]
+                [-b <arg> | --branch=<arg>]
+                [--branches=<arg>]
+                [--repo=<arg>]
+                [--webhook_port=<arg>]
+                [--replay=<file>]
+
+  acs_daemon.py (-h | --help)
+Options:
+  -h --help                         Show this screen.
+  --config=<config.json>            Path to a JSON config file with an object of config options.
+  --gh_token=<arg>                  Required: Your Github token from https://github.com/settings/tokens
+                                      with `repo/public_repo` permissions.
+  --branch=<arg>                    The branch to report on.
+  --branches=<arg>                  Comma separated branches to report on, one PR report per branch.
+  --repo=<arg>                      The name of the repo to use [default: apache/cloudstack].
+  --webhook_port=<arg>              The port to receive deliveries on (default 8080).
+  --replay=<file>                   Apply recorded deliveries, one {"event", "payload"} JSON object
+                                      per line, instead of listening, then exit.
+
+Takes the same config file as acs_newsletter.py plus:
+
+{
+	"--webhook_port":"8080",
+	"--webhook_secret":"******************",
+	"--refresh_hours":"24"
+}
+
+requires: python3.8 + docopt pygithub prettytable pygit2 numpy
+
+"""
+
+import docopt
+import json
+import os.path
+import queue
+import sys
+import time
+from datetime import datetime
+from lib import checkboxes
+from lib import classify
+from lib import dataset
+from lib import labelplan
+from lib import metrics
+from lib import processors
+from lib import render
+from lib import reverts
+from lib import webhook
+import acs_report_prs
+import acs_github_label_reconciler
+
+
+def load_config(config=None):
+    """
+    Parse the command line arguments and load in the optional config file values, or
+    take the config values from `config` when they are read in process (acs_entrypoint.py)
+    """
+    args = docopt.docopt(__doc__, argv=[] if config is not None else None)
+    if config is not None:
+        args = acs_report_prs.merge(args, config)
+    elif args['--config'] and os.path.isfile(args['--config']):
+        json_args = {}
+        try:
+            with open(args['--config']) as json_file:
+                json_args = json.load(json_file)
+        except Exception as e:
+            print(("Failed to load config file '%s'" % args['--config']))
+            print(("ERROR: %s" % str(e)))
+        if json_args:
+            args = acs_report_prs.merge(args, json_args)
+    if not args.get('--gh_token'):
+        print("ERROR: gh_token is required")
+        sys.exit(__doc__)
+    return args
+
+
+class LiveReports:
+    """
+    The report and label rows of every PR in the release window, kept per PR and
+    section so an event only redoes the PRs and the sections it touched
+    """
+
+    def __init__(self, repo, branches, since_date, revert_indexes, tips, windows, store, output_file, labels_file,
+                 required_tables, update_labels, gh_token, label_write_workers, output_format, col_title_width,
+                 mirror_dir, prev_release_sha, classifier):
+        self.repo = repo
+        self.branches = branches
+        self.since_date = since_date
+        self.since = datetime.strptime(since_date, '%Y-%m-%d')
+        self.revert_indexes = revert_indexes
+        self.tips = tips
+        self.windows = windows
+        self.store = store
+        self.required_tables = required_tables
+        self.update_labels = update_labels
+        self.gh_token = gh_token
+        self.label_write_workers = label_write_workers
+        self.mirror_dir = mirror_dir
+        self.prev_release_sha = prev_release_sha
+        self.classifier = classifier
+        self.scanner = checkboxes.CheckboxScanner(acs_github_label_reconciler.LABEL_NAMES, store)
+        if len(branches) == 1:
+            self.report_files = {branches[0]: output_file}
+        else:
+            self.report_files = dict((branch, acs_report_prs.branch_output_file(output_file, branch))
+                                     for branch in branches)
+        self.labels_file = labels_file
+        self.reports = dict((branch, render.Document(output_format, col_title_width)) for branch in branches)
+        self.labels = render.Document(output_format, col_title_width,
+                                      acs_github_label_reconciler.report_title(store.repo_name))
+        self.reset()
+
+    def reset(self):
+        self.prs = {}
+        # merge commit sha -> PR number, label -> PR numbers, of the PRs in the window
+        self.merge_shas = {}
+        self.label_prs = {}
+        # section -> {PR number: [(row, sort key)]}, one set of report sections per branch
+        self.report_rows = dict((branch, dict((name, {}) for name in acs_report_prs.REPORT_SECTIONS))
+                                for branch in self.branches)
+        self.label_rows = dict((name, {}) for name in acs_github_label_reconciler.LABEL_SECTIONS[1:])
+        self.matched = set()
+        # (branch or None for the labels, section) still to render
+        self.dirty = set()
+
+    def in_window(self, pr):
+        if pr['state'] == 'open':
+            return True
+        return pr['state'] == 'merged' and pr['merged_at'] is not None and pr['merged_at'] >= self.since
+
+    def report_branches(self, pr):
+        if pr['state'] == 'merged':
+            return self.windows.branches_of(pr)
+        if len(self.branches) == 1:
+            return self.branches
+        return [branch for branch in self.branches if pr['base_ref'] == branch]
+
+    def update_rows(self, document, sections, number, rows):
+        for name, section in sections.items():
+            entry = rows.get(name)
+            if section.get(number) == entry:
+                continue
+            if entry:
+                section[number] = entry
+            else:
+                section.pop(number, None)
+            self.dirty.add((document, name))
+
+    def set_pr(self, pr, label_plan):
+        """
+        Work out the report rows and label results of one PR record again
+        """
+        number = pr['number']
+        old = self.prs.pop(number, None)
+        if old is not None:
+            self.merge_shas.pop(old['merge_commit_sha'], None)
+            for label in old['labels']:
+                self.label_prs.get(label, set()).discard(number)
+        in_window = self.in_window(pr)
+        merged = pr['state'] == 'merged'
+
+        for branch in self.branches:
+            rows = {}
+            if in_window and branch in self.report_branches(pr):
+                if merged:
+                    found = acs_report_prs.merged_pr_rows(pr, self.revert_indexes[branch], self.required_tables,
+                                                          self.classifier)
+                else:
+                    found = acs_report_prs.open_pr_rows(pr, self.required_tables, self.classifier)
+                for section, row, sort_key in found:
+                    rows.setdefault(section, []).append((row, sort_key))
+            self.update_rows(branch, self.report_rows[branch], number, rows)
+
+        rows = {}
+        matched = False
+        if in_window:
+            found, matched = acs_github_label_reconciler.check_pr(pr, merged, self.scanner.ticked(pr), label_plan)
+            # the batch run lists open PRs before merged ones, in PR number order
+            for section, section_rows in found.items():
+                rows[section] = [(row, (merged, number, i)) for i, row in enumerate(section_rows)]
+        self.update_rows(None, self.label_rows, number, rows)
+        if matched != (number in self.matched):
+            if matched:
+                self.matched.add(number)
+            else:
+                self.matched.discard(number)
+            self.dirty.add((None, 'labels_matched'))
+
+        if in_window:
+            self.prs[number] = pr
+            if pr['merge_commit_sha']:
+                self.merge_shas[pr['merge_commit_sha']] = number
+            for label in pr['labels']:
+                self.label_prs.setdefault(label, set()).add(number)
+
+    def apply_labels(self, label_plan):
+        self.scanner.save()
+        if not label_plan.changes():
+            return
+        label_plan.print_changes(not self.update_labels)
+        if self.update_labels:
+            with metrics.phase('label_writes'):
+                updated = labelplan.apply(label_plan, self.repo.url, self.gh_token, self.label_write_workers)
+            print("- Labels written on %s PRs" % str(len(updated)))
+
+    def render(self):
+        """
+        Render the changed sections and write the files they are in, returns the number of sections rendered
+        """
+        if 'release_stats' in self.required_tables:
+            self.dirty.update((document, 'release_stats') for document, name in list(self.dirty)
+                              if document is not None)
+        written = set()
+        for document, name in sorted(self.dirty, key=lambda entry: (entry[0] or '', entry[1])):
+            if document is None:
+                if name == 'labels_matched':
+                    table = None
+                else:
+                    table = acs_github_label_reconciler.label_tables()[name]
+                    self.fill(table, self.label_rows[name])
+                self.labels.update(name, lambda report: acs_github_label_reconciler.write_label_section(
+                    report, name, table, len(self.matched)))
+            elif name == 'release_stats':
+                table = self.stats(document)
+                self.reports[document].update(name, lambda report: acs_report_prs.write_section(
+                    report, name, table, self.required_tables))
+            else:
+                table = acs_report_prs.report_tables()[name]
+                self.fill(table, self.report_rows[document][name])
+                self.reports[document].update(name, lambda report: acs_report_prs.write_section(
+                    report, name, table, self.required_tables))
+            written.add(document)
+        for document in written:
+            if document is None:
+                self.labels.write(self.labels_file, acs_github_label_reconciler.LABEL_SECTIONS)
+            else:
+                self.reports[document].write(self.report_files[document], acs_report_prs.REPORT_SECTIONS)
+        rendered = len(self.dirty)
+        self.dirty = set()
+        return rendered
+
+    def stats(self, branch):
+        """
+        The release statistics of a branch, counted again from the PRs in the window
+        """
+        tables = acs_report_prs.report_tables()
+        for name in ('merged_features', 'merged_fixes'):
+            self.fill(tables[name], self.report_rows[branch][name])
+        records = [pr for pr in self.prs.values() if branch in self.report_branches(pr) and
+                   (pr['state'] == 'open' or pr['merge_commit_sha'] not in self.revert_indexes[branch])]
+        return acs_report_prs.stats_tables(records, tables['merged_features'], tables['merged_fixes'],
+                                           self.since_date, classifier=self.classifier)
+
+    def fill(self, table, section):
+        for number in sorted(section):
+            for row, sort_key in section[number]:
+                table.add_row(row, sort_key)
+
+    def load(self, prs):
+        """
+        Start over from a list of PR records
+        """
+        self.reset()
+        label_plan = labelplan.LabelPlan()
+        for pr in prs:
+            self.set_pr(pr, label_plan)
+        self.apply_labels(label_plan)
+        for branch in self.branches:
+            self.dirty.update((branch, name) for name in acs_report_prs.REPORT_SECTIONS)
+        self.dirty.update((None, name) for name in acs_github_label_reconciler.LABEL_SECTIONS)
+        return self.render()
+
+    def update_reverts(self, pr):
+        """
+        Fetch the merge commit of `pr` into the mirror and index any reverts it brings,
+        returns the PR numbers whose merge commit was reverted or put back
+        """
+        mirror_repo = processors.update_mirror(self.repo, self.branches, self.mirror_dir)
+        self.windows.update(mirror_repo)
+        self.tips, changed = processors.extend_revert_indexes(mirror_repo, self.revert_indexes, self.tips)
+        reverts.save_cached(self.mirror_dir, processors.revert_cache_key(self.branches, self.tips, self.since_date,
+                                                                         self.prev_release_sha),
+                            self.revert_indexes)
+        numbers = set()
+        for sha in changed:
+            if sha in self.merge_shas:
+                numbers.add(self.merge_shas[sha])
+            elif len(sha) < 40:
+                numbers.update(n for merge_sha, n in self.merge_shas.items() if merge_sha.startswith(sha))
+        if changed:
+            print("- Reverted state changed for %s" % ', '.join(sorted(changed)))
+        return numbers
+
+    def handle(self, event, payload):
+        """
+        Apply one webhook delivery, returns the number of PRs checked again
+        """
+        label_plan = labelplan.LabelPlan()
+        if event == 'pull_request':
+            pr = webhook.record_from_pull_request(payload['pull_request'])
+            known = self.store.updated_at(pr['number'])
+            if known is not None and pr['updated_at'] is not None and pr['updated_at'] < known:
+                print("- Skipping %s delivery for PR %s, the store has a newer copy" % (payload.get('action'),
+                                                                                         pr['number']))
+                return 0
+            print("- PR %s %s" % (pr['number'], payload.get('action')))
+            self.store.upsert([pr])
+            changed = [pr]
+            if pr['state'] == 'merged' and self.in_window(pr) and pr['merge_commit_sha'] not in self.merge_shas:
+                changed.extend(self.prs[number] for number in sorted(self.update_reverts(pr))
+                               if number in self.prs and number != pr['number'])
+        elif event == 'label':
+            action = payload.get('action')
+            name = payload['label']['name']
+            if action == 'edited' and 'name' in (payload.get('changes') or {}):
+                old_name = payload['changes']['name']['from']
+            elif action == 'deleted':
+                old_name = name
+            else:
+                return 0
+            print("- Label %s %s" % (old_name, action))
+            changed = []
+            for number in sorted(self.label_prs.get(old_name, ())):
+                pr = dict(self.prs[number])
+                pr['labels'] = [l for l in pr['labels'] if l != old_name]
+                if action == 'edited':
+                    pr['labels'].append(name)
+                changed.append(pr)
+            self.store.upsert(changed)
+        else:
+            return 0
+        for pr in changed:
+            self.set_pr(pr, label_plan)
+        self.apply_labels(label_plan)
+        return len(changed)
+
+
+def handle_event(live, event, payload, metrics_file):
+    started = time.time()
+    try:
+        with metrics.phase('event'):
+            checked = live.handle(event, payload)
+            rendered = live.render()
+    except Exception as e:
+        # a bad delivery shouldn't stop the daemon, the next refresh puts things right
+        print("ERROR: failed to apply %s delivery: %s" % (event, e))
+        metrics.count('webhook_errors')
+        return
+    metrics.count('webhook_events')
+    metrics.count('prs_processed', checked)
+    metrics.add_items('event', checked)
+    metrics.count('sections_rendered', rendered)
+    print("- %s: %s PRs checked, %s sections rendered in %.3fs" % (event, checked, rendered,
+                                                                    time.time() - started))
+    metrics.current.write(metrics_file)
+
+
+def main(args):
+    """
+    Run with the options in `args`, see `load_config`
+    """
+    print('\nInitialising...\n\n')
+
+    gh_token = args['--gh_token']
+    tmp_dir = args.get('--tmp_dir') or "/tmp"
+    destination = args.get('--destination') or "/opt"
+    output_file_name = args.get('--output_file_name') or "prs.rst"
+    labels_file_name = args.get('--labels_file_name') or "labels.txt"
+    required_tables = str(args.get('--required_tables') or
+                          ['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs'])
+    col_title_width = int(args.get('--col_title_width') or 60)
+    label_write_workers = int(args.get('--label_write_workers') or 2)
+    output_format = args.get('--output_format') or "table"
+    update_labels = str(args.get('--update_labels')).lower() in ('true', '1', 'yes')
+    webhook_port = int(args.get('--webhook_port') or 8080)
+    webhook_secret = args.get('--webhook_secret') or None
+    refresh_hours = float(args.get('--refresh_hours') or 24)
+    if not webhook_secret and not args.get('--replay'):
+        # unsigned deliveries could write any records and labels, so don't listen for them
+        print("ERROR: --webhook_secret is required to listen for Github deliveries")
+        sys.exit(__doc__)
+    classifier = classify.load(args.get('--classifier_rules'), acs_report_prs.REPORT_SECTIONS)
+
+    if args.get('--docker_created_config'):
+        destination = tmp_dir + "/docker_output"
+        if not os.path.isdir(destination):
+            os.mkdir(destination)
+        if args.get('--config'):
+            os.remove(str(args['--config']))
+
+    metrics.start('acs_daemon')
+    data = dataset.Dataset(args, labels=update_labels).connect()
+    branches = data.branches
+    output_file = destination + "/" + output_file_name
+    live = None
+
+    def refresh():
+        """
+        Sync the PR store and the revert index and rebuild every section
+        """
+        nonlocal live
+        if not data.sync():
+            data.close()
+            sys.exit()
+        prs = data.open_prs + data.merged_prs
+        tips = processors.branch_tips(data.mirror_repo, branches)
+        if live is None:
+            live = LiveReports(data.repo, branches, data.prev_release_commit_date, data.revert_indexes, tips,
+                               data.windows, data.store, output_file, destination + "/" + labels_file_name,
+                               required_tables, update_labels, gh_token, label_write_workers, output_format,
+                               col_title_width, data.mirror_dir, data.prev_release_sha, classifier)
+        else:
+            live.revert_indexes, live.tips, live.windows = data.revert_indexes, tips, data.windows
+        with metrics.phase('report', len(prs)):
+            rendered = live.load(prs)
+        print("- %s PRs loaded, %s sections rendered\n" % (len(prs), rendered))
+        metrics.current.write(output_file)
+
+    refresh()
+
+    if args.get('--replay'):
+        for event, payload in webhook.read_recorded(args['--replay']):
+            if not webhook.for_repo(payload, data.repo_name):
+                print("- Skipping %s delivery for another repo" % event)
+                continue
+            handle_event(live, event, payload, output_file)
+        data.close()
+        metrics.current.print_summary()
+        print("Metrics written to %s\n" % ', '.join(metrics.current.write(output_file)))
+        sys.exit()
+
+    events = queue.Queue()
+    webhook.start('', webhook_port, webhook_secret, events, data.repo_name)
+    print("Listening for Github deliveries on port %s" % webhook_port)
+    next_refresh = time.time() + refresh_hours * 3600
+    while True:
+        try:
+            event, payload = events.get(timeout=max(1, next_refresh - time.time()))
+        except queue.Empty:
+            refresh()
+            next_refresh = time.time() + refresh_hours * 3600
+            continue
+        handle_event(live, event, payload, output_file)
+
+
+if __name__ == '__main__':
+    main(load_config())
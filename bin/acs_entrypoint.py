@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Container entrypoint. Reads the config from the environment variables listed in
+create_config.py and runs the `run_mode` script in this process:
+
+  report      acs_report_prs.py (the default)
+  combined    acs_newsletter.py
+  labels      acs_github_label_reconciler.py
+  daemon      acs_daemon.py
+
+Only the script of the mode is imported, and the scripts import PyGithub, pygit2 and
+NumPy once they know they need them. The image compiles /opt ahead of time, so no run
+pays for compiling the sources.
+"""
+
+import importlib
+import os
+import sys
+
+import create_config
+
+MODES = {
+    'report': ('acs_report_prs', "Running analyser"),
+    'combined': ('acs_newsletter', "Running analyser and label reconciler"),
+    'labels': ('acs_github_label_reconciler', "Running label reconciler"),
+    'daemon': ('acs_daemon', "Running analyser and label reconciler on Github webhooks"),
+}
+
+
+def load_mode(run_mode):
+    """
+    Import the script of `run_mode`
+    """
+    if run_mode not in MODES:
+        sys.exit("Unknown run_mode '%s', use one of %s" % (run_mode, ', '.join(sorted(MODES))))
+    return importlib.import_module(MODES[run_mode][0])
+
+
+def main(environ):
+    run_mode = environ.get('run_mode') or 'report'
+    script = load_mode(run_mode)
+    config = create_config.config_from_env(environ)
+    # nothing started from here needs the token in its environment
+    for name, default in create_config.CONFIG_VARS:
+        environ.pop(name, None)
+    print(MODES[run_mode][1])
+    script.main(script.load_config(config))
+
+
+if __name__ == '__main__':
+    main(os.environ)
@@ -26,6 +26,7 @@ Usage:
                   [--repo=<arg>] 
                   [--gh_base_url=<arg>] 
                   [--col_title_width=<arg>] 
+                  [--plan]
 
   fixed_issues.py (-h | --help)
 Options:
@@ -44,6 +45,7 @@ Options:
                                       [default: https://github.com/apache/cloudstack/pull/].
   --col_title_width=<arg>          The width of the title column [default: 60].
   --docker_created_config=<arg>     used to know whether to remove conf file if in container (for some safety)    
+  --plan                            Print the API calls the run needs against the rate limit and stop.
 
 Sample json file contents:
 
@@ -53,31 +55,42 @@ Sample json file contents:
 	"--repo_name":"apache/cloudstack",
 	"--branch":"4.11",
 	"--prev_release_ver":"4.11.1.0",
-	"--new_release_ver":"4.11.2.0"
+	"--new_release_ver":"4.11.2.0",
+	"--store_file":"/tmp/acs_prs.db",
+	"--fetch_mode":"graphql",
+	"--gh_api_url":"https://api.github.com",
+	"--hydrate_workers":"8",
+	"--checkpoint_seconds":"10"
 }
 
-requires: python3.8 + docopt pygithub prettytable gitpython
+requires: python3.8 + docopt pygithub prettytable gitpython numpy
 
 """
 from typing import DefaultDict
 import docopt
 import json
-from github import Github
 import os.path
-import re
 import sys
-from prettytable import PrettyTable
-from datetime import datetime, timedelta
-from lib import processors
+from datetime import datetime
+from lib import analytics
+from lib import checkpoint
+from lib import dataset
+from lib import metrics
+from lib import checkboxes
+from lib import labelplan
+from lib import render
 
 
-def load_config():
+def load_config(config=None):
     """
-    Parse the command line arguments and load in the optional config file values
+    Parse the command line arguments and load in the optional config file values, or
+    take the config values from `config` when they are read in process (acs_entrypoint.py)
     """
-    args = docopt.docopt(__doc__)
+    args = docopt.docopt(__doc__, argv=[] if config is not None else None)
     args['--update_labels'] = ''
-    if args['--config'] and os.path.isfile(args['--config']):
+    if config is not None:
+        args = merge(args, config)
+    elif args['--config'] and os.path.isfile(args['--config']):
         json_args = {}
         try:
             with open(args['--config']) as json_file:    
@@ -106,325 +119,301 @@ def merge(primary, secondary):
     return dict((str(key), primary.get(key) or secondary.get(key))
                 for key in set(secondary) | set(primary))
 
-def label_match(label_string, text_string):
-
-    global issue_matched_count
-    global issue_labels_mismatch
-    global issue_all_bad
-    global bad_issue_count
-    global no_match_count
-    global issue_desc_exist
-    global issue_label_exist
-    global label_to_add
-    global issue_missing_labels
-    global issue_improvement_rename
-
-    search_string = '.*- \[ ?x ?\] ' + text_string + ' .*'
-    #print('--- Looking for ' + text_string + ' in description')
-    if label_string != "type:healthcheckrun":
-        if re.search(search_string, str(issue.body), re.I):
+LABEL_NAMES = {"type:bug": "Bug fix", "type:enhancement": "Enhancement", "type:experimental-feature": \
+               "Experimental feature", "type:new_feature": "New feature", "type:cleanup": "Cleanup", \
+               "type:breaking_change": "Breaking change"}
+
+DRAFT_PR_LABEL = "wip"
+
+LABEL_SECTIONS = ['labels_matched', 'labels_added', 'labels_mismatched', 'labels_all_bad', 'old_prs']
+
+
+def label_tables():
+    return dict((name, render.Table(["PR Number", "Title", "PR Type", "Result"])) for name in LABEL_SECTIONS[1:])
+
+
+def match_labels(ticked_labels, existing_label_names):
+    """
+    Compare the type checkboxes ticked in a PR description with its type labels, returns
+    (matched, description matches, label matches, label to add, unmatched)
+    """
+    issue_matched_count = 0
+    issue_desc_exist = 0
+    issue_label_exist = 0
+    label_to_add = ''
+    no_match_count = 0
+    for label_string in LABEL_NAMES:
+        #print('--- Looking for ' + LABEL_NAMES[label_string] + ' in description')
+        if label_string in ticked_labels:
             issue_desc_exist += 1
             if label_string in existing_label_names:
                 issue_label_exist += 1
                 issue_matched_count += 1
             else:
                 label_to_add = label_string
-                issue_missing_labels += 1
-                issue_labels_mismatch += 1
         else:
             if label_string in existing_label_names:
                 issue_label_exist += 1
-                issue_labels_mismatch += 1
             else:
                 no_match_count += 1
+    return issue_matched_count, issue_desc_exist, issue_label_exist, label_to_add, no_match_count
+
 
-    return issue_matched_count, issue_labels_mismatch, no_match_count, issue_desc_exist, \
-        issue_label_exist,  label_to_add, issue_missing_labels
-
-
-def label_reconcile(prtype_text,label_to_add):
-    
-    global issue_matched_count
-    global issue_labels_mismatch
-    global issue_all_bad
-    global bad_issue_count
-    global no_match_count
-    global issue_desc_exist
-    global issue_label_exist
-    global issue_missing_labels
-    global issue_improvement_rename
-    global labels_mismatched
-    global labels_added
-    global labels_matched
-    global labels_all_bad
-    global labels_mismatch_table
-    global update_labels
-    global labels_all_bad_table
-    global labels_added_table
-    global prev_release_commit_date
+def check_pr(pr, merged, ticked_labels, label_plan, age=None):
+    """
+    Reconcile the labels of one PR record against its description. The label changes go
+    into `label_plan`, returns the rows it adds to the results tables ({section: [rows]})
+    and whether its type label matched. `age` is the PR's lib.analytics.old_pr_ages bucket,
+    worked out here if not given.
+    """
+    rows = {}
+    existing_label_names = list(pr['labels'])
+    pr_num = str(pr['number'])
 
+    def add_row(section, prtype, result):
+        rows.setdefault(section, []).append([pr['number'], pr['title'].strip(), prtype, result])
 
-    if issue_matched_count == 1:
-        labels_matched += 1
-        print("---- Matching label found - no action")
+    if merged:
+        print("\n-- Checking MERGED pr#: " + pr_num)
+        prtype = "MERGED"
     else:
-        if issue_desc_exist > 1 or issue_label_exist > 1:
-            print("XXXX Too many label or description matches")
-            labels_mismatch_table.add_row([pr_num, pr.title.strip(), prtype_text, "Label/description mismatch"])
-            labels_mismatched += 1
+        print("\n-- Checking OPEN pr#: " + pr_num)
+        if pr['draft']:
+            prtype = 'Draft PR'
+            if DRAFT_PR_LABEL not in existing_label_names:
+                print("**** Daft PR missing wip label - adding label")
+                add_row('labels_added', prtype, "WIP label added")
+                label_plan.add(pr, "status:work-in-progress")
         else:
-            if issue_desc_exist > 0 and issue_label_exist > 0:
-                print("XXXX Label and description don't match")
-                labels_mismatch_table.add_row([pr_num, pr.title.strip(), prtype_text, "Label/description mismatch"])
-                labels_mismatched += 1
-
-            elif (issue_label_exist > 0 and issue_desc_exist == 0):
-                print("XXX Label without description")
-                labels_mismatch_table.add_row([pr_num, pr.title.strip(), prtype_text, "Label without description"])
-                labels_mismatched += 1
-
-            elif issue_desc_exist == 1 and issue_label_exist == 0:
-                labels_added += 1
-                add_label_res =  "++++ label '" + label_to_add[5:] + "' added"
-                print(add_label_res)
-                add_label_text = add_label_res[5:]
-                labels_added_table.add_row([pr_num, pr.title.strip(), prtype_text, add_label_text])
-                if update_labels:
-                    pr.add_to_labels(label_to_add)
-
-            elif no_match_count == len(label_names):
-                labels_all_bad += 1
-                labels_all_bad_table.add_row([pr_num, pr.title.strip(), prtype_text, "No label or description"])
-                print("XXXX No type labels or type in description")
-            else:
-                print("**** Something went wrong, I'm confused")
+            prtype = 'Open PR'
+            if DRAFT_PR_LABEL in existing_label_names:
+                print("**** PR with incorrect wip label - removing label")
+                add_row('labels_added', prtype, "WIP label removed")
+                label_plan.remove(pr, "status:work-in-progress")
 
+        if age is None:
+            age = analytics.old_pr_age(pr['created_at'], datetime.now())
+        if age == 2:
+            print("**** More than 2 years old - adding label")
+            add_row('old_prs', "Very old PR", "Add label age:2years_plus")
+            label_plan.add(pr, "age:2years_plus")
+            label_plan.remove(pr, "age:1year_plus")
 
-# run the code... 
-if __name__ == '__main__':
-    print('\nInitialising...\n\n')
+        elif age == 1:
+            print("**** More than 1 year old - adding label")
+            add_row('old_prs', "Old PR", "Add label age:1year_plus")
+            label_plan.add(pr, "age:1year_plus")
 
-    args = load_config()
-#   repository details
-    gh_token = args['--gh_token']
-    gh = Github(gh_token)
-    repo_name = args['--repo']
-    branch = args['--branch']
-    gh_base_url = args['--gh_base_url']
-    prev_release_ver = args['--prev_release_ver']
-    prev_release_commit = args['--prev_release_commit_sha']
-    draft_pr_label = "wip"
-    update_labels = args['--update_labels']
-    if update_labels != '':
-        update_labels = bool(args['--update_labels'])
+    issue_matched_count, issue_desc_exist, issue_label_exist, label_to_add, no_match_count = \
+        match_labels(ticked_labels, existing_label_names)
+
+    if issue_matched_count == 1:
+        print("---- Matching label found - no action")
+        return rows, True
+    if issue_desc_exist > 1 or issue_label_exist > 1:
+        print("XXXX Too many label or description matches")
+        add_row('labels_mismatched', prtype, "Label/description mismatch")
+    elif issue_desc_exist > 0 and issue_label_exist > 0:
+        print("XXXX Label and description don't match")
+        add_row('labels_mismatched', prtype, "Label/description mismatch")
+    elif issue_label_exist > 0 and issue_desc_exist == 0:
+        print("XXX Label without description")
+        add_row('labels_mismatched', prtype, "Label without description")
+    elif issue_desc_exist == 1 and issue_label_exist == 0:
+        add_label_res = "++++ label '" + label_to_add[5:] + "' added"
+        print(add_label_res)
+        add_row('labels_added', prtype, add_label_res[5:])
+        label_plan.add(pr, label_to_add)
+    elif no_match_count == len(LABEL_NAMES):
+        add_row('labels_all_bad', prtype, "No label or description")
+        print("XXXX No type labels or type in description")
     else:
-        update_labels = bool(False)
-    col_title_width = 60
+        print("**** Something went wrong, I'm confused")
+    return rows, False
 
-    repo = gh.get_repo(repo_name)
-    labels_added_table = PrettyTable(["PR Number", "Title", "PR Type", "Result"])
-    labels_added_table.align["PR Type"] = "l"
-    labels_added_table.align["Title"] = "l"
-    labels_added_table.align["Result"] = "l"
-    labels_added_table._max_width = {"Title":col_title_width}
-
-    labels_all_bad_table = PrettyTable(["PR Number", "Title", "PR Type", "Result"]) 
-    labels_all_bad_table.align["Title"] = "l"
-    labels_all_bad_table.align["Result"] = "l"
-    labels_all_bad_table._max_width = {"Title":col_title_width}
-
-    labels_mismatch_table = PrettyTable(["PR Number", "Title", "PR Type", "Result"])
-    labels_mismatch_table.align["Title"] = "l"
-    labels_mismatch_table.align["Result"] = "l"
-    labels_mismatch_table._max_width = {"Title":col_title_width}
-   
-    labels_old_table = PrettyTable(["PR Number", "Title", "PR Type", "Result"])
-    labels_old_table.align["Title"] = "l"
-    labels_old_table.align["Result"] = "l"
-    labels_old_table._max_width = {"Title":col_title_width}
-
-    labels_file = "./labels"
-    labels_added = 0
-    labels_mismatched = 0
-    labels_all_bad = 0
-    labels_matched = 0
 
-    old_prs = 0
-    label_names = {"type:bug": "Bug fix", "type:enhancement": "Enhancement", "type:experimental-feature": \
-                "Experimental feature", "type:new_feature": "New feature", "type:cleanup": "Cleanup", \
-                "type:breaking_change": "Breaking change"}
+def write_label_section(report, name, table=None, labels_matched=0):
+    """
+    Write results section `name`, the counts are the table's rows
+    """
+    if name == 'labels_matched':
+        report.text('labels_matched', '%s PR labels matched' % str(labels_matched))
+    elif name == 'labels_added':
+        report.section('labels_added', 'Labels Updated in PRs:', table, '%s PRs Updated' % str(len(table)))
+    elif name == 'labels_mismatched':
+        report.section('labels_mismatched', 'PR with label not matching description:', table,
+                       '%s PRs found' % str(len(table)))
+    elif name == 'labels_all_bad':
+        report.section('labels_all_bad', 'PRs without label or description', table,
+                       '%s Unmatched PRs' % str(len(table)))
+    elif name == 'old_prs':
+        report.section('old_prs', 'Old PRs', table, '%s Old PRs' % str(len(table)))
 
 
-    ## TODO - get commit -> commit date from tag on master.
-    ## Searching seems a waste
+def report_title(repo_name):
+    return 'Results of ' + repo_name + ' open PR label trawling'
 
-    #repo_tags = repo.get_tags()
 
-    if prev_release_commit:
-        print("Previous Release Commit SHA found in conf file, skipping pre release SHA search.\n")
-        prev_release_sha = prev_release_commit
-    else:
-        print("Finding commit SHA for previous version " + prev_release_ver)
-        for tag in repo_tags:
-            if tag.name == prev_release_ver:
-                prev_release_sha = tag.commit.sha
-                #print(prev_release_sha)
-    commit = repo.get_commit(sha=prev_release_sha)
-    prev_release_commit_date=str(commit.commit.author.date.date())    #break
+def labels_unchanged(state, prs):
+    """
+    Whether each PR the checkpoint `state` checked still has the labels it saw, or the ones
+    it planned to write, going by the PR records `prs` ({number: record})
+    """
+    planned = dict((number, (set(add), set(remove))) for number, add, remove in state['plan'])
+    for number, labels in state['seen']:
+        add, remove = planned.get(number, (set(), set()))
+        if set(prs[number]['labels']) not in (set(labels), (set(labels) | add) - remove):
+            return False
+    return True
 
-    if not commit:
-        print("No starting point found via version tag or commit SHA")
-        exit
 
+def reconcile_labels(pr_repo, repo_name, open_prs, merged_prs, labels_file, update, col_title_width=60, store=None,
+                     gh_token=None, write_workers=labelplan.DEFAULT_WRITE_WORKERS, output_format="table",
+                     checkpoint_seconds=checkpoint.DEFAULT_SECONDS):
+    """
+    Check the type, WIP and age labels of open and merged PR records against their
+    descriptions, optionally fixing them on Github, and write the results to `labels_file`.
+    Checkbox scans are memoised in `store` when it is given, `output_format` is one of lib.render.FORMATS.
+
+    With a `store` the progress is checkpointed in it every `checkpoint_seconds` (0 turns it
+    off) and after each batch of label writes, and a run over the same PRs that finds a
+    checkpoint carries on from it, see lib.checkpoint. A checkpoint is dropped when the labels of
+    a PR it checked have changed since, other than by its own label writes.
+    """
+    label_plan = labelplan.LabelPlan()
+    tables = label_tables()
+    labels_matched = 0
+    checked = 0
+    applied = []
+    seen = []
+    scanner = checkboxes.CheckboxScanner(LABEL_NAMES, store)
+
+    run = None
+    if store is not None and checkpoint_seconds > 0:
+        run = checkpoint.Checkpoint(store, checkpoint.run_key(repo_name, [pr['number'] for pr in open_prs],
+                                                              [pr['number'] for pr in merged_prs]),
+                                    checkpoint_seconds)
+        prs = dict((pr['number'], pr) for pr in open_prs + merged_prs)
+        state = run.load()
+        if state and not labels_unchanged(state, prs):
+            print("- The labels of PRs changed since the checkpoint, starting over\n")
+            state = None
+        if state:
+            checked = state['checked']
+            labels_matched = state['labels_matched']
+            label_plan = labelplan.LabelPlan.from_state(state['plan'], prs)
+            applied = state['applied']
+            seen = state['seen']
+            for section, rows in state['rows'].items():
+                for row in rows:
+                    tables[section].add_row(row)
+            print("- Resuming from checkpoint: %s PRs checked, labels written on %s PRs\n"
+                  % (str(checked), str(len(applied))))
+
+    def checkpoint_state():
+        return {'checked': checked, 'labels_matched': labels_matched, 'plan': label_plan.state(),
+                'applied': applied, 'seen': seen,
+                'rows': dict((name, [list(row) for key, row in table.rows]) for name, table in tables.items())}
+
+    def check(pr, merged, age=None):
+        nonlocal checked, labels_matched
+        rows, matched = check_pr(pr, merged, scanner.ticked(pr), label_plan, age)
+        for section, section_rows in rows.items():
+            for row in section_rows:
+                tables[section].add_row(row)
+        labels_matched += int(matched)
+        checked += 1
+        if run:
+            seen.append([pr['number'], sorted(pr['labels'])])
+            run.save_due(checkpoint_state)
 
     print("Enumerating Open PRs in '" + repo_name + "' \n")
-    print("- Retrieving Pull Request Issues from Github")
-    search_string = f"repo:" + repo_name + " is:open is:pr"
-    issues = gh.search_issues(search_string)
-
-    print("- Processing Open Pull Request Issues\n")
-    for issue in issues:
-        existing_labels = []
-        label = []
-        existing_label_names = []
-        issue_matched_count = 0
-        issue_labels_mismatch = 0
-        issue_all_bad = 0
-        issue_improvement_rename = 1
-        bad_issue_count = 0
-        no_match_count = 0
-        issue_desc_exist = 0
-        issue_label_exist = 0
-        label_to_add = ''
-        issue_missing_labels = 0
-
-        pr = issue.repository.get_pull(issue.number)
-        pr_num = str(pr.number)
-        is_draft = pr.draft
-        print("\n-- Checking OPEN pr#: " + pr_num)
-        existing_labels = pr.labels
 
-        for label in existing_labels:
-            existing_label_names.append(label.name)
-        
-        if is_draft:
-            prtype = 'Draft PR'
-            if draft_pr_label not in existing_label_names:
-                print("**** Daft PR missing wip label - adding label")
-                labels_added_table.add_row([pr_num, pr.title.strip(), prtype, "WIP label added"])
-                labels_added += 1
-                if update_labels:
-                    pr.add_to_labels("status:work-in-progress")
-        if not is_draft:
-            prtype = 'Open PR'
-            if draft_pr_label in existing_label_names:
-                print("**** PR with incorrect wip label - removing label")
-                labels_added_table.add_row([pr_num, pr.title.strip(), prtype, "WIP label removed"])
-                labels_added += 1
-                if update_labels:
-                    pr.remove_from_labels("status:work-in-progress")
-        
-        creation_date = pr.created_at
-        check_date_old = datetime.now() - timedelta(days=365)
-        check_date_very_old = datetime.now() - timedelta(days=2*365)
-        if creation_date < check_date_very_old:
-            print("**** More than 2 years old - adding label")
-            old_prs += 1
-            labels_old_table.add_row([pr_num, pr.title.strip(), "Very old PR", "Add label age:2years_plus"])
-            if update_labels:
-                pr.add_to_labels("age:2years_plus")
-                try:
-                    pr.remove_from_labels("age:1year_plus")
-                except:
-                    print("")
-    
-        elif creation_date < check_date_old:
-            print("**** More than 1 year old - adding label")
-            old_prs += 1
-            labels_old_table.add_row([pr_num, pr.title.strip(), "Old PR", "Add label age:1year_plus"])
-            if update_labels:
-                pr.add_to_labels("age:1year_plus")
-
-        for label_name in label_names:
-            label_match(label_name, label_names[label_name])
-
-        label_reconcile(prtype,label_to_add)
+    print("- Processing Open Pull Requests\n")
+    ages = analytics.old_pr_ages(open_prs, datetime.now())
+    for pr, age in list(zip(open_prs, ages))[checked:]:
+        check(pr, False, age)
 
     print("\nEnumerating MERGED PRs in master\n")
 
-    print("- Retrieving Pull Request Issues from Github")
-    search_string = f"repo:apache/cloudstack is:merged merged:>={prev_release_commit_date}"
-    issues = gh.search_issues(search_string)
-    features = 0
-    fixes = 0
-    uncategorised = 0
-    enhancements = 0
-    match_found = 0
-
-    print("\nProcessing Merged Pull Request Issues\n")
-    for issue in issues:
-        existing_labels = []
-        label = []
-        existing_label_names = []
-        issue_matched_count = 0
-        issue_labels_mismatch = 0
-        issue_all_bad = 0
-        issue_improvement_rename = 1
-        bad_issue_count = 0
-        no_match_count = 0
-        issue_desc_exist = 0
-        issue_label_exist = 0
-        label_to_add = ''
-        issue_missing_labels = 0
-
-        pr = issue.repository.get_pull(issue.number)
-        pr_num = str(pr.number)
+    print("\nProcessing Merged Pull Requests\n")
+    for pr in merged_prs[max(checked - len(open_prs), 0):]:
+        check(pr, True)
 
-        print("\n-- Checking MERGED pr#: " + pr_num)
-        existing_labels = pr.labels
+    scanner.save()
+    print("- %s PR descriptions scanned for type checkboxes" % str(scanner.scanned))
+    if run:
+        run.save(checkpoint_state())
 
-        for label in existing_labels:
-            existing_label_names.append(label.name)
+    label_plan.print_changes(not update)
+    if update:
 
-        for label_name in label_names:
-            label_match(label_name, label_names[label_name])
-        
-        label_reconcile("MERGED",label_to_add)
+        def written(numbers):
+            applied.extend(numbers)
+            if run:
+                run.save(checkpoint_state())
 
+        with metrics.phase('label_writes'):
+            updated = labelplan.apply(label_plan, pr_repo.url, gh_token, write_workers, set(applied), written)
+        print("- Labels written on %s PRs" % str(len(updated)))
 
     print("\nwriting tables")
-    labels_to_add_txt = labels_added_table.get_string()
-    labels_all_bad_txt = labels_all_bad_table.get_string()
-    mismatched_labels_txt = labels_mismatch_table.get_string()
-    labels_old_txt = labels_old_table.get_string()
-    report_title = 'Results of ' + repo_name + ' open PR label trawling\n'
-    underline_length = len(report_title)
-    underline = '=' * underline_length
-
-
-    with open(labels_file ,"w") as file:
-        file.write(report_title)
-        file.write(underline)
 
-        file.write('\n\n%s PR labels matched \n\n' % str(labels_matched))
-
-        file.write('\nLabels Updated in PRs:\n\n')
-        file.write(labels_to_add_txt)
-        file.write('\n%s PRs Updated\n\n\n' % str(labels_added))
-
-        file.write('\nPR with label not matching description:\n\n')
-        file.write(mismatched_labels_txt)
-        file.write('\n%s PRs found\n\n\n' % str(labels_mismatched))
-
-        file.write('PRs without label or description\n\n')
-        file.write(labels_all_bad_txt)
-        file.write('\n%s Unmatched PRs\n\n' % str(labels_all_bad))
-
-        file.write('Old PRs\n\n')
-        file.write(labels_old_txt)
-        file.write('\n%s Old PRs\n\n' % str(old_prs))
+    with metrics.phase('render'), open(labels_file ,"w") as file:
+        report = render.renderer(output_format, file, col_title_width)
+        report.heading(report_title(repo_name))
+        for name in LABEL_SECTIONS:
+            write_label_section(report, name, tables.get(name), labels_matched)
+        report.close()
     file.close()
     with open(labels_file ,"r") as file:
         print(file.read())
     file.close()
     print(("\nTable has been output to %s\n\n" % labels_file))
+    if run:
+        run.clear()
+
+
+def main(args):
+    """
+    Run with the options in `args`, see `load_config`
+    """
+    print('\nInitialising...\n\n')
+
+#   repository details
+    gh_token = args['--gh_token']
+    metrics.start('acs_github_label_reconciler')
+    repo_name = args['--repo']
+    update_labels = str(args['--update_labels']).lower() in ('true', '1', 'yes')
+    col_title_width = 60
+    tmp_dir = args.get('--tmp_dir') or "/tmp"
+    labels_file = args.get('--labels_file') or "./labels"
+    label_write_workers = int(args.get('--label_write_workers') or labelplan.DEFAULT_WRITE_WORKERS)
+    output_format = args.get('--output_format') or "table"
+    checkpoint_seconds = float(args.get('--checkpoint_seconds') or checkpoint.DEFAULT_SECONDS)
+
+    if args.get('--docker_created_config'):
+        destination = tmp_dir + "/docker_output"
+        if not os.path.isdir(destination):
+            os.mkdir(destination)
+        labels_file = destination + "/" + (args.get('--labels_file_name') or "labels.txt")
+        if args.get('--config'):
+            os.remove(str(args['--config']))
+
+    # the labels don't need the mirror's revert index or branch windows
+    data = dataset.load_dataset(args, labels=update_labels, mirror=False)
+    if data is None:
+        return
+    open_prs, merged_prs = data.open_prs, data.merged_prs
+
+    with metrics.phase('labels', len(open_prs) + len(merged_prs)):
+        reconcile_labels(data.repo, repo_name, open_prs, merged_prs, labels_file, update_labels, col_title_width,
+                         data.store, gh_token, label_write_workers, output_format, checkpoint_seconds)
+    data.close()
+
+    metrics.current.print_summary()
+    print("Metrics written to %s\n" % ', '.join(metrics.current.write(labels_file)))
+
+
+if __name__ == '__main__':
+    main(load_config())
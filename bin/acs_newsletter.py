@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Runs the PR report and the label reconciler over one shared PR dataset, so the
+searches, the previous release lookup and the PR sync happen once per run.
+
+Usage:
+  acs_newsletter.py [--config=<config.json>]
+                    [-t <arg> | --gh_token=<arg>]
+                    [-b <arg> | --branch=<arg>]
+                    [--branches=<arg>]
+                    [--repo=<arg>]
+                    [--col_title_width=<arg>]
+                    [--plan]
+
+  acs_newsletter.py (-h | --help)
+Options:
+  -h --help                         Show this screen.
+  --config=<config.json>            Path to a JSON config file with an object of config options.
+  --gh_token=<arg>                  Required: Your Github token from https://github.com/settings/tokens
+                                      with `repo/public_repo` permissions.
+  --branch=<arg>                    The branch to report on.
+  --branches=<arg>                  Comma separated branches to report on, one PR report per branch.
+  --repo=<arg>                      The name of the repo to use [default: apache/cloudstack].
+  --col_title_width=<arg>           The width of the title column [default: 60].
+  --plan                            Print the API calls the run needs against the rate limit and stop.
+
+Takes the same config file as acs_report_prs.py plus the reconciler options:
+
+{
+	"--gh_token":"******************",
+	"--prev_release_commit_sha":"6f96b3b2b391a9b7d085f76bcafa3989d9832b4e",
+	"--branch":"master",
+	"--tmp_dir":"/tmp",
+	"--output_file_name":"prs.rst",
+	"--labels_file_name":"labels.txt",
+	"--update_labels":"False",
+	"--checkpoint_seconds":"10",
+	"--pr_discovery":"search",
+	"--output_format":"table",
+	"--required_tables":"['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs', 'release_stats']"
+}
+
+requires: python3.8 + docopt pygithub prettytable pygit2 numpy
+
+"""
+
+import docopt
+import json
+import os.path
+import sys
+from lib import classify
+from lib import dataset
+from lib import metrics
+import acs_report_prs
+import acs_github_label_reconciler
+
+
+def load_config(config=None):
+    """
+    Parse the command line arguments and load in the optional config file values, or
+    take the config values from `config` when they are read in process (acs_entrypoint.py)
+    """
+    args = docopt.docopt(__doc__, argv=[] if config is not None else None)
+    if config is not None:
+        args = acs_report_prs.merge(args, config)
+    elif args['--config'] and os.path.isfile(args['--config']):
+        json_args = {}
+        try:
+            with open(args['--config']) as json_file:
+                json_args = json.load(json_file)
+        except Exception as e:
+            print(("Failed to load config file '%s'" % args['--config']))
+            print(("ERROR: %s" % str(e)))
+        if json_args:
+            args = acs_report_prs.merge(args, json_args)
+    if not args.get('--gh_token'):
+        print("ERROR: gh_token is required")
+        sys.exit(__doc__)
+    return args
+
+
+def main(args):
+    """
+    Run with the options in `args`, see `load_config`
+    """
+    print('\nInitialising...\n\n')
+
+    gh_token = args['--gh_token']
+    repo_name = args.get('--repo') or "apache/cloudstack"
+    tmp_dir = args.get('--tmp_dir') or "/tmp"
+    destination = args.get('--destination') or "/opt"
+    output_file_name = args.get('--output_file_name') or "prs.rst"
+    labels_file_name = args.get('--labels_file_name') or "labels.txt"
+    required_tables = str(args.get('--required_tables') or
+                          ['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs'])
+    col_title_width = int(args.get('--col_title_width') or 60)
+    label_write_workers = int(args.get('--label_write_workers') or 2)
+    checkpoint_seconds = float(args.get('--checkpoint_seconds') or 10)
+    output_format = args.get('--output_format') or "table"
+    update_labels = str(args.get('--update_labels')).lower() in ('true', '1', 'yes')
+    classifier = classify.load(args.get('--classifier_rules'), acs_report_prs.REPORT_SECTIONS)
+
+    if args.get('--docker_created_config'):
+        destination = tmp_dir + "/docker_output"
+        if not os.path.isdir(destination):
+            os.mkdir(destination)
+        if args.get('--config'):
+            os.remove(str(args['--config']))
+
+    metrics.start('acs_newsletter')
+    data = dataset.load_dataset(args, labels=update_labels)
+    if data is None:
+        return
+    open_prs, merged_prs = data.open_prs, data.merged_prs
+
+    output_file = destination + "/" + output_file_name
+    with metrics.phase('report', len(open_prs) + len(merged_prs)):
+        acs_report_prs.write_branch_reports(output_file, data.branches, open_prs, data.landed_prs,
+                                            data.revert_indexes, required_tables, col_title_width, output_format,
+                                            classifier, data.prev_release_commit_date)
+    with metrics.phase('labels', len(open_prs) + len(merged_prs)):
+        acs_github_label_reconciler.reconcile_labels(data.repo, repo_name, open_prs, merged_prs,
+                                                     destination + "/" + labels_file_name, update_labels,
+                                                     col_title_width, data.store, gh_token, label_write_workers,
+                                                     output_format, checkpoint_seconds)
+    data.close()
+
+    metrics.current.print_summary()
+    print("Metrics written to %s\n" % ', '.join(metrics.current.write(output_file)))
+
+
+if __name__ == '__main__':
+    main(load_config())
@@ -23,9 +23,11 @@ Usage:
                   [-t <arg> | --gh_token=<arg>] 
                   [-c <arg> | --prev_rel_commit=<arg>]
                   [-b <arg> | --branch=<arg>]  
+                  [--branches=<arg>]
                   [--repo=<arg>] 
                   [--gh_base_url=<arg>] 
                   [--col_title_width=<arg>] 
+                  [--plan]
 
   fixed_issues.py (-h | --help)
 Options:
@@ -34,16 +36,17 @@ Options:
   --gh_token=<arg>         Required: Your Github token from https://github.com/settings/tokens 
                                       with `repo/public_repo` permissions.
   --prev_rel_commit=<arg>  Required: The commit hash of the previous release.
-  --branches=<arg>         Required: Comma separated list of branches to report on (eg: 4.7,4.8,4.9).
+  --branches=<arg>         Comma separated list of branches to report on (eg: 4.18,4.19,main), instead
+                                      of `--branch`. The PRs are fetched and the mirror walked once and
+                                      each branch gets its own report of the PRs based on it, written
+                                      to the output file name with the branch added (prs-4.19.rst).
   --new_release_ver=<arg            not used in this iteration yet
-
-                                      The last one is assumed to be `master`, so `4.7,4.8,4.9` would
-                                      actually be represented by 4.7, 4.8 and master.
   --repo=<arg>                      The name of the repo to use [default: apache/cloudstack].
   --gh_base_url=<arg>               The base Github URL for pull requests 
                                       [default: https://github.com/apache/cloudstack/pull/].
   --col_title_width=<arg>          The width of the title column [default: 60].
   --docker_created_config=<arg>     used to know whether to remove conf file if in container (for some safety)    
+  --plan                            Print the API calls the run needs against the rate limit and stop.
 
 Sample json file contents:
 
@@ -53,24 +56,38 @@ Sample json file contents:
 	"--repo_name":"apache/cloudstack",
 	"--prev_release_ver":"4.14.0.0",
 	"--branch":"master",
+	"--branches":"4.19,main",
 	"--prev_release_ver":"4.14.0.0",
 	"--new_release_ver":"4.15.0.0",
 	"--tmp_dir":"/tmp",
-	"--required_tables":"['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs']"
+	"--mirror_dir":"/tmp/mirror",
+	"--mirror_filter":"blob:none",
+	"--store_file":"/tmp/acs_prs.db",
+	"--fetch_mode":"graphql",
+	"--pr_discovery":"search",
+	"--gh_api_url":"https://api.github.com",
+	"--hydrate_workers":"8",
+	"--http_cache_file":"/tmp/acs_http_cache.db",
+	"--http_cache_mb":"100",
+	"--output_format":"table",
+	"--classifier_rules":"/opt/classifier_rules.json",
+	"--required_tables":"['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs', 'release_stats']"
 }
 
-requires: python3.8 + docopt pygithub prettytable pygit2
+requires: python3.8 + docopt pygithub prettytable pygit2 numpy
 
 """
 
 import docopt
 import json
-from github import Github
-from prettytable import PrettyTable
 import os.path
 import sys
-from  datetime import datetime, timedelta
-from lib import processors
+from  datetime import datetime
+from lib import analytics
+from lib import classify
+from lib import dataset
+from lib import metrics
+from lib import render
 import operator
 import re
 import time
@@ -79,14 +96,17 @@ import shutil
 
 
 
-def load_config():
+def load_config(config=None):
     """
-    Parse the command line arguments and load in the optional config file values
+    Parse the command line arguments and load in the optional config file values, or
+    take the config values from `config` when they are read in process (acs_entrypoint.py)
     """
     global gh_token
 
-    args = docopt.docopt(__doc__)
-    if args['--config'] and os.path.isfile(args['--config']):
+    args = docopt.docopt(__doc__, argv=[] if config is not None else None)
+    if config is not None:
+        args = merge(args, config)
+    elif args['--config'] and os.path.isfile(args['--config']):
         json_args = {}
         try:
             with open(args['--config']) as json_file:    
@@ -119,43 +139,195 @@ def merge(primary, secondary):
                 for key in set(secondary) | set(primary))
 
 
-# run the code...
-if __name__ == '__main__':
-    print('\nInitialising...\n\n')
+REPORT_SECTIONS = ['wip_features', 'merged_features', 'merged_fixes', 'dontknow', 'old_prs', 'release_stats']
 
-    args = load_config()
+def report_tables():
+    return {'wip_features': render.Table(["PR Number", "Title", "Type", "Notes"]),
+            'merged_fixes': render.Table(["PR Number", "Title", "Type", "Severity"]),
+            'merged_features': render.Table(["PR Number", "Title", "Type", "Notes"]),
+            'dontknow': render.Table(["PR Number", "Title"]),
+            'old_prs': render.Table(["PR Number", "Title", "Type", "Notes"])}
 
-# Must have either Commit SHA of last version or Verion number to proceed
-    try:
-        prev_release_ver = args['--prev_release_ver']
-    except:
-        prev_release_ver = "NULL"
-    try:
-        prev_release_commit_sha = args['--prev_release_commit_sha']
-    except:
-        prev_release_commit_sha = "NULL"
 
-    if prev_release_commit_sha == "NULL" and prev_release_ver == "NULL":
-        print("Starting commit SHA or version is required to continue")
-        sys.exit()
+def open_pr_rows(pr, required_tables, classifier=None, age=None):
+    """
+    The (section, row, sort key) report rows of an open PR record. `age` is the PR's
+    lib.analytics.old_pr_ages bucket, worked out here if not given.
+    """
+    rows = (classifier or classify.default()).rows(pr, 'open', required_tables)
+    # the report only ever listed the open PRs labelled wip
+    if "old_prs" in required_tables and 'wip' in pr['labels']:
+        if age is None:
+            age = analytics.old_pr_age(pr['created_at'], datetime.now())
+        if age == 2:
+            print("**** More than 2 years old")
+            rows.append(('old_prs', [pr['number'], pr['title'].strip(), "Very old PR", "Add label age:2years_plus"],
+                         (2, pr['number'])))
+
+        elif age == 1:
+            print("**** More than 1 year old")
+            rows.append(('old_prs', [pr['number'], pr['title'].strip(), "Old PR", "Add label age:1year_plus"],
+                         (1, pr['number'])))
+    return rows
+
+
+def merged_pr_rows(pr, reverted_shas, required_tables, classifier=None):
+    """
+    The (section, row, sort key) report rows of a merged PR record, none if it has been reverted
+    """
+    return list((classifier or classify.default()).classify([pr], 'merged', required_tables, reverted_shas))
 
-#  set defaults for optional parameters
 
-    try:
-        repo_name = args['--repo']
-    except:
-        repo_name = "apache/cloudstack"
+def stats_tables(records, features, fixes, since=None, now=None, classifier=None):
+    """
+    The release statistics of the open and merged (not reverted) PR `records` as [(name, title, table)].
+    The PR types and severities are the ones given to them in the `features` and `fixes` tables.
+    Merges are counted per week from `since`, the first merge if not given.
+    """
+    classifier = classifier or classify.default()
+    now = now or datetime.now()
+    types = {}
+    for sort_key, row in reversed(features.rows):
+        types[row[0]] = row[2]
+    severities = dict((row[0], row[3]) for sort_key, row in fixes.rows)
+    columns = analytics.PRColumns(records, types, severities)
+    if since is None:
+        since = min([r['merged_at'] for r in records if r['merged_at'] is not None] or [now])
+
+    severity_table = render.Table(["Severity", "PRs"])
+    for severity, count in columns.severity_counts().items():
+        severity_table.add_row([severity, count],
+                               (classifier.severity_order.get(severity, classifier.severity_unmatched), severity))
+    type_table = render.Table(["Type", "PRs"])
+    for type_text, count in columns.type_counts().items():
+        type_table.add_row([type_text, count])
+    age_table = render.Table(["Age", "PRs"])
+    for bucket, count in columns.age_histogram(now):
+        age_table.add_row([bucket, count])
+    weekly_table = render.Table(["Week", "PRs merged"])
+    for week, count in columns.weekly_merges(since, now):
+        weekly_table.add_row([week.isoformat(), count])
+    return [('stats_severity', 'Fixes by Severity', severity_table),
+            ('stats_types', 'Features and Enhancements', type_table),
+            ('stats_age', 'Age of Open PRs', age_table),
+            ('stats_weekly', 'Merges per Week', weekly_table)]
+
+
+def write_section(report, name, table, required_tables):
+    """
+    Write report section `name` from its table, the counts are the table's rows. The table
+    of `release_stats` is the list from `stats_tables`.
+    """
+    if name not in required_tables:
+        return
+    count = len(table)
+    if name == 'wip_features':
+        if count > 0:
+            report.section('wip_features', 'Work in Progress PRs', table, '%s PRs listed' % str(count))
+    elif name == 'merged_features':
+        if count > 0:
+            report.section('merged_features', 'New (merged) Features & Enhancements', table,
+                           '%s Features listed' % str(count))
+        else:
+            report.text('merged_features', 'No new features merged yet for next release.')
+    elif name == 'merged_fixes':
+        if count > 0:
+            report.section('merged_fixes', 'Bug Fixes (merged)', table, '%s Bugs listed' % str(count))
+        else:
+            report.text('merged_fixes', 'No new fixes merged yet for next release.')
+    elif name == 'dontknow':
+        if count > 0:
+            report.section('dontknow', 'Uncategorised Merged PRs', table,
+                           '%s uncategorised issues listed' % str(count))
+        else:
+            report.text('dontknow', 'No Uncategorised PRs to report.')
+    elif name == 'old_prs':
+        report.section('old_prs', 'Old PRs still open', table, '%s Old PRs listed' % str(count))
+    elif name == 'release_stats':
+        for stats_name, title, stats_table in table:
+            report.section(stats_name, title, stats_table)
+
+
+def write_report(output_file, open_prs, merged_prs, reverted_shas, required_tables, col_title_width,
+                 output_format="table", classifier=None, since=None):
+    """
+    Build the release tables from open and merged PR records and write them to `output_file`
+    in `output_format` (see lib.render). PRs are sorted into the tables by `classifier`
+    (lib.classify), the default rules if not given. `since` is the previous release date,
+    the start of the weekly merge counts in `release_stats`.
+    """
+    classifier = classifier or classify.default()
+    tables = report_tables()
+
+    print("Enumerating Open WIP PRs in master\n")
+
+    print("- Processing OPEN Pull Requests\n")
+    ages = analytics.old_pr_ages(open_prs, datetime.now())
+    for pr, age in zip(open_prs, ages):
+        for section, row, sort_key in open_pr_rows(pr, required_tables, classifier, age):
+            tables[section].add_row(row, sort_key)
+
+    print("\nEnumerating closed and merged PRs in master\n")
+
+    print("\nProcessing MERGED Pull Requests\n")
+    for section, row, sort_key in classifier.classify(merged_prs, 'merged', required_tables, reverted_shas):
+        tables[section].add_row(row, sort_key)
+
+    if 'release_stats' in required_tables:
+        print("\nCounting release statistics")
+        tables['release_stats'] = stats_tables(
+            open_prs + [pr for pr in merged_prs if pr['merge_commit_sha'] not in reverted_shas],
+            tables['merged_features'], tables['merged_fixes'], since, classifier=classifier)
+
+    print("\nwriting tables")
+
+    with metrics.phase('render'), open(output_file ,"w") as file:
+        report = render.renderer(output_format, file, col_title_width)
+        for name in REPORT_SECTIONS:
+            write_section(report, name, tables.get(name), required_tables)
+        report.close()
+    file.close()
+    print("\nTable has been output to %s\n\n" % output_file)
+
+
+def branch_output_file(output_file, branch):
+    base, extension = os.path.splitext(output_file)
+    return '%s-%s%s' % (base, branch.replace('/', '_'), extension)
+
+
+def write_branch_reports(output_file, branches, open_prs, merged_prs, revert_indexes, required_tables,
+                         col_title_width, output_format="table", classifier=None, since=None):
+    """
+    Write one report per branch from the open PRs based on it and the merged PRs that landed
+    on it (`merged_prs`, {branch: PRs}, see lib.reach), see `branch_output_file`. A single
+    branch keeps `output_file` and all the open PRs as before. Returns the files written.
+    """
+    if len(branches) == 1:
+        write_report(output_file, open_prs, merged_prs[branches[0]], revert_indexes[branches[0]], required_tables,
+                     col_title_width, output_format, classifier, since)
+        return [output_file]
+    files = []
+    for branch in branches:
+        print("\nReport for branch " + branch)
+        files.append(branch_output_file(output_file, branch))
+        write_report(files[-1], [pr for pr in open_prs if pr['base_ref'] == branch], merged_prs[branch],
+                     revert_indexes[branch], required_tables, col_title_width, output_format, classifier, since)
+    return files
+
+
+def main(args):
+    """
+    Run with the options in `args`, see `load_config`
+    """
+    print('\nInitialising...\n\n')
+
+#  set defaults for optional parameters
 
     try:
         new_release_ver = args['--new_release_ver']
     except:
         new_release_ver = 1
 
-    try:
-        branch = args['--branch']
-    except:
-        branch = 'master'
-    
     try:    
         output_file_name = args['--output_file_name']
     except:
@@ -188,7 +360,11 @@ if __name__ == '__main__':
     except:
         destination = "/opt"
 
-    tmp_dir="/tmp"
+    try:
+        tmp_dir = str(args['--tmp_dir'])
+    except:
+        tmp_dir = "/tmp"
+
     if docker_created_config:
         tmp_tmp_dir =  str(tmp_dir + "/docker_output")
         try:
@@ -202,202 +378,38 @@ if __name__ == '__main__':
             print ("")
         else:
             print ("Successfully created empty output directory %s " % tmp_tmp_dir)
-            os.remove(str(args['--config']))
-
-    tmp_repo_dir = str(tmp_dir) + "/repo"   
-    
-    gh = Github(gh_token)
-
-    wip_features_table = PrettyTable(["PR Number", "Title", "Type", "Notes", "_index"])
-    fixes_table = PrettyTable(["PR Number", "Title", "Type", "Severity", "_index"]) 
-    features_table = PrettyTable(["PR Number", "Title", "Type", "Notes", "_index"])
-    dontknow_table = PrettyTable(["PR Number", "Title"])
-    old_pr_table = PrettyTable(["PR Number", "Title", "Type", "Notes", "_index"])
-    old_pr_table.align["Title"] = "l"
-    wip_features_table.align["Title"] = "l"
-    features_table.align["Title"] = "l"
-    fixes_table.align["Title"] = "l"
-    dontknow_table.align["Title"] = "l"
-    old_pr_table._max_width = {"Title":col_title_width}
-    wip_features_table._max_width = {"Title":col_title_width}
-    features_table._max_width = {"Title":col_title_width}
-    fixes_table._max_width = {"Title":col_title_width}
-    dontknow_table._max_width = {"Title":col_title_width}
-
-    repo = gh.get_repo(repo_name)
-
-    ## TODO - get commit -> commit date from tag on master.
-    ## Searching seems a waste
-
-    #repo_tags = repo.get_tags()
-
-
-    if prev_release_commit_sha != "NULL":
-        print("Previous Release Commit SHA found in conf file, skipping pre release SHA search.\n")
-        prev_release_sha = prev_release_commit_sha
-    else:
-        print("Finding commit SHA for previous version " + prev_release_ver)
-        for tag in repo_tags:
-            if tag.name == prev_release_ver:
-                prev_release_sha = tag.commit.sha
-
-    commit = repo.get_commit(sha=prev_release_sha)
-    prev_release_commit_date=str(commit.commit.author.date.date())
-    if not commit:
-        print("No starting point found via version tag or commit SHA")
-        exit
-
-    print("Enumerating Open WIP PRs in master\n")
-    print("- Retrieving Pull Request Issues from Github")
-    search_string = f"repo:apache/cloudstack is:open is:pr label:wip"
-    issues = gh.search_issues(search_string)
-    wip_features = 0
-    old_prs = 0
-
-    print("- Processing OPEN Pull Requests (as issues)\n")
-    for issue in issues:
-        pr = issue.repository.get_pull(issue.number)
-        label = []
-        pr_num = str(pr.number)
-        labels = pr.labels
-        if "wip_features" in required_tables:
-            if [l.name for l in labels if l.name=='wip']:
-                wip_features_table.add_row([pr_num, pr.title.strip(), "-", "-", 1]) 
-                print("-- Found open PR : " + pr_num + " with WIP label")
-                wip_features += 1
-        if "old_prs" in required_tables:
-            creation_date = pr.created_at
-            check_date_old = datetime.now() - timedelta(days=365)
-            check_date_very_old = datetime.now() - timedelta(days=2*365)
-            if creation_date < check_date_very_old:
-                print("**** More than 2 years old")
-                old_prs += 1
-                old_pr_table.add_row([pr_num, pr.title.strip(), "Very old PR", "Add label age:2years_plus", 2])
-
-            elif creation_date < check_date_old:
-                print("**** More than 1 year old")
-                old_prs += 1
-                old_pr_table.add_row([pr_num, pr.title.strip(), "Old PR", "Add label age:1year_plus", 1])
+            if args['--config']:
+                os.remove(str(args['--config']))
 
+    try:
+        output_format = str(args['--output_format'])
+    except:
+        output_format = "table"
 
-    print("\nEnumerating closed and merged PRs in master\n")
-
-    print("- Retrieving Pull Request Issues from Github")
-    search_string = f"repo:apache/cloudstack is:closed is:pr is:merged merged:>={prev_release_commit_date}"
-    issues = gh.search_issues(search_string)
-    features = 0
-    fixes = 0
-    uncategorised = 0
-
-    print("\nFinding reverted PRs")
-    reverted_shas = processors.get_reverted_commits(repo, branch,prev_release_commit_date, tmp_repo_dir)
-    print("- Found these reverted commits:\n", reverted_shas)
-
-    print("\nProcessing MERGED Pull Request Issues\n")
-    for issue in issues:
-        label_matches = 0
-        pr = issue.repository.get_pull(issue.number)
-        pr_commit_sha = pr.merge_commit_sha
-        if pr_commit_sha in reverted_shas:
-            print("- Skipping PR %s, its been reverted", pr.merge_commit_sha)
-        else:
-            label = []
-            severity_label = []
-            pr_num = str(pr.number)
-            labels = pr.labels
-            severity_label_match = 0
-            severity_label_test = ''
-
-            for l in labels:
-                severity_label_test = l.name.find("Severity")
-                if int(severity_label_test) != -1:
-                    severity_label = l.name[9:]
-                    severity_label_match += 1 
-            if severity_label_match != 1:
-                severity_label = "unmatched"
-            
-            index_dict = {"BLOCKER":"01","Critical":"02", "Major":"03", "Minor":"04", "Trivial":"05", "none":"98", "unmatched":"99"}
-
-            severity_index = index_dict[severity_label]
-
-            if "merged_features" in required_tables:
-                if [l.name for l in labels if l.name=='type:new-feature' or l.name=='type:new_feature']:
-                    features_table.add_row([pr_num, pr.title.strip(), "New Feature", "-", 1 ]) 
-                    print("-- Found PR: " + pr_num + " with feature label")
-                    features += 1
-                    label_matches += 1
-            if "merged_features" in required_tables:
-                if [l.name for l in labels if l.name=='type:enhancement']:
-                    features_table.add_row([pr_num, pr.title.strip(), "Enhancement", "-", 2]) 
-                    print("-- Found PR: " + pr_num + " with enhancement label")
-                    features += 1
-                    label_matches += 1
-            if "merged_fixes" in required_tables:
-                if [l.name for l in labels if l.name == 'type:bug' or l.name == 'type:cleanup']:
-                    fixes_table.add_row([pr_num, pr.title.strip(), "Bug Fix", severity_label, severity_index]) 
-                    print("-- Found PR: " + pr_num + " with fix label, Severity of " + str(severity_label))
-                    fixes += 1
-                    label_matches += 1
-            if "dontknow" in required_tables:
-                if label_matches == 0:
-                    print("-- Found PR: " + pr_num + " with no matching label")
-                    dontknow_table.add_row([pr_num, pr.title.strip()])
-                    uncategorised += 1
+    try:
+        classifier_rules = args['--classifier_rules']
+    except:
+        classifier_rules = None
+    classifier = classify.load(classifier_rules, REPORT_SECTIONS)
 
-    print("\nwriting tables")
+    metrics.start('acs_report_prs')
+    data = dataset.load_dataset(args)
+    if data is None:
+        return
 
     if docker_created_config:
         output_file = str(tmp_tmp_dir + "/" + output_file_name)
     else:
         output_file = str(destination + "/" + output_file_name)
 
-    with open(output_file ,"w") as file:
-
-        if "wip_features" in required_tables:
-            if wip_features > 0:
-                wip_features_table.sortby = "_index"
-                wip_features_table_txt = wip_features_table.get_string(fields=["PR Number", "Title", "Type", "Notes"])
-                file.write('\nWork in Progress PRs\n\n')
-                file.write(wip_features_table_txt)
-                file.write('\n%s PRs listed\n\n' % str(wip_features))
-
-        if "merged_features" in required_tables:
-            if features > 0:
-                features_table.sortby = "_index"
-                features_table_txt = features_table.get_string(fields=["PR Number", "Title", "Type", "Notes"])
-                file.write('New (merged) Features & Enhancements\n\n')
-                file.write(features_table_txt)
-                file.write('\n%s Features listed\n\n' % str(features))
-            else:
-                file.write('No new features merged yet for next release.\n\n')
-
-        if "merged_fixes" in required_tables:
-            if fixes > 0:
-                fixes_table.sortby = "_index"
-                fixes_table_txt = fixes_table.get_string(fields=["PR Number", "Title", "Type", "Severity"])
-                file.write('Bug Fixes (merged)\n\n')        
-                file.write(fixes_table_txt)
-                file.write('\n%s Bugs listed\n\n' % str(fixes))
-            else:
-                file.write('No new fixes merged yet for next release.\n\n')
-
-        if "dontknow" in required_tables:
-            if uncategorised > 0:
-                dontknow_table.sortby = "PR Number"
-                dontknow_table_txt = dontknow_table.get_string(fields=["PR Number", "Title"])
-                file.write('Uncategorised Merged PRs\n\n')
-                file.write(dontknow_table_txt)
-                file.write('\n%s uncategorised issues listed\n\n' % str(uncategorised))
-            else:
-                file.write('No Uncategorised PRs to report.\n\n')
-
-        if "old_prs" in required_tables:
-            old_pr_table.sortby = "Notes"
-            old_pr_txt = old_pr_table.get_string(fields=["PR Number", "Title", "Type", "Notes"])
-            file.write('Old PRs still open\n\n')
-            file.write(old_pr_txt)
-            file.write('\n%s Old PRs listed\n\n' % str(old_prs))
-    file.close()
-    print("\nTable has been output to %s\n\n" % output_file)
+    with metrics.phase('report', len(data.open_prs) + len(data.merged_prs)):
+        write_branch_reports(output_file, data.branches, data.open_prs, data.landed_prs, data.revert_indexes,
+                             required_tables, col_title_width, output_format, classifier, data.prev_release_commit_date)
+    data.close()
+
+    metrics.current.print_summary()
+    print("Metrics written to %s\n" % ', '.join(metrics.current.write(output_file)))
 
- 
\ No newline at end of file
+
+if __name__ == '__main__':
+    main(load_config())
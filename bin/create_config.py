@@ -17,66 +17,69 @@
 # specific language governing permissions and limitations
 # under the License.
 
-import os
-
-global tmp_dir
-global output_file_name
-global destination
-
-working_dir = os.environ.get('destination')
-config_file = f"{working_dir}/conf.txt"
+"""
+Builds the script config from the container's environment variables. Run on its own it
+writes `$destination/conf.txt` for `--config`, acs_entrypoint.py calls `config_from_env`
+and skips the file.
+"""
 
-with open(config_file ,"w") as file:
-    file.write('{\n')
-    if 'gh_token' in os.environ:
-        gh_token = os.environ.get('gh_token')
-        file.write('    "--gh_token":"' + str(gh_token) + '",\n')
-
-    if 'prev_release_commit_sha' in os.environ:
-        prev_release_commit_sha = os.environ.get('prev_release_commit_sha')
-        file.write('    "--prev_release_commit_sha":"' + str(prev_release_commit_sha) + '",\n')
-
-    if 'branch' in os.environ:
-        branch = os.environ.get('branch')
-        file.write('    "--branch":"' + str(branch) + '",\n')
+import json
+import os
 
-    if 'repo_name' in os.environ:
-        repo_name = os.environ.get('repo_name')
-        file.write('    "--repo_name":"' + str(repo_name) + '",\n')
+# environment variable -> default, each becomes the "--<name>" config value
+CONFIG_VARS = [
+    ('gh_token', None),
+    ('prev_release_commit_sha', None),
+    ('prev_release_ver', None),
+    ('branch', None),
+    ('branches', None),
+    ('repo_name', None),
+    ('gh_base_url', None),
+    ('col_title_width', None),
+    ('tmp_dir', '/tmp'),
+    ('mirror_dir', None),
+    ('mirror_filter', None),
+    ('store_file', None),
+    ('fetch_mode', None),
+    ('pr_discovery', None),
+    ('gh_api_url', None),
+    ('hydrate_workers', None),
+    ('destination', '/opt'),
+    ('output_file_name', 'prs.rst'),
+    ('labels_file_name', None),
+    ('output_format', None),
+    ('http_cache_file', None),
+    ('http_cache_mb', None),
+    ('webhook_port', None),
+    ('webhook_secret', None),
+    ('refresh_hours', None),
+    ('classifier_rules', None),
+    ('update_labels', None),
+    ('checkpoint_seconds', None),
+    ('plan', None),
+]
 
-    if 'gh_base_url' in os.environ:
-        gh_base_url = os.environ.get('gh_base_url')
-        file.write('    "--gh_base_url":"' + str(gh_base_url) + '",\n')
 
-    if 'col_title_width' in os.environ:
-        col_title_width = os.environ.get('col_title_width')
-        file.write('    "--col_title_width":"' +  str(col_title_width) + '",\n')
+def config_from_env(environ):
+    """
+    The config values set in `environ`, with the defaults above
+    """
+    config = {}
+    for name, default in CONFIG_VARS:
+        value = environ.get(name, default)
+        if value is not None:
+            config['--' + name] = str(value)
+    config['--docker_created_config'] = 'True'
+    return config
 
-    if 'tmp_dir' in os.environ:
-        tmp_dir = os.environ.get('tmp_dir')
-        file.write('    "--tmp_dir":"' + str(tmp_dir) + '",\n')
-    else:
-        file.write('    "--tmp_dir":"/tmp,"\n')
 
-    if 'destination' in os.environ:
-        destination = os.environ.get('destination')
-        file.write('    "--destination":"' + str(destination) + '",\n')
-    else:
-        file.write('    "--destination":"/opt",\n')
+if __name__ == '__main__':
+    working_dir = os.environ.get('destination')
+    config_file = f"{working_dir}/conf.txt"
 
-    if 'output_file_name' in os.environ:
-        output_file_name = os.environ.get('output_file_name')
-        file.write('    "--output_file_name":"' + str(output_file_name) + '",\n')
-    else:
-        file.write('    "--output_file_name":"prs.rst",\n')
-        
-    if 'update_labels' in os.environ:
-        update_labels = os.environ.get('update_labels')
-        file.write('    "--update_labels":"' + str(update_labels) + '",\n')
-     
-    file.write('    "--docker_created_config":"True"')
-    file.write('\n}\n   ')   
-    file.close()
+    with open(config_file ,"w") as file:
+        json.dump(config_from_env(os.environ), file, indent=4)
+        file.write('\n')
 
     # Clear vars from environment 'memory'
     os.environ.clear()
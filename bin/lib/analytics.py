@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Columnar view of the PR records for release statistics.
+
+The records are packed into one NumPy structured array (number, state, created,
+merged, plus the report type and severity as category codes), and every statistic
+is a vectorized count over its columns: fixes by severity, features against
+enhancements, the age of open PRs and merges per week. Age bucketing for the
+`old_prs` sections works on the whole created column at once.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NAT = np.iinfo(np.int64).min
+
+STATES = ('open', 'closed', 'merged')
+
+# days, the `old_prs` buckets: 1 is over a year old, 2 over two years
+OLD_PR_DAYS = (365, 2 * 365)
+
+AGE_BUCKETS = (('< 1 month', 30), ('1-3 months', 91), ('3-6 months', 182), ('6-12 months', 365),
+               ('1-2 years', 2 * 365), ('2+ years', None))
+
+
+def datetime_column(values):
+    """
+    datetime64[us] array of naive datetimes, None is NaT. Counting the microseconds from the
+    epoch in Python is several times quicker than letting NumPy convert datetime objects.
+    """
+    return np.fromiter(((value - EPOCH) // MICROSECOND if value is not None else NAT for value in values),
+                       dtype=np.int64, count=len(values)).view('datetime64[us]')
+
+
+def old_pr_age(created_at, now):
+    """
+    The `old_prs` bucket of one creation date, see `old_pr_ages`
+    """
+    if created_at < now - timedelta(days=OLD_PR_DAYS[1]):
+        return 2
+    if created_at < now - timedelta(days=OLD_PR_DAYS[0]):
+        return 1
+    return 0
+
+
+def old_pr_ages(records, now):
+    """
+    The `old_prs` bucket of every record: 0, 1 (over a year old) or 2 (over two years)
+    """
+    created = datetime_column([r['created_at'] for r in records])
+    now = np.datetime64(now, 'us')
+    return sum((created < now - np.timedelta64(days, 'D')).astype(np.int8) for days in OLD_PR_DAYS)
+
+
+class PRColumns:
+
+    def __init__(self, records, types=None, severities=None):
+        """
+        Pack `records` into columns. `types` and `severities` map PR numbers to the report
+        type text and severity of the PR, the names are kept in `type_names` / `severity_names`.
+        """
+        types = types or {}
+        severities = severities or {}
+        self.type_names = sorted(set(types.values()))
+        self.severity_names = sorted(set(severities.values()))
+        type_codes = dict((name, i) for i, name in enumerate(self.type_names))
+        severity_codes = dict((name, i) for i, name in enumerate(self.severity_names))
+        state_codes = dict((name, i) for i, name in enumerate(STATES))
+        count = len(records)
+        self.data = np.empty(count, dtype=[('number', 'i8'), ('state', 'i1'), ('created', 'datetime64[us]'),
+                                           ('merged', 'datetime64[us]'), ('type', 'i2'), ('severity', 'i2')])
+        self.data['number'] = np.fromiter((r['number'] for r in records), dtype=np.int64, count=count)
+        self.data['state'] = np.fromiter((state_codes.get(r['state'], 0) for r in records), dtype=np.int8,
+                                         count=count)
+        self.data['created'] = datetime_column([r['created_at'] for r in records])
+        self.data['merged'] = datetime_column([r['merged_at'] for r in records])
+        self.data['type'] = np.fromiter((type_codes.get(types.get(r['number']), -1) for r in records),
+                                        dtype=np.int16, count=count)
+        self.data['severity'] = np.fromiter((severity_codes.get(severities.get(r['number']), -1) for r in records),
+                                            dtype=np.int16, count=count)
+
+    def __len__(self):
+        return len(self.data)
+
+    def where_state(self, state):
+        return self.data[self.data['state'] == STATES.index(state)]
+
+    def counts(self, column, names):
+        """
+        {name: PRs} of a category column, categories without PRs are left out
+        """
+        codes = self.data[column]
+        totals = np.bincount(codes[codes >= 0], minlength=len(names))
+        return dict((name, int(total)) for name, total in zip(names, totals) if total)
+
+    def severity_counts(self):
+        return self.counts('severity', self.severity_names)
+
+    def type_counts(self):
+        return self.counts('type', self.type_names)
+
+    def age_histogram(self, now, buckets=AGE_BUCKETS):
+        """
+        [(bucket, open PRs)] by the age of the open PRs on `now`
+        """
+        ages = (np.datetime64(now, 'us') - self.where_state('open')['created']) // np.timedelta64(1, 'D')
+        edges = [days for name, days in buckets if days is not None]
+        totals = np.bincount(np.searchsorted(edges, ages, side='right'), minlength=len(buckets))
+        return [(name, int(total)) for (name, days), total in zip(buckets, totals)]
+
+    def weekly_merges(self, since, until):
+        """
+        [(week start, PRs merged)] for the weeks from `since` to `until`
+        """
+        merged = self.where_state('merged')['merged']
+        start = np.datetime64(since, 'us')
+        weeks = max(int((np.datetime64(until, 'us') - start) // np.timedelta64(7, 'D')) + 1, 0)
+        offsets = (merged[merged >= start] - start) // np.timedelta64(7, 'D')
+        totals = np.bincount(offsets.astype(np.int64), minlength=weeks)
+        return [((start + np.timedelta64(7 * week, 'D')).astype('datetime64[D]').item(), int(total))
+                for week, total in enumerate(totals)]
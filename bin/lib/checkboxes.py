@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Finds the ticked PR type checkboxes ("- [x] Bug fix ...") in PR descriptions.
+
+All the type texts are compiled into one alternation, so a body is scanned once
+for every type instead of once per type. Results are memoised by body hash and
+can be kept in the PR store, so unchanged descriptions are never scanned again.
+"""
+
+import hashlib
+import re
+
+from lib import prstore
+
+
+def compile_checkboxes(label_names):
+    """
+    One case-insensitive pattern matching a ticked checkbox for any of the type texts
+    """
+    texts = sorted(label_names.values(), key=len, reverse=True)
+    return re.compile(r'- \[ ?x ?\] (' + '|'.join(re.escape(text) for text in texts) + ') ', re.I)
+
+
+class CheckboxScanner:
+
+    def __init__(self, label_names, store=None):
+        """
+        `label_names` maps a label to its checkbox text, as in the label reconciler
+        """
+        self.pattern = compile_checkboxes(label_names)
+        self.labels = dict((text.lower(), label) for label, text in label_names.items())
+        # the memo is only valid for this set of checkbox texts
+        self.key = hashlib.sha1(self.pattern.pattern.encode('utf-8')).hexdigest()[:12]
+        self.store = store
+        self.memo = store.checkboxes(self.key) if store is not None else {}
+        self.new = {}
+        self.scanned = 0
+
+    def scan(self, body):
+        if not body:
+            return frozenset()
+        self.scanned += 1
+        return frozenset(self.labels[match.group(1).lower()] for match in self.pattern.finditer(body))
+
+    def ticked(self, pr):
+        """
+        Labels whose checkbox is ticked in the body of a PR record
+        """
+        digest = pr.get('body_hash') or prstore.body_hash(pr.get('body'))
+        if digest not in self.memo:
+            self.memo[digest] = self.scan(pr.get('body'))
+            self.new[digest] = self.memo[digest]
+        return self.memo[digest]
+
+    def save(self):
+        if self.store is not None and self.new:
+            self.store.save_checkboxes(self.key, self.new)
+        self.new = {}
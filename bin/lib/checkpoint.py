@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Checkpoints of a label reconciler run, so a run that dies part way through resumes
+where it stopped instead of starting over.
+
+A checkpoint is a JSON object kept in the meta table of the PR store, written in one
+transaction so a kill leaves either the old or the new one. It is only resumed by a run
+over the same PRs, see `run_key`, and is dropped once the run's results are written.
+"""
+
+import hashlib
+import json
+import time
+
+META_KEY = 'label_checkpoint'
+
+DEFAULT_SECONDS = 10
+
+
+def run_key(*parts):
+    """
+    Hash of the JSON of `parts`, eg the open and merged PR numbers in the order they are checked
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+
+    def __init__(self, store, key, seconds=DEFAULT_SECONDS):
+        """
+        Checkpoint of the run `key` in the PR store `store`, saved at most every `seconds`
+        by `save_due`
+        """
+        self.store = store
+        self.key = key
+        self.seconds = seconds
+        self.saved_at = time.monotonic()
+        self.saves = 0
+
+    def load(self):
+        """
+        The state saved by an earlier run with the same key, None if there isn't one
+        """
+        value = self.store.get_meta(META_KEY)
+        if not value:
+            return None
+        try:
+            checkpoint = json.loads(value)
+        except ValueError:
+            return None
+        if checkpoint.get('key') != self.key:
+            return None
+        return checkpoint['state']
+
+    def save(self, state):
+        self.store.set_meta(META_KEY, json.dumps({'key': self.key, 'state': state}))
+        self.saved_at = time.monotonic()
+        self.saves += 1
+
+    def save_due(self, state):
+        """
+        Save `state` if the last save is `seconds` old. `state` is a function returning
+        the state so it is only built when it is saved.
+        """
+        if time.monotonic() - self.saved_at >= self.seconds:
+            self.save(state())
+
+    def clear(self):
+        self.store.set_meta(META_KEY, None)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Rule table that sorts PRs into the report sections by their labels.
+
+The rules are data, `DEFAULT_RULES` or a JSON file of the same shape given as
+`--classifier_rules`, so a new label taxonomy needs no code change:
+
+{
+  "rules": [
+    {"section": "merged_fixes", "labels": ["type:bug", "type:cleanup"], "type": "Bug Fix",
+     "detail": "severity", "sort": "severity"},
+    {"section": "wip_features", "state": "open", "labels": ["wip"], "type": "-", "sort": 1}
+  ],
+  "unmatched": "dontknow",
+  "severity": {"prefix": "Severity:", "order": {"BLOCKER": 1, "Critical": 2}, "unmatched": 99}
+}
+
+A rule applies to merged PRs unless `state` says otherwise, and gives a PR with any
+of its labels a row in `section` with `type` and `detail` ("-", or "severity" for
+the value of the PR's one severity label), sorted by `sort` (a number, or "severity"
+for the severity order). Merged PRs no rule matched go to `unmatched`.
+
+The table is compiled once: each rule is a bit, and each label name is interned the
+first time it is seen with the mask of the rules it triggers and its severity. A PR
+then costs one dict lookup per label and a test of the bits that are set.
+"""
+
+import json
+
+STATES = ('open', 'merged')
+
+DEFAULT_RULES = {
+    'rules': [
+        {'section': 'wip_features', 'state': 'open', 'labels': ['wip'], 'type': '-', 'sort': 1},
+        {'section': 'merged_features', 'labels': ['type:new-feature', 'type:new_feature'], 'type': 'New Feature',
+         'sort': 1},
+        {'section': 'merged_features', 'labels': ['type:enhancement'], 'type': 'Enhancement', 'sort': 2},
+        {'section': 'merged_fixes', 'labels': ['type:bug', 'type:cleanup'], 'type': 'Bug Fix', 'detail': 'severity',
+         'sort': 'severity'},
+    ],
+    'unmatched': 'dontknow',
+    'severity': {'prefix': 'Severity:',
+                 'order': {'BLOCKER': 1, 'Critical': 2, 'Major': 3, 'Minor': 4, 'Trivial': 5, 'none': 98},
+                 'unmatched': 99},
+}
+
+
+class Classifier:
+
+    def __init__(self, rules=None, sections=None):
+        """
+        Compile `rules` (DEFAULT_RULES if not given). `sections` are the allowed section names.
+        """
+        rules = rules or DEFAULT_RULES
+        self.rules = []
+        self.rule_labels = {}
+        self.state_masks = dict((state, 0) for state in STATES)
+        for i, rule in enumerate(rules['rules']):
+            bit = 1 << i
+            state = rule.get('state', 'merged')
+            if state not in STATES:
+                raise ValueError("Rule %s: state must be one of %s" % (i, ', '.join(STATES)))
+            if sections is not None and rule['section'] not in sections:
+                raise ValueError("Rule %s: unknown section '%s', use one of %s" % (i, rule['section'],
+                                                                                  ', '.join(sections)))
+            self.state_masks[state] |= bit
+            for label in rule['labels']:
+                self.rule_labels[label] = self.rule_labels.get(label, 0) | bit
+            self.rules.append((rule['section'], rule['type'], rule.get('detail') == 'severity', rule.get('sort', 1),
+                               rule['labels'][0]))
+        self.unmatched = rules.get('unmatched', 'dontknow')
+        severity = rules.get('severity') or {}
+        self.severity_prefix = severity.get('prefix')
+        self.severity_order = severity.get('order') or {}
+        self.severity_unmatched = severity.get('unmatched', 99)
+        # label name -> (rule mask, severity or None)
+        self.labels = {}
+        # required_tables -> rule mask, rule mask -> rules
+        self.required_masks = {}
+        self.mask_rules = {}
+
+    def intern(self, label):
+        entry = self.labels.get(label)
+        if entry is None:
+            severity = None
+            if self.severity_prefix and label.startswith(self.severity_prefix):
+                severity = label[len(self.severity_prefix):]
+            entry = self.labels[label] = (self.rule_labels.get(label, 0), severity)
+        return entry
+
+    def required_mask(self, required_tables):
+        # the scripts pass the table list as its string form, but take a list too
+        required_tables = str(required_tables)
+        mask = self.required_masks.get(required_tables)
+        if mask is None:
+            mask = 0
+            for i, rule in enumerate(self.rules):
+                if rule[0] in required_tables:
+                    mask |= 1 << i
+            self.required_masks[required_tables] = mask
+        return mask
+
+    def matching_rules(self, mask):
+        """
+        The rules whose bits are set in `mask`, in rule table order
+        """
+        rules = self.mask_rules.get(mask)
+        if rules is None:
+            rules = []
+            bits = mask
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                rules.append(self.rules[bit.bit_length() - 1])
+            self.mask_rules[mask] = rules
+        return rules
+
+    def classify(self, prs, state, required_tables, reverted_shas=None):
+        """
+        Yield the (section, row, sort key) report rows of every PR record in `prs`, all in
+        `state` ('open' or 'merged'), for the sections in `required_tables`. Merged PRs whose
+        merge commit is in `reverted_shas` get none.
+        """
+        wanted = self.state_masks[state] & self.required_mask(required_tables)
+        unmatched = self.unmatched if state == 'merged' and self.unmatched in required_tables else None
+        labels = self.labels
+        for pr in prs:
+            if reverted_shas is not None and pr['merge_commit_sha'] in reverted_shas:
+                print("- Skipping PR %s, its been reverted" % pr['merge_commit_sha'])
+                continue
+            mask = 0
+            severity = None
+            severities = 0
+            for label in pr['labels']:
+                entry = labels.get(label) or self.intern(label)
+                mask |= entry[0]
+                if entry[1] is not None:
+                    severity = entry[1]
+                    severities += 1
+            if severities != 1:
+                severity = "unmatched"
+            number = pr['number']
+            rules = self.matching_rules(mask & wanted)
+            for section, type_text, with_severity, sort, label in rules:
+                if sort == 'severity':
+                    sort = self.severity_order.get(severity, self.severity_unmatched)
+                if with_severity:
+                    print("-- Found PR: %s with %s label, Severity of %s" % (number, label, severity))
+                    yield section, [number, pr['title'].strip(), type_text, severity], (sort, number)
+                else:
+                    print("-- Found PR: %s with %s label" % (number, label))
+                    yield section, [number, pr['title'].strip(), type_text, "-"], (sort, number)
+            if not rules and unmatched:
+                print("-- Found PR: %s with no matching label" % number)
+                yield unmatched, [number, pr['title'].strip()], number
+
+    def rows(self, pr, state, required_tables):
+        """
+        The report rows of one PR record, see `classify`
+        """
+        return list(self.classify([pr], state, required_tables))
+
+
+default_classifier = None
+
+
+def default():
+    """
+    The compiled DEFAULT_RULES, shared by every caller
+    """
+    global default_classifier
+    if default_classifier is None:
+        default_classifier = Classifier()
+    return default_classifier
+
+
+def load(path=None, sections=None):
+    """
+    Compile the rule table in the JSON file `path`, or the default one
+    """
+    if not path:
+        return default()
+    with open(path) as rules_file:
+        return Classifier(json.load(rules_file), sections)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Estimates the Github API calls a run still needs before the PR sync, and plans the run
+against the rate limit.
+
+The searches `prstore.sync` would run are counted, one count call each, and the counts
+are turned into calls per rate limit resource for each way of fetching:
+
+  graphql   a call per 100 PRs, plus the counts of splitting searches over the 1000
+            result cap into date windows (lib.shards)
+  rest      a search call per 30 PRs and a core call per PR (get_pull)
+  cached    nothing to fetch, the PR store is up to date and the sync is skipped
+
+Merged PRs found in the mirror (lib.discover) replace the merged search and are fetched
+by number, a GraphQL call per 100 or a core call each.
+
+With label updates on, each PR fetched is counted as one core label write at most. The
+estimate is compared with `/rate_limit`, which doesn't count against the limit. The
+configured fetch mode is used when it fits the remaining budget, then the other one, and
+when neither does the run waits for the reset of the resources that are short. The counts
+are handed on to the sync, so planning adds no calls to a run.
+"""
+
+import json
+import math
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from lib import graphql
+from lib import metrics
+from lib import prstore
+from lib import shards
+
+REST_PAGE_SIZE = 30
+
+FETCH_MODES = ('graphql', 'rest')
+
+RESOURCES = ('core', 'search', 'graphql')
+
+
+def search_windows(total, cap=shards.SEARCH_CAP):
+    """
+    About how many date windows lib.shards splits a search with `total` results into
+    """
+    if total < cap:
+        return 1
+    return 2 ** math.ceil(math.log2((total + 1) / cap))
+
+
+def pages(total, windows, page_size):
+    """
+    Result pages of `total` results spread over `windows` searches, an empty search is a page too
+    """
+    return windows * max(math.ceil(total / windows / page_size), 1)
+
+
+def fetch_calls(fetch_mode, counts, numbers=0):
+    """
+    {resource: calls} to fetch the searches in `counts` ({search: results}) and `numbers`
+    PRs by number with `fetch_mode`, the first count of each search is already made
+    """
+    calls = dict((resource, 0) for resource in RESOURCES)
+    if fetch_mode == 'graphql':
+        calls['graphql'] += math.ceil(numbers / graphql.PAGE_SIZE)
+    else:
+        calls['core'] += numbers
+    for total in counts.values():
+        windows = search_windows(total)
+        # every split counts both halves
+        window_counts = 2 * (windows - 1)
+        if fetch_mode == 'graphql':
+            calls['graphql'] += window_counts + pages(total, windows, graphql.PAGE_SIZE)
+        else:
+            calls['search'] += window_counts + pages(total, windows, REST_PAGE_SIZE)
+            calls['core'] += total
+    return calls
+
+
+def rate_limits(api_url, gh_token):
+    """
+    {resource: {'limit', 'remaining', 'reset'}} from `/rate_limit`, None when the server
+    has no rate limit (Github Enterprise with rate limiting off)
+    """
+    request = urllib.request.Request(
+        api_url.rstrip('/') + '/rate_limit',
+        headers={'Authorization': 'token ' + str(gh_token),
+                 'Accept': 'application/vnd.github+json',
+                 'User-Agent': 'acs-newsletter'})
+    try:
+        status, headers, body = metrics.urlopen(request)
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    resources = json.loads(body.decode('utf-8'))['resources']
+    return dict((resource, resources[resource]) for resource in RESOURCES if resource in resources)
+
+
+class RunPlan:
+
+    def __init__(self, counts, label_writes, limits, preferred, numbers=0):
+        """
+        Plan fetching the searches in `counts` ({search: results}) and `numbers` PRs by
+        number plus `label_writes` label writes against `limits` (see `rate_limits`),
+        `preferred` is `--fetch_mode`
+        """
+        self.counts = counts
+        self.numbers = numbers
+        self.label_writes = label_writes
+        self.limits = limits
+        self.preferred = preferred if preferred in FETCH_MODES else 'graphql'
+        self.estimates = {}
+        for fetch_mode in FETCH_MODES:
+            calls = fetch_calls(fetch_mode, counts, numbers)
+            calls['core'] += label_writes
+            self.estimates[fetch_mode] = calls
+        self.fetch_mode, self.wait_until, self.note = self.choose()
+
+    def short(self, fetch_mode, budget):
+        """
+        The resources `fetch_mode` needs more calls of than `budget` ('remaining' or 'limit') has
+        """
+        if self.limits is None:
+            return []
+        return [resource for resource, calls in sorted(self.estimates[fetch_mode].items())
+                if resource in self.limits and calls > self.limits[resource][budget]]
+
+    def choose(self):
+        """
+        (fetch mode or None for cached, unix time to wait until or None, why)
+        """
+        if not sum(self.counts.values()) and not self.numbers:
+            return None, None, "the PR store is up to date"
+        if self.limits is None:
+            return self.preferred, None, "the server has no rate limit"
+        modes = [self.preferred] + [mode for mode in FETCH_MODES if mode != self.preferred]
+        for fetch_mode in modes:
+            if not self.short(fetch_mode, 'remaining'):
+                return fetch_mode, None, "fits the remaining budget"
+        waits = []
+        for fetch_mode in modes:
+            if not self.short(fetch_mode, 'limit'):
+                resets = [self.limits[resource]['reset'] for resource in self.short(fetch_mode, 'remaining')]
+                waits.append((max(resets), fetch_mode))
+        if waits:
+            wait_until, fetch_mode = min(waits)
+            return fetch_mode, wait_until, "fits once the rate limit resets"
+        return self.preferred, None, "needs more than a full budget, the run pauses on the rate limit"
+
+    @property
+    def strategy(self):
+        return self.fetch_mode or 'cached'
+
+    def print_plan(self):
+        print("Run plan:")
+        print("- %s searches, %s PRs to fetch, at most %s label writes"
+              % (len(self.counts), sum(self.counts.values()) + self.numbers, self.label_writes))
+        if self.numbers:
+            print("- %s of the PRs are merged PRs from the mirror, fetched by number" % self.numbers)
+        print("  %-10s %8s %8s %8s" % (('',) + RESOURCES))
+        for fetch_mode in FETCH_MODES:
+            print("  %-10s %8s %8s %8s" % ((fetch_mode,) + tuple(self.estimates[fetch_mode][r] for r in RESOURCES)))
+        if self.limits is not None:
+            print("  %-10s %8s %8s %8s" % (('remaining',) + tuple(self.limits.get(r, {}).get('remaining', '-')
+                                                                  for r in RESOURCES)))
+        if self.wait_until:
+            print("- Strategy: %s, %s at %s UTC" % (self.strategy, self.note,
+                                                    datetime.utcfromtimestamp(self.wait_until).strftime('%H:%M:%S')))
+        else:
+            print("- Strategy: %s, %s" % (self.strategy, self.note))
+        print("")
+
+    def wait(self):
+        """
+        Sleep until the rate limit reset the plan waits for
+        """
+        if self.wait_until:
+            seconds = max(self.wait_until - time.time(), 0) + 1
+            print("- Waiting %.0fs for the rate limit reset\n" % seconds)
+            time.sleep(seconds)
+
+
+def plan(store, since_date, count, api_url, gh_token, fetch_mode, label_writes=False, numbers=None):
+    """
+    Count the searches that sync `store` from `since_date` with `count` (see
+    prstore.counter) and plan the run, `label_writes` when labels are updated. `numbers`
+    are the merged PRs from the mirror to fetch instead of the merged search, see prstore.sync.
+    """
+    counts = dict((search_string, count(search_string))
+                  for search_string in prstore.sync_queries(store, since_date, numbers is None))
+    numbers = len(numbers or ())
+    run_plan = RunPlan(counts, sum(counts.values()) + numbers if label_writes else 0,
+                       rate_limits(api_url, gh_token), fetch_mode, numbers)
+    run_plan.print_plan()
+    return run_plan
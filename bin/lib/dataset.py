@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+The PR dataset every run starts from: the previous release found in the mirror, the PR
+store synced against the rate limit plan, and the revert index and merged PRs that
+landed on each branch.
+
+The report, the label reconciler, the combined run and the daemon all load it here
+with the same options, see `load_dataset`.
+"""
+
+import os.path
+import sys
+
+from lib import costplan
+from lib import discover
+from lib import httpcache
+from lib import metrics
+from lib import processors
+from lib import prstore
+from lib import reach
+
+
+class Dataset:
+    """
+    Connects to the repo and finds the previous release, `sync` then loads the PRs. With
+    `labels` the rate limit plan counts label writes. Without `mirror` an existing mirror
+    is used if there is one, and no revert index or branch windows are built.
+    """
+
+    def __init__(self, args, labels=False, mirror=True):
+        self.gh_token = args['--gh_token']
+        self.prev_release_ver = args.get('--prev_release_ver') or "NULL"
+        self.prev_release_commit_sha = args.get('--prev_release_commit_sha') or "NULL"
+        self.repo_name = args.get('--repo') or "apache/cloudstack"
+        branch = args.get('--branch') or 'master'
+        self.branches = [b.strip() for b in (args.get('--branches') or branch).split(',') if b.strip()]
+        tmp_dir = args.get('--tmp_dir') or "/tmp"
+        self.mirror_dir = args.get('--mirror_dir') or tmp_dir + "/mirror"
+        self.mirror_filter = args.get('--mirror_filter')
+        self.store_file = args.get('--store_file') or tmp_dir + "/acs_prs.db"
+        self.fetch_mode = args.get('--fetch_mode') or "graphql"
+        self.gh_api_url = args.get('--gh_api_url') or "https://api.github.com"
+        self.hydrate_workers = int(args.get('--hydrate_workers') or 8)
+        self.http_cache_file = args.get('--http_cache_file') or tmp_dir + "/acs_http_cache.db"
+        self.http_cache_mb = int(args.get('--http_cache_mb') or httpcache.DEFAULT_MAX_MB)
+        self.plan_only = str(args.get('--plan')).lower() in ('true', '1', 'yes')
+        self.pr_discovery = args.get('--pr_discovery') or "search"
+        self.labels = labels
+        self.mirror = mirror
+        self.http_cache = None
+        self.store = None
+        self.mirror_repo = None
+        self.synced = False
+        self.open_prs = []
+        self.merged_prs = []
+        self.revert_indexes = None
+        self.windows = None
+        self.landed_prs = None
+
+    def connect(self):
+        """
+        Connect to the repo, update the mirror and find the previous release, exits if there is none
+        """
+        # PyGithub is the slowest import, it is loaded once a run is certain
+        from github import Github
+
+        if self.prev_release_commit_sha == "NULL" and self.prev_release_ver == "NULL":
+            print("Starting commit SHA or version is required to continue")
+            sys.exit()
+
+        metrics.instrument_pygithub()
+        if self.http_cache_mb > 0:
+            self.http_cache = httpcache.install(httpcache.HTTPCache(self.http_cache_file, self.gh_token,
+                                                                    self.http_cache_mb * 1024 * 1024))
+        self.gh = Github(self.gh_token, base_url=self.gh_api_url)
+        with metrics.phase('connect'):
+            self.repo = self.gh.get_repo(self.repo_name)
+
+        # the release point and its date come from the mirror's commits and tags
+        if self.mirror:
+            self.mirror_repo = processors.update_mirror(self.repo, self.branches, self.mirror_dir,
+                                                        self.prev_release_ver, self.prev_release_commit_sha,
+                                                        self.mirror_filter)
+        elif os.path.isdir(self.mirror_dir):
+            # the labels don't need the mirror, but if the report has left one use its commits and tags
+            from lib import mirror
+            self.mirror_repo = mirror.check_mirror(self.mirror_dir, self.repo.git_url, self.branches[0],
+                                                   missing_ok=True)
+
+        prev_release_commit_sha = self.prev_release_commit_sha
+        if prev_release_commit_sha != "NULL":
+            print("Previous Release Commit SHA found in conf file, skipping pre release SHA search.\n")
+        else:
+            print("Finding commit SHA for previous version " + self.prev_release_ver)
+            prev_release_commit_sha = None
+        with metrics.phase('connect'):
+            self.prev_release_sha, self.prev_release_commit_date = processors.find_prev_release(
+                self.repo, self.mirror_repo, self.mirror_dir, self.prev_release_ver, prev_release_commit_sha)
+        if self.prev_release_sha is None:
+            print("No starting point found via version tag or commit SHA")
+            sys.exit()
+
+        self.store = prstore.PRStore(self.store_file, self.repo_name)
+        return self
+
+    def sync(self):
+        """
+        Plan the run and sync the PR store, then index the reverts and find the merged PRs
+        that landed on each branch. Returns False if the run was only planned (`--plan`).
+        """
+        if self.mirror and self.synced:
+            self.mirror_repo = processors.update_mirror(self.repo, self.branches, self.mirror_dir,
+                                                        prev_release_sha=self.prev_release_sha,
+                                                        object_filter=self.mirror_filter)
+        numbers = None
+        if self.pr_discovery == 'mirror':
+            if self.mirror_repo is None:
+                print("No mirror to find merged PRs in, searching for them")
+            else:
+                print("Finding merged PRs in the mirror")
+                with metrics.phase('discover'):
+                    numbers = discover.numbers_to_fetch(self.store, self.mirror_repo, self.branches,
+                                                        self.prev_release_sha)
+        with metrics.phase('plan'):
+            run_plan = costplan.plan(self.store, self.prev_release_commit_date,
+                                     prstore.counter(self.gh, self.fetch_mode, self.gh_api_url, self.gh_token),
+                                     self.gh_api_url, self.gh_token, self.fetch_mode, self.labels, numbers)
+        if self.plan_only:
+            return False
+        run_plan.wait()
+
+        print("Syncing local PR store " + self.store_file)
+        with metrics.phase('sync'):
+            fetched = 0
+            if run_plan.fetch_mode:
+                fetched = prstore.sync(self.store, self.prev_release_commit_date,
+                                       prstore.searcher(self.gh, self.repo, self.store, run_plan.fetch_mode,
+                                                        self.gh_api_url, self.gh_token, self.hydrate_workers,
+                                                        run_plan.counts),
+                                       prstore.fetcher(self.repo, run_plan.fetch_mode, self.gh_api_url, self.gh_token,
+                                                       self.hydrate_workers),
+                                       numbers)
+            self.open_prs = self.store.open_prs()
+            self.merged_prs = self.store.merged_prs(self.prev_release_commit_date)
+        self.synced = True
+        metrics.add_items('sync', fetched)
+        metrics.count('prs_processed', len(self.open_prs) + len(self.merged_prs))
+        if not self.mirror:
+            return True
+
+        print("\nFinding reverted PRs")
+        with metrics.phase('revert_index'):
+            self.revert_indexes = processors.get_revert_indexes(self.repo, self.branches,
+                                                                self.prev_release_commit_date, self.mirror_dir,
+                                                                self.prev_release_sha, self.mirror_repo)
+        for branch in self.branches:
+            print("- Found these reverted commits on %s:\n" % branch, sorted(self.revert_indexes[branch].reverted))
+
+        print("\nChecking which merged PRs landed on " + ', '.join(self.branches))
+        with metrics.phase('reach', len(self.merged_prs)):
+            self.windows = reach.Windows(self.mirror_repo, self.branches, self.prev_release_sha)
+            self.landed_prs = self.windows.landed(self.merged_prs)
+        return True
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+        if self.http_cache:
+            self.http_cache.print_stats()
+            self.http_cache.close()
+
+
+def load_dataset(args, labels=False, mirror=True):
+    """
+    Connect and sync the dataset for the options in `args` (see Dataset), None if the
+    run was only planned (`--plan`)
+    """
+    dataset = Dataset(args, labels, mirror).connect()
+    if not dataset.sync():
+        dataset.close()
+        return None
+    return dataset
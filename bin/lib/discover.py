@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Merged PRs found in the commits of the mirror, so the PR sync doesn't have to page
+through the merged PR search (`--pr_discovery mirror`).
+
+Github writes the PR number into the commit it makes when merging a PR:
+
+  merge     "Merge pull request #N from owner/branch", the PR title is the message body
+  squash    "PR title (#N)"
+
+The release window of the branches is walked for them, and prstore.sync then fetches
+only the PRs the store doesn't have as merged yet, by number and in batches. PRs merged
+with a rebase leave no number behind and aren't found.
+"""
+
+import re
+
+MERGE_RE = re.compile(r'^Merge pull request #(\d+) from ')
+
+SQUASH_RE = re.compile(r'\(#(\d+)\)$')
+
+
+def pr_of_commit(commit):
+    """
+    (number, title) of the PR `commit` (see processors.commit_record) merged, None if it
+    doesn't look like a PR merge
+    """
+    match = MERGE_RE.match(commit['title'])
+    if match:
+        return int(match.group(1)), commit['message'].split('\n')[0].strip()
+    title = commit['title'].rstrip()
+    match = SQUASH_RE.search(title)
+    if match:
+        return int(match.group(1)), title[:match.start()].rstrip()
+    return None
+
+
+def merged_prs(commits):
+    """
+    {number: {'title', 'merge_commit_sha', 'merged_at'}} of the PRs merged by `commits`
+    """
+    found = {}
+    for commit in commits:
+        pr = pr_of_commit(commit)
+        if pr is not None and pr[0] not in found:
+            found[pr[0]] = {'title': pr[1], 'merge_commit_sha': commit['hash'], 'merged_at': commit['date']}
+    return found
+
+
+def from_mirror(mirror_repo, branches, stop_sha):
+    """
+    The PRs merged into `branches` since `stop_sha`, see `merged_prs`. Returns None when
+    the window has commits but none of them name a PR, so the caller can search instead.
+    """
+    from lib import processors
+    commits = list(processors.walk_commits(mirror_repo, branches, stop_sha))
+    found = merged_prs(commits)
+    if commits and not found:
+        print("- None of the %s commits since the previous release name a PR" % len(commits))
+        return None
+    print("- Found %s merged PRs in %s commits since the previous release" % (len(found), len(commits)))
+    return found
+
+
+def numbers_to_fetch(store, mirror_repo, branches, stop_sha):
+    """
+    The numbers of the PRs merged since `stop_sha` the PR store `store` has no merged record
+    of, for prstore.sync. None when the mirror names no PRs and the merged PRs are searched for.
+    """
+    found = from_mirror(mirror_repo, branches, stop_sha)
+    if found is None:
+        print("- Searching for the merged PRs instead")
+        return None
+    merged = store.merged_numbers()
+    return sorted(number for number in found if number not in merged)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Batched PR fetching through the Github GraphQL API.
+
+One search page returns up to 100 PRs with their labels, so a search that used to
+cost one REST call per PR (plus label pagination) costs one call per 100 PRs. PRs
+known by number are fetched the same way, 100 `pullRequest` aliases per request.
+Results are the same plain records as `lib.prstore` uses.
+"""
+
+import json
+import urllib.request
+from datetime import datetime
+
+from lib import metrics
+from lib import prstore
+
+PAGE_SIZE = 100
+
+PR_FIELDS = """
+        number
+        title
+        body
+        isDraft
+        state
+        createdAt
+        updatedAt
+        mergedAt
+        mergeCommit { oid }
+        baseRefName
+        author { login }
+        labels(first: 100) { nodes { name } }
+"""
+
+SEARCH_QUERY = """
+query($q: String!, $first: Int!, $cursor: String) {
+  search(query: $q, type: ISSUE, first: $first, after: $cursor) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {
+%s
+      }
+    }
+  }
+}
+""" % PR_FIELDS
+
+PULLS_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+%s
+  }
+}
+"""
+
+PULL_ALIAS = """    pr%d: pullRequest(number: %d) {
+%s
+    }"""
+
+COUNT_QUERY = """
+query($q: String!) {
+  search(query: $q, type: ISSUE, first: 1) {
+    issueCount
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def graphql_url(api_url):
+    """
+    api.github.com serves GraphQL on /graphql, Github Enterprise on /api/graphql
+    """
+    api_url = api_url.rstrip('/')
+    if api_url.endswith('/api/v3'):
+        return api_url[:-len('/v3')] + '/graphql'
+    return api_url + '/graphql'
+
+
+def post(api_url, gh_token, query, variables, missing_ok=False):
+    """
+    Run `query` and return its data. With `missing_ok` NOT_FOUND errors, eg for a number
+    that isn't a PR, leave a None in the data instead of raising.
+    """
+    request = urllib.request.Request(
+        graphql_url(api_url),
+        data=json.dumps({'query': query, 'variables': variables}).encode('utf-8'),
+        headers={'Authorization': 'bearer ' + str(gh_token),
+                 'Content-Type': 'application/json',
+                 'User-Agent': 'acs-newsletter'})
+    status, headers, body = metrics.urlopen(request)
+    result = json.loads(body.decode('utf-8'))
+    errors = result.get('errors')
+    if errors and not (missing_ok and all(e.get('type') == 'NOT_FOUND' for e in errors)):
+        raise GraphQLError('; '.join(e.get('message', str(e)) for e in result['errors']))
+    return result['data']
+
+
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.strptime(value, prstore.GH_DATE_FORMAT)
+
+
+def record_from_node(node):
+    if node['mergedAt']:
+        state = 'merged'
+    else:
+        state = node['state'].lower()
+    merge_commit = node.get('mergeCommit') or {}
+    author = node.get('author') or {}
+    return {
+        'number': node['number'],
+        'title': node['title'],
+        'body': node['body'],
+        'body_hash': prstore.body_hash(node['body']),
+        'labels': [l['name'] for l in node['labels']['nodes']],
+        'draft': bool(node['isDraft']),
+        'state': state,
+        'created_at': parse_date(node['createdAt']),
+        'updated_at': parse_date(node['updatedAt']),
+        'merged_at': parse_date(node['mergedAt']),
+        'merge_commit_sha': merge_commit.get('oid'),
+        'base_ref': node.get('baseRefName'),
+        'author': author.get('login'),
+    }
+
+
+def search_prs(api_url, gh_token, search_string, page_size=PAGE_SIZE):
+    """
+    Yield a record for every PR matching `search_string`, `page_size` PRs per request
+    """
+    cursor = None
+    while True:
+        data = post(api_url, gh_token, SEARCH_QUERY,
+                    {'q': search_string, 'first': page_size, 'cursor': cursor})
+        search = data['search']
+        for node in search['nodes']:
+            if node:
+                yield record_from_node(node)
+        if not search['pageInfo']['hasNextPage']:
+            break
+        cursor = search['pageInfo']['endCursor']
+
+
+def fetch_prs(api_url, gh_token, repo_name, numbers, page_size=PAGE_SIZE):
+    """
+    Yield a record for each of the PR `numbers`, `page_size` PRs per request, numbers that
+    aren't PRs are skipped
+    """
+    owner, name = repo_name.split('/')
+    numbers = list(numbers)
+    for start in range(0, len(numbers), page_size):
+        batch = numbers[start:start + page_size]
+        query = PULLS_QUERY % '\n'.join(PULL_ALIAS % (number, number, PR_FIELDS) for number in batch)
+        repository = post(api_url, gh_token, query, {'owner': owner, 'name': name}, missing_ok=True)['repository']
+        for number in batch:
+            node = repository.get('pr%d' % number)
+            if node:
+                yield record_from_node(node)
+
+
+def count_prs(api_url, gh_token, search_string):
+    """
+    Number of PRs matching `search_string`, without fetching them
+    """
+    return post(api_url, gh_token, COUNT_QUERY, {'q': search_string})['search']['issueCount']
+
+
+def searcher(api_url, gh_token, page_size=PAGE_SIZE):
+    """
+    Search function for `prstore.sync`
+    """
+    def search(search_string):
+        return search_prs(api_url, gh_token, search_string, page_size)
+    return search
+
+
+def fetcher(api_url, gh_token, repo_name, page_size=PAGE_SIZE):
+    """
+    Fetch function for `prstore.sync`, PRs by number
+    """
+    def fetch(numbers):
+        return fetch_prs(api_url, gh_token, repo_name, numbers, page_size)
+    return fetch
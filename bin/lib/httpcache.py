@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Persistent HTTP response cache for the PyGithub client.
+
+GET responses with an ETag or Last-Modified header are kept in a SQLite file,
+keyed by URL and a hash of the token so two tokens never share entries. The next
+request for the same URL is sent with If-None-Match / If-Modified-Since, and a
+304 answer (which Github doesn't count against the rate limit) is served from the
+cached body. The file is kept under a size limit by dropping the least recently
+used entries.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+from lib import metrics
+
+DEFAULT_MAX_MB = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT,
+    body TEXT,
+    size INTEGER,
+    used REAL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+# per response headers that must not be replayed from the cache
+FRESH_HEADERS = ('date', 'x-ratelimit-limit', 'x-ratelimit-remaining', 'x-ratelimit-reset', 'x-ratelimit-used',
+                 'x-ratelimit-resource', 'x-github-request-id')
+
+
+def token_scope(gh_token):
+    return hashlib.sha256(str(gh_token).encode('utf-8')).hexdigest()[:16]
+
+
+class HTTPCache:
+
+    def __init__(self, path, gh_token, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.scope = token_scope(gh_token)
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # the hydrate workers share the cache, so one connection behind a lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def key(self, base_url, url, parameters=None):
+        if parameters:
+            url = url + ('&' if '?' in url else '?') + urlencode(sorted(parameters.items()))
+        if '://' not in url:
+            url = base_url.rstrip('/') + url
+        return self.scope + ' ' + url
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute('SELECT etag, last_modified, headers, body FROM responses WHERE key = ?',
+                                  (key,)).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'headers': json.loads(row[2]), 'body': row[3]}
+
+    def touch(self, key):
+        with self.lock, self.db:
+            self.db.execute('UPDATE responses SET used = ? WHERE key = ?', (time.time(), key))
+
+    def put(self, key, headers, body):
+        etag = metrics.header(headers, 'etag')
+        last_modified = metrics.header(headers, 'last-modified')
+        if not etag and not last_modified:
+            return
+        headers = dict((k, v) for k, v in headers.items() if k.lower() not in FRESH_HEADERS)
+        size = len(body or '')
+        if size > self.max_bytes:
+            return
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO responses (key, url, etag, last_modified, headers, body, size, used)'
+                            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (key, key.split(' ', 1)[1], etag, last_modified, json.dumps(headers), body, size,
+                             time.time()))
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_bytes, call with the lock held
+        """
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute('SELECT key, size FROM responses ORDER BY used').fetchall():
+            self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        requests = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': float(hits) / requests if requests else 0.0,
+                'evictions': evictions, 'entries': entries, 'bytes': size}
+
+    def print_stats(self):
+        stats = self.stats()
+        print("- HTTP cache: %s hits, %s misses (%.0f%% hit rate), %s entries, %.1f MB, %s evicted" % (
+            stats['hits'], stats['misses'], stats['hit_rate'] * 100, stats['entries'], stats['bytes'] / 1048576.0,
+            stats['evictions']))
+
+    def request(self, request_json, requester, verb, url, parameters=None, headers=None, *args, **kwargs):
+        """
+        Send a GET through the cache, other verbs go straight to `request_json`
+        """
+        if verb != 'GET':
+            return request_json(requester, verb, url, parameters, headers, *args, **kwargs)
+        key = self.key(getattr(requester, 'base_url', ''), url, parameters)
+        cached = self.get(key)
+        headers = dict(headers or {})
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        status, response_headers, output = request_json(requester, verb, url, parameters, headers, *args, **kwargs)
+        if status == 304 and cached:
+            with self.lock:
+                self.hits += 1
+            metrics.count('http_cache_hits')
+            self.touch(key)
+            merged = dict(cached['headers'])
+            merged.update(response_headers or {})
+            return 200, merged, cached['body']
+        with self.lock:
+            self.misses += 1
+        metrics.count('http_cache_misses')
+        if status == 200:
+            self.put(key, response_headers or {}, output)
+        return status, response_headers, output
+
+
+def install(cache):
+    """
+    Route every PyGithub GET through `cache`, returns the cache
+    """
+    from github.Requester import Requester
+    request_json = getattr(Requester.requestJson, 'uncached', Requester.requestJson)
+
+    # keeps the `instrumented` flag of lib.metrics, so it doesn't wrap the cache again
+    @functools.wraps(request_json)
+    def cached_request_json(self, verb, url, *args, **kwargs):
+        return cache.request(request_json, self, verb, url, *args, **kwargs)
+
+    cached_request_json.uncached = request_json
+    Requester.requestJson = cached_request_json
+    return cache
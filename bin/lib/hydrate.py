@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Bounded worker pool for per-PR API calls that backs off on Github rate limits.
+
+The scheduler reads X-RateLimit-Remaining / X-RateLimit-Reset from every response
+and Retry-After from secondary rate limit errors. Concurrency grows by one after
+each unthrottled response and halves when Github pushes back, and when the budget
+runs out the workers pause until the reset time instead of failing the run.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 8
+# keep this much of the hourly budget back for the rest of the run
+MIN_REMAINING = 50
+MAX_RETRIES = 5
+
+
+def header(headers, name):
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class RateLimitScheduler:
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, min_remaining=MIN_REMAINING):
+        self.max_workers = max(1, int(max_workers))
+        self.min_remaining = min_remaining
+        self.limit = self.max_workers
+        self.active = 0
+        self.paused_until = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.time()
+                if wait > 0:
+                    self.condition.wait(wait)
+                elif self.active >= self.limit:
+                    self.condition.wait()
+                else:
+                    self.active += 1
+                    return
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def pause(self, seconds, reason):
+        with self.condition:
+            until = time.time() + seconds
+            if until > self.paused_until:
+                print("- Rate limited (%s), pausing for %s seconds" % (reason, int(seconds)))
+                self.paused_until = until
+            self.condition.notify_all()
+
+    def observe(self, headers):
+        """
+        Adjust concurrency from the headers of a response
+        """
+        remaining = header(headers, 'x-ratelimit-remaining')
+        reset = header(headers, 'x-ratelimit-reset')
+        retry_after = header(headers, 'retry-after')
+        if retry_after is not None:
+            self.throttle()
+            self.pause(float(retry_after), 'Retry-After')
+            return
+        if remaining is None:
+            return
+        remaining = int(remaining)
+        if remaining <= self.min_remaining and reset is not None:
+            self.throttle()
+            self.pause(max(0, float(reset) - time.time()) + 1, '%s requests left' % remaining)
+        elif remaining <= self.min_remaining * 4:
+            self.throttle()
+        else:
+            with self.condition:
+                if self.limit < self.max_workers:
+                    self.limit += 1
+                    self.condition.notify_all()
+
+    def throttle(self):
+        with self.condition:
+            self.limit = max(1, self.limit // 2)
+
+
+def error_headers(exception):
+    """
+    Headers of a rate limit error, or None if the exception isn't one
+    """
+    status = getattr(exception, 'status', None) or getattr(exception, 'code', None)
+    headers = getattr(exception, 'headers', None)
+    if status not in (403, 429) or headers is None:
+        return None
+    headers = dict(headers)
+    if header(headers, 'retry-after') is None and header(headers, 'x-ratelimit-remaining') != '0':
+        # a plain 403, not a rate limit
+        return None
+    if header(headers, 'retry-after') is None and header(headers, 'x-ratelimit-reset') is None:
+        headers['Retry-After'] = '60'
+    return headers
+
+
+def hydrate(items, fetch, scheduler=None, response_headers=None):
+    """
+    Call `fetch(item)` for every item on a worker pool and return the results in the
+    same order as `items`.
+
+    `response_headers(result)` returns the response headers for a result so the
+    scheduler can follow the rate limit, by default the PyGithub `raw_headers`.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if scheduler is None:
+        scheduler = RateLimitScheduler()
+    if response_headers is None:
+        response_headers = lambda result: getattr(result, 'raw_headers', None)
+
+    def run(item):
+        for attempt in range(MAX_RETRIES + 1):
+            scheduler.acquire()
+            try:
+                result = fetch(item)
+            except Exception as e:
+                headers = error_headers(e)
+                if headers is None or attempt == MAX_RETRIES:
+                    raise
+                scheduler.observe(headers)
+                continue
+            finally:
+                scheduler.release()
+            scheduler.observe(response_headers(result))
+            return result
+
+    with ThreadPoolExecutor(max_workers=scheduler.max_workers) as pool:
+        return list(pool.map(run, items))
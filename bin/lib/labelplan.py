@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Plans label changes for PRs and applies only the ones that change anything.
+
+The reconciler records the labels it wants added and removed per PR. The plan
+diffs that against the labels the PR already has, and each PR with a real change
+gets a single replace-labels call. The calls go through a small rate limit aware
+worker pool because label writes count against Github's secondary rate limits.
+"""
+
+import json
+import urllib.request
+
+from lib import hydrate
+from lib import metrics
+
+DEFAULT_WRITE_WORKERS = 2
+
+# label writes per worker between `on_written` calls
+WRITE_BATCH = 10
+
+
+class LabelPlan:
+
+    def __init__(self):
+        # pr number -> [current labels, labels to add, labels to remove]
+        self.prs = {}
+
+    def _entry(self, pr):
+        if pr['number'] not in self.prs:
+            self.prs[pr['number']] = [set(pr['labels']), set(), set()]
+        return self.prs[pr['number']]
+
+    def add(self, pr, label):
+        current, add, remove = self._entry(pr)
+        add.add(label)
+        remove.discard(label)
+
+    def remove(self, pr, label):
+        current, add, remove = self._entry(pr)
+        remove.add(label)
+        add.discard(label)
+
+    def state(self):
+        """
+        The labels to add and remove as JSON-able lists, see `from_state`
+        """
+        return [[number, sorted(add), sorted(remove)] for number, (current, add, remove) in sorted(self.prs.items())]
+
+    @classmethod
+    def from_state(cls, state, prs):
+        """
+        The plan of `state` over the PR records `prs` ({number: record}). Only the labels to add
+        and remove are saved, the current labels are read from the records.
+        """
+        plan = cls()
+        for number, add, remove in state:
+            plan.prs[number] = [set(prs[number]['labels']), set(add), set(remove)]
+        return plan
+
+    def changes(self):
+        """
+        (number, desired labels, added, removed) for every PR whose labels actually change
+        """
+        result = []
+        for number in sorted(self.prs):
+            current, add, remove = self.prs[number]
+            desired = (current | add) - remove
+            if desired != current:
+                result.append((number, sorted(desired), sorted(desired - current), sorted(current - desired)))
+        return result
+
+    def print_changes(self, dry_run):
+        changes = self.changes()
+        if dry_run:
+            print("\nLabel changes (dry run, update_labels is off):")
+        else:
+            print("\nApplying label changes:")
+        for number, desired, added, removed in changes:
+            print("-- PR %s: %s" % (number, ', '.join(['+' + l for l in added] + ['-' + l for l in removed])))
+        print("- %s PRs with label changes\n" % str(len(changes)))
+
+
+def put_labels(repo_url, gh_token, number, labels):
+    """
+    Replace the labels of an issue or PR in one call, returns the response headers
+    """
+    request = urllib.request.Request(
+        '%s/issues/%s/labels' % (repo_url.rstrip('/'), number),
+        data=json.dumps({'labels': labels}).encode('utf-8'),
+        method='PUT',
+        headers={'Authorization': 'token ' + str(gh_token),
+                 'Accept': 'application/vnd.github+json',
+                 'Content-Type': 'application/json',
+                 'User-Agent': 'acs-newsletter'})
+    status, headers, body = metrics.urlopen(request)
+    return headers
+
+
+def apply(plan, repo_url, gh_token, workers=DEFAULT_WRITE_WORKERS, applied=(), on_written=None):
+    """
+    Write the planned label changes, returns the numbers of the PRs that were updated.
+
+    PRs in `applied` were written by an earlier run and are skipped. With `on_written` the
+    writes go in batches and it is called with the PR numbers of each batch once it is done.
+    """
+    changes = [change for change in plan.changes() if change[0] not in applied]
+    scheduler = hydrate.RateLimitScheduler(workers)
+    batch = WRITE_BATCH * workers if on_written else max(len(changes), 1)
+    for start in range(0, len(changes), batch):
+        written = changes[start:start + batch]
+        hydrate.hydrate(written, lambda change: put_labels(repo_url, gh_token, change[0], change[1]),
+                        scheduler, lambda headers: headers)
+        if on_written:
+            on_written([change[0] for change in written])
+    return [change[0] for change in changes]
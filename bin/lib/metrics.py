@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Run metrics: time per phase, HTTP requests and latency per endpoint, rate limit
+budget consumed and PRs processed per second.
+
+The scripts and lib modules record into the module level `current` instance, so
+nothing has to be threaded through the call chain. PyGithub calls are picked up by
+`instrument_pygithub`, the urllib calls (GraphQL, label writes) record themselves.
+At the end of a run `write` puts a JSON summary and a Prometheus textfile next to
+the report:
+
+    prs.rst  ->  prs.metrics.json, prs.prom
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+SHA_RE = re.compile(r'^[0-9a-f]{7,40}$')
+
+
+def header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def endpoint(method, url):
+    """
+    Group a request URL into an endpoint name, eg 'GET /repos/:repo/pulls/:number'
+    """
+    path = urlparse(url).path
+    if path.startswith('/api/v3/'):
+        path = path[len('/api/v3'):]
+    elif path == '/api/graphql':
+        path = '/graphql'
+    parts = [part for part in path.split('/') if part]
+    if parts[:1] == ['repos'] and len(parts) >= 3:
+        parts[1:3] = [':repo']
+    parts = [':number' if part.isdigit() else ':sha' if SHA_RE.match(part) and not part.isalpha() else part
+             for part in parts]
+    return '%s /%s' % (method.upper(), '/'.join(parts))
+
+
+def rate_limit_resource(name, headers):
+    resource = header(headers, 'x-ratelimit-resource')
+    if resource:
+        return resource
+    if name.endswith(' /graphql'):
+        return 'graphql'
+    if ' /search/' in name:
+        return 'search'
+    return 'core'
+
+
+class Metrics:
+
+    def __init__(self, script=None):
+        self.script = script
+        self.started = time.time()
+        self.phases = {}
+        self.phase_items = {}
+        self.requests = {}
+        self.rate_limits = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, items=None):
+        """
+        Time a block, a phase entered several times adds up. `items` is the number of
+        PRs the phase handled, used for its throughput.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.time() - start
+            if items is not None:
+                self.add_items(name, items)
+
+    def add_items(self, name, items):
+        with self.lock:
+            self.phase_items[name] = self.phase_items.get(name, 0) + items
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_request(self, method, url, status, seconds, headers=None):
+        name = endpoint(method, url)
+        with self.lock:
+            entry = self.requests.setdefault(name, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                    'statuses': {}})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+            if status is None or int(status) >= 400:
+                entry['errors'] += 1
+            self.observe_rate_limit(rate_limit_resource(name, headers), headers)
+
+    def observe_rate_limit(self, resource, headers):
+        remaining = header(headers, 'x-ratelimit-remaining')
+        if remaining is None:
+            return
+        remaining = int(remaining)
+        reset = header(headers, 'x-ratelimit-reset')
+        state = self.rate_limits.get(resource)
+        if state is None or state['reset'] != reset:
+            # a new rate limit window, keep what the old one used
+            used = state['consumed'] if state else 0
+            # the first response seen has already paid for its own request
+            state = {'reset': reset, 'start': remaining + 1, 'closed': used}
+            self.rate_limits[resource] = state
+        state['remaining'] = remaining
+        state['limit'] = header(headers, 'x-ratelimit-limit')
+        state['consumed'] = state['closed'] + max(0, state['start'] - remaining)
+
+    def summary(self):
+        with self.lock:
+            elapsed = time.time() - self.started
+            prs = self.counters.get('prs_processed', 0)
+            return {
+                'script': self.script,
+                'started': self.started,
+                'seconds': elapsed,
+                'phases': dict((name, {'seconds': seconds, 'items': self.phase_items.get(name),
+                                       'items_per_second': self.phase_items[name] / seconds
+                                       if name in self.phase_items and seconds else None})
+                               for name, seconds in self.phases.items()),
+                'requests': dict((name, dict(entry, statuses=dict(entry['statuses'])))
+                                 for name, entry in self.requests.items()),
+                'rate_limits': dict((resource, {'consumed': state['consumed'], 'remaining': state['remaining'],
+                                                'limit': int(state['limit']) if state['limit'] else None})
+                                    for resource, state in self.rate_limits.items()),
+                'counters': dict(self.counters),
+                'prs_per_second': prs / elapsed if elapsed else 0.0,
+            }
+
+    def prometheus(self, summary=None):
+        summary = summary or self.summary()
+        script = 'script="%s"' % summary['script']
+        lines = []
+
+        def metric(name, help_text, kind, samples):
+            lines.append('# HELP acsn_%s %s' % (name, help_text))
+            lines.append('# TYPE acsn_%s %s' % (name, kind))
+            for labels, value in samples:
+                lines.append('acsn_%s{%s} %s' % (name, ','.join([script] + labels), repr(float(value))))
+
+        metric('run_seconds', 'Wall time of the run.', 'gauge', [([], summary['seconds'])])
+        metric('last_run_timestamp_seconds', 'When the run finished.', 'gauge', [([], time.time())])
+        metric('prs_processed', 'PRs processed in the run.', 'gauge',
+               [([], summary['counters'].get('prs_processed', 0))])
+        metric('events', 'Other things counted during the run, eg HTTP cache hits.', 'gauge',
+               [(['name="%s"' % name], value) for name, value in sorted(summary['counters'].items())
+                if name != 'prs_processed'])
+        metric('prs_per_second', 'PRs processed per second of the run.', 'gauge', [([], summary['prs_per_second'])])
+        metric('phase_seconds', 'Time spent per phase.', 'gauge',
+               [(['phase="%s"' % name], phase['seconds']) for name, phase in sorted(summary['phases'].items())])
+        metric('http_requests', 'HTTP requests per endpoint and status.', 'gauge',
+               [(['endpoint="%s"' % name, 'status="%s"' % status], count)
+                for name, entry in sorted(summary['requests'].items())
+                for status, count in sorted(entry['statuses'].items())])
+        metric('http_request_seconds_total', 'Time spent in HTTP requests per endpoint.', 'gauge',
+               [(['endpoint="%s"' % name], entry['seconds']) for name, entry in sorted(summary['requests'].items())])
+        metric('http_request_max_seconds', 'Slowest HTTP request per endpoint.', 'gauge',
+               [(['endpoint="%s"' % name], entry['max_seconds'])
+                for name, entry in sorted(summary['requests'].items())])
+        metric('ratelimit_consumed', 'Rate limit budget used by the run.', 'gauge',
+               [(['resource="%s"' % name], state['consumed'])
+                for name, state in sorted(summary['rate_limits'].items())])
+        metric('ratelimit_remaining', 'Rate limit budget left at the end of the run.', 'gauge',
+               [(['resource="%s"' % name], state['remaining'])
+                for name, state in sorted(summary['rate_limits'].items())])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, report_file):
+        """
+        Write <report>.metrics.json and <report>.prom next to `report_file`, returns their paths
+        """
+        base = os.path.splitext(report_file)[0]
+        summary = self.summary()
+        paths = []
+        for path, content in ((base + '.metrics.json', json.dumps(summary, indent=2, sort_keys=True) + '\n'),
+                              (base + '.prom', self.prometheus(summary))):
+            # textfile collectors may read at any time, so swap the file in whole
+            with open(path + '.tmp', 'w') as f:
+                f.write(content)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        return paths
+
+    def print_summary(self):
+        summary = self.summary()
+        print("\nRun metrics (%.1fs, %.1f PRs/s):" % (summary['seconds'], summary['prs_per_second']))
+        for name, phase in summary['phases'].items():
+            print("- %-16s %8.2fs" % (name, phase['seconds']))
+        for name, entry in sorted(summary['requests'].items()):
+            print("- %-40s %5d calls %8.2fs" % (name, entry['count'], entry['seconds']))
+        for resource, state in sorted(summary['rate_limits'].items()):
+            print("- rate limit %-8s %5d used, %s left" % (resource, state['consumed'], state['remaining']))
+
+
+current = Metrics()
+
+
+def start(script):
+    """
+    Reset `current` for a new run
+    """
+    global current
+    current = Metrics(script)
+    return current
+
+
+def phase(name, items=None):
+    return current.phase(name, items)
+
+
+def add_items(name, items):
+    current.add_items(name, items)
+
+
+def count(name, value=1):
+    current.count(name, value)
+
+
+def record_request(method, url, status, seconds, headers=None):
+    current.record_request(method, url, status, seconds, headers)
+
+
+def urlopen(request):
+    """
+    urllib.request.urlopen that records the request, returns (status, headers, body)
+    """
+    import urllib.error
+    import urllib.request
+    start = time.time()
+    try:
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+            record_request(request.get_method(), request.full_url, response.status, time.time() - start,
+                           response.headers)
+            return response.status, dict(response.headers), body
+    except urllib.error.HTTPError as e:
+        record_request(request.get_method(), request.full_url, e.code, time.time() - start, e.headers)
+        raise
+
+
+def instrument_pygithub():
+    """
+    Record every PyGithub request into `current`
+    """
+    from github.Requester import Requester
+    if getattr(Requester.requestJson, 'instrumented', False):
+        return
+    request_json = Requester.requestJson
+
+    def timed_request_json(self, verb, url, *args, **kwargs):
+        start = time.time()
+        status, headers = None, None
+        try:
+            status, headers, output = request_json(self, verb, url, *args, **kwargs)
+            return status, headers, output
+        finally:
+            record_request(verb, url, status, time.time() - start, headers)
+
+    timed_request_json.instrumented = True
+    Requester.requestJson = timed_request_json
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Persistent bare mirror of the Github repo.
+
+The mirror is cloned once into `mirror_dir` and only the target branches (and
+any new tags) are fetched on later runs, all in one fetch. Before it is used the mirror is checked
+(it opens as a bare repo, points at the right remote and the branch tips and their
+parents can be read), and a mirror that fails the checks or a fetch is thrown away
+and cloned again.
+
+Only commits are ever read from the mirror, so by default it is populated with a
+partial fetch through the git command line: no blobs (`blob:none`, or no trees either
+with `tree:0`), the previous release commit or tag, and the branches only back to the
+day of the release commit, with the tags that point into that history. When merges
+bring in older commits the shallow history is deepened until the walk from the branch
+tips to the release commit is complete. Later fetches of a partial mirror go through git
+with the same filter.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+from datetime import datetime, timedelta, timezone
+import pygit2
+
+DEFAULT_FILTER = 'blob:none'
+
+TAG_REFSPEC = '+refs/tags/*:refs/tags/*'
+
+# commits a shallow mirror is deepened by when the release window isn't complete, doubled
+# every round, after the last round the whole history is fetched
+DEEPEN_COMMITS = 256
+DEEPEN_ROUNDS = 5
+
+
+class GitCommandError(Exception):
+    pass
+
+
+def branch_ref(branch):
+    return 'refs/heads/' + branch
+
+
+def branch_list(branches):
+    """
+    `branches` is a branch name or a list of them
+    """
+    if isinstance(branches, str):
+        return [branches]
+    return list(branches)
+
+
+def check_mirror(mirror_dir, url, branches, fsck=False, missing_ok=False):
+    """
+    Return the opened mirror if it looks healthy, otherwise None. With `missing_ok`
+    branches that haven't been fetched yet don't count against it.
+    """
+    try:
+        repo = pygit2.Repository(mirror_dir)
+    except (pygit2.GitError, KeyError) as e:
+        print("- Mirror at %s can't be opened: %s" % (mirror_dir, e))
+        return None
+    if not repo.is_bare:
+        print("- %s is not a bare repository" % mirror_dir)
+        return None
+    try:
+        origin = repo.remotes['origin']
+    except KeyError:
+        origin = None
+    if origin is None or origin.url != url:
+        print("- Mirror at %s is not a mirror of %s" % (mirror_dir, url))
+        return None
+    for branch in branch_list(branches):
+        if missing_ok and branch_ref(branch) not in repo.references:
+            continue
+        try:
+            tip = repo.lookup_reference(branch_ref(branch)).peel(pygit2.Commit)
+            for parent in tip.parents:
+                parent.message
+        except (pygit2.GitError, KeyError, ValueError) as e:
+            print("- Mirror branch %s is unreadable: %s" % (branch, e))
+            return None
+    if fsck:
+        result = subprocess.run(['git', '--git-dir', mirror_dir, 'fsck', '--connectivity-only', '--no-dangling'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            print("- git fsck failed on mirror: %s" % result.stderr.decode('utf-8').strip())
+            return None
+    return repo
+
+
+def clone_mirror(url, mirror_dir, branches):
+    branches = branch_list(branches)
+    print("- Cloning %s into mirror %s, this will take a while the first time" % (url, mirror_dir))
+    if os.path.isdir(mirror_dir):
+        shutil.rmtree(mirror_dir)
+    repo = pygit2.clone_repository(url, mirror_dir, bare=True, checkout_branch=branches[0])
+    if len(branches) > 1:
+        # the clone only creates the checkout branch, the objects of the others are already here
+        fetch_mirror(repo, branches[1:])
+    return repo
+
+
+def branch_refspecs(branches):
+    return ['+%s:%s' % (branch_ref(branch), branch_ref(branch)) for branch in branch_list(branches)]
+
+
+def fetch_mirror(repo, branches):
+    branches = branch_list(branches)
+    refspecs = branch_refspecs(branches)
+    refspecs.append(TAG_REFSPEC)
+    print("- Fetching %s into mirror" % ', '.join(branches))
+    repo.remotes['origin'].fetch(refspecs)
+
+
+def git(mirror_dir, *args):
+    """
+    Run a git command on the mirror, returns its output
+    """
+    result = subprocess.run(['git', '--git-dir', mirror_dir] + list(args), stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise GitCommandError("git %s failed: %s" % (args[0], result.stderr.decode('utf-8').strip()))
+    return result.stdout.decode('utf-8')
+
+
+def git_fetch(mirror_dir, refspecs, object_filter, *options):
+    git(mirror_dir, 'fetch', '--quiet', '--filter=' + object_filter, *(list(options) + ['origin'] + refspecs))
+
+
+def partial_filter(repo):
+    """
+    The object filter of a mirror populated by `partial_clone`, None for a full mirror
+    """
+    try:
+        return repo.config['remote.origin.partialclonefilter']
+    except KeyError:
+        return None
+
+
+def fetch_partial(mirror_dir, branches, object_filter, *options):
+    """
+    Fetch `branches` into a partial mirror, with the tags that point into their history
+    """
+    print("- Fetching %s into mirror (%s)" % (', '.join(branch_list(branches)), object_filter))
+    git_fetch(mirror_dir, branch_refspecs(branches), object_filter, *options)
+
+
+def lookup_commit(repo, name):
+    for name in ('refs/tags/' + name, name):
+        try:
+            return repo.revparse_single(name).peel(pygit2.Commit)
+        except (KeyError, ValueError, pygit2.GitError):
+            pass
+    return None
+
+
+def find_release(mirror_dir, release, object_filter):
+    """
+    The previous release commit, `release` is its SHA or tag name. A release the mirror doesn't
+    have is fetched on its own, a commit that is new to the mirror without its history (the
+    deepening adds that where it is needed). None if the remote doesn't know it either.
+    """
+    repo = pygit2.Repository(mirror_dir)
+    commit = lookup_commit(repo, release)
+    if commit is not None:
+        return commit
+    if re.match(r'^[0-9a-f]{40}$', release):
+        refspecs, sha = [release], release
+    else:
+        tag_ref = 'refs/tags/' + release
+        remote_refs = dict(reversed(line.split('\t')) for line in
+                           git(mirror_dir, 'ls-remote', 'origin', tag_ref, tag_ref + '^{}').splitlines())
+        sha = remote_refs.get(tag_ref + '^{}') or remote_refs.get(tag_ref)
+        if sha is None:
+            return None
+        refspecs = ['+%s:%s' % (tag_ref, tag_ref)]
+    # a depth on a commit the mirror already has would cut off its history
+    options = [] if sha in repo else ['--depth=1']
+    try:
+        git_fetch(mirror_dir, refspecs, object_filter, *options)
+    except GitCommandError as e:
+        print("- Release %s can't be fetched: %s" % (release, e))
+        return None
+    return lookup_commit(pygit2.Repository(mirror_dir), release)
+
+
+def shallow_commits(mirror_dir):
+    try:
+        with open(os.path.join(mirror_dir, 'shallow')) as shallow_file:
+            return set(line.strip() for line in shallow_file if line.strip())
+    except FileNotFoundError:
+        return set()
+
+
+def window_complete(mirror_dir, branches, release_sha):
+    """
+    Whether the walk from the branch tips back to the release commit stays clear of the
+    shallow mirror's cut off history
+    """
+    shallow = shallow_commits(mirror_dir)
+    if not shallow:
+        return True
+    repo = pygit2.Repository(mirror_dir)
+    walker = None
+    for branch in branch_list(branches):
+        tip = repo.lookup_reference(branch_ref(branch)).peel(pygit2.Commit)
+        if walker is None:
+            walker = repo.walk(tip.id, pygit2.GIT_SORT_NONE)
+        else:
+            walker.push(tip.id)
+    walker.hide(release_sha)
+    return not any(str(commit.id) in shallow for commit in walker)
+
+
+def deepen_mirror(mirror_dir, branches, release, object_filter):
+    """
+    Deepen the shallow history of a partial mirror until it has the `release` commit (SHA
+    or tag name) and the release window is complete
+    """
+    commits = DEEPEN_COMMITS
+    for deepen_round in range(DEEPEN_ROUNDS + 1):
+        if not shallow_commits(mirror_dir):
+            return
+        commit = lookup_commit(pygit2.Repository(mirror_dir), release)
+        if commit is not None and window_complete(mirror_dir, branches, commit.id):
+            return
+        if deepen_round == DEEPEN_ROUNDS:
+            break
+        print("- Release commit not reached in the shallow mirror, deepening it by %s commits" % commits)
+        git_fetch(mirror_dir, branch_refspecs(branches), object_filter, '--deepen=%s' % commits)
+        commits *= 2
+    print("- Release commit still not reached, fetching the whole history")
+    git_fetch(mirror_dir, branch_refspecs(branches), object_filter, '--unshallow')
+
+
+def partial_clone(url, mirror_dir, branches, object_filter, release=None):
+    """
+    Populate a new mirror with a filtered fetch, the branches shallow from the day of the
+    `release` commit (SHA or tag name) when it can be found
+    """
+    print("- Populating mirror %s from %s with a partial fetch (%s)" % (mirror_dir, url, object_filter))
+    if os.path.isdir(mirror_dir):
+        shutil.rmtree(mirror_dir)
+    subprocess.run(['git', 'init', '--quiet', '--bare', mirror_dir], check=True)
+    git(mirror_dir, 'remote', 'add', 'origin', url)
+    git(mirror_dir, 'config', 'remote.origin.promisor', 'true')
+    git(mirror_dir, 'config', 'remote.origin.partialclonefilter', object_filter)
+    commit = find_release(mirror_dir, release, object_filter) if release else None
+    if commit is None:
+        # without a release date start from a fixed depth, `deepen_mirror` goes on from there
+        fetch_partial(mirror_dir, branches, object_filter, *(['--depth=%s' % DEEPEN_COMMITS] if release else []))
+        return pygit2.Repository(mirror_dir)
+    # a day early, so the release commit itself isn't cut off by the shallow boundary
+    since = (datetime.fromtimestamp(commit.commit_time, timezone.utc) - timedelta(days=1)).strftime('%Y-%m-%d')
+    try:
+        fetch_partial(mirror_dir, branches, object_filter, '--shallow-since=' + since)
+    except GitCommandError as e:
+        # eg a branch without commits since the release
+        print("- Fetch since %s failed (%s), fetching %s commits" % (since, e, DEEPEN_COMMITS))
+        fetch_partial(mirror_dir, branches, object_filter, '--depth=%s' % DEEPEN_COMMITS)
+    return pygit2.Repository(mirror_dir)
+
+
+def ensure_mirror(url, mirror_dir, branches, fsck=False, release=None, object_filter=DEFAULT_FILTER):
+    """
+    Return an up to date pygit2 Repository for the bare mirror of `url`, `branches`
+    is a branch name or a list of them. A new mirror is a partial one with `object_filter`
+    (a git --filter spec, None for a full clone) and covers the history back to `release`,
+    the previous release commit SHA or tag name.
+    """
+    repo = None
+    if os.path.isdir(mirror_dir) and os.listdir(mirror_dir):
+        repo = check_mirror(mirror_dir, url, branches, fsck, missing_ok=True)
+        if repo is None:
+            print("- Mirror failed integrity checks, re-cloning")
+        else:
+            try:
+                if partial_filter(repo):
+                    fetch_partial(mirror_dir, branches, partial_filter(repo))
+                else:
+                    fetch_mirror(repo, branches)
+            except (pygit2.GitError, GitCommandError) as e:
+                print("- Fetch into mirror failed (%s), re-cloning" % e)
+                repo = None
+            else:
+                repo = check_mirror(mirror_dir, url, branches)
+                if repo is None:
+                    print("- Mirror failed integrity checks after fetch, re-cloning")
+    if repo is None and object_filter:
+        try:
+            repo = partial_clone(url, mirror_dir, branches, object_filter, release)
+        except (OSError, subprocess.CalledProcessError, GitCommandError) as e:
+            print("- Partial fetch into mirror failed (%s), cloning it in full" % e)
+    if repo is None:
+        repo = clone_mirror(url, mirror_dir, branches)
+    object_filter = partial_filter(repo)
+    if object_filter and release:
+        find_release(mirror_dir, release, object_filter)
+        deepen_mirror(mirror_dir, branches, release, object_filter)
+        repo = pygit2.Repository(mirror_dir)
+    return repo
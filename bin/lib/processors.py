@@ -19,75 +19,186 @@
 # under the License.
 
 
-import os
-import re
-import subprocess
-from datetime import datetime
-import subprocess
-import shutil
-import pygit2
-
-def get_commits(repo, branch, tmp_dir):
-
-    global prev_release_commit_date
-
-    leading_4_spaces = re.compile('^    ')
-
-    print("- Cloning repo to avoid too many Github API calls, sorry, this could take a while")
-    dir_now = os.getcwd()
-    #if os.path.isdir(tmp_repo_dir):
-    #    shutil.rmtree(tmp_repo_dir)
-    #os.mkdir(tmp_repo_dir)
-    os.chdir(tmp_dir)
-    repoClone = pygit2.clone_repository(repo.git_url, tmp_dir, bare=True, checkout_branch=branch)
-    lines = subprocess.check_output(
-        ['git', 'log'], stderr=subprocess.STDOUT
-            ).decode("utf-8").split("\n")
-    commits = []
-    current_commit = {}
-    def save_current_commit():
-        title = current_commit['message'][0]
-        message = current_commit['message'][1:]
-        if message and message[0] == '':
-            del message[0]
-        current_commit['title'] = title
-        current_commit['message'] = '\n'.join(message)
-        commits.append(current_commit)
-    for line in lines:
-        if not line.startswith(' '):
-            if line.startswith('commit '):
-                if current_commit:
-                    save_current_commit()
-                    current_commit = {}
-                current_commit['hash'] = line.split('commit ')[1]
-            else:
-                try:
-                    key, value = line.split(':', 1)
-                    current_commit[key.lower()] = value.strip()
-                except ValueError:
-                    pass
+from datetime import datetime, timezone
+from lib import metrics
+
+# pygit2 and the mirror modules are imported where they are used, so a run without a
+# mirror (the label reconciler on its own) doesn't pay for loading them
+
+def commit_record(commit):
+    """
+    Lightweight record of a pygit2 commit, `date` is the author date as a naive UTC datetime
+    """
+    message = commit.message.split('\n')
+    title = message[0]
+    message = message[1:]
+    if message and message[0] == '':
+        del message[0]
+    return {
+        'hash': str(commit.id),
+        'title': title,
+        'message': '\n'.join(message),
+        'date': datetime.fromtimestamp(commit.author.time, timezone.utc).replace(tzinfo=None),
+        'parents': [str(parent_id) for parent_id in commit.parent_ids],
+    }
+
+def branch_tip(mirror_repo, branch):
+    import pygit2
+    from lib import mirror
+    return mirror_repo.lookup_reference(mirror.branch_ref(branch)).peel(pygit2.Commit)
+
+def walk_commits(mirror_repo, branches, stop_sha=None, since=None):
+    """
+    Yield commit records from the tips of `branches` (a branch name or a list of them) back
+    to, but not including, `stop_sha`. Commits shared by several branches come up once.
+    Without a `stop_sha` the walk ends at the first commit older than the `since` datetime.
+    """
+    import pygit2
+    from lib import mirror
+    walker = None
+    for branch in mirror.branch_list(branches):
+        tip = branch_tip(mirror_repo, branch)
+        if walker is None:
+            walker = mirror_repo.walk(tip.id, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME)
         else:
-            current_commit.setdefault(
-                'message', []
-            ).append(leading_4_spaces.sub('', line))
-    if current_commit:
-        save_current_commit()
-    os.chdir(dir_now)
-    return commits
-
-def get_reverted_commits(repo, branch, prev_release_commit_date, tmp_repo_dir):
-
-    revertedcommits = []
-    previous_commit_date = datetime.strptime(prev_release_commit_date, '%Y-%m-%d').date()
-    commits = get_commits(repo, branch, tmp_repo_dir)
-    for commit in commits:
-        thiscommit = commit['title']
-        reverted = re.match('^Revert "', thiscommit)
-        if reverted:
-            commitdatestr = commit['date']
-            date_time_str = ' '.join(commitdatestr.split(" ")[:-1])
-            commitdate = datetime.strptime(date_time_str, '%c').date()
-            if commitdate > previous_commit_date:
-                revertedcommit = re.search('.*This reverts commit ([A-Za-z0-9]*).*', commit['message'])
-                revertedcommits.append(revertedcommit.group(1))
-    return revertedcommits
+            walker.push(tip.id)
+    if stop_sha:
+        walker.hide(stop_sha)
+    for commit in walker:
+        if not stop_sha and since is not None:
+            if datetime.fromtimestamp(commit.commit_time, timezone.utc).replace(tzinfo=None) < since:
+                break
+        yield commit_record(commit)
+
+def update_mirror(repo, branches, mirror_dir, prev_release_ver=None, prev_release_sha=None, object_filter=None):
+    """
+    Fetch the mirror, populating it first if there isn't one. A new mirror is a partial one
+    back to the previous release (`prev_release_sha`, else the `prev_release_ver` tag) with
+    `object_filter` (`--mirror_filter`, lib.mirror.DEFAULT_FILTER if not set, 'none' for a full clone).
+    """
+    from lib import mirror
+    release = [value for value in (prev_release_sha, prev_release_ver) if value and value != "NULL"]
+    if object_filter is None:
+        object_filter = mirror.DEFAULT_FILTER
+    elif object_filter == 'none':
+        object_filter = None
+    print("- Updating local mirror to avoid too many Github API calls")
+    with metrics.phase('mirror'):
+        return mirror.ensure_mirror(repo.git_url, mirror_dir, branches, release=(release or [None])[0],
+                                    object_filter=object_filter)
+
+def get_commits(repo, branch, mirror_dir, stop_sha=None, since=None):
+
+    mirror_repo = update_mirror(repo, branch, mirror_dir)
+    return walk_commits(mirror_repo, branch, stop_sha, since)
+
+def find_prev_release(repo, mirror_repo, mirror_dir, prev_release_ver=None, prev_release_sha=None):
+    """
+    SHA and author date ('YYYY-MM-DD') of the previous release commit, from `prev_release_sha`
+    or else the `prev_release_ver` tag. Both are read from the mirror and its tag index, the
+    Github API is only asked when the mirror doesn't have them. (None, None) if there's no match.
+    """
+    if mirror_repo is not None:
+        import pygit2
+        from lib import tags
+    if prev_release_sha:
+        if mirror_repo is not None:
+            try:
+                commit = mirror_repo.revparse_single(prev_release_sha).peel(pygit2.Commit)
+                return str(commit.id), str(tags.commit_date(commit).date())
+            except (KeyError, ValueError, pygit2.GitError):
+                print("- Commit %s is not in the mirror, asking Github" % prev_release_sha)
+        commit = repo.get_commit(sha=prev_release_sha)
+        return commit.sha, str(commit.commit.author.date.date())
+    if mirror_repo is not None:
+        found = tags.load(mirror_repo, mirror_dir).resolve(prev_release_ver)
+        if found:
+            return found[0], str(found[1].date())
+        print("- Tag %s is not in the mirror, asking Github" % prev_release_ver)
+    for tag in repo.get_tags():
+        if tag.name == prev_release_ver:
+            return tag.commit.sha, str(tag.commit.commit.author.date.date())
+    return None, None
+
+def branch_commits(commits, tip_sha):
+    """
+    The walked commits reachable from `tip_sha`, following parents within `commits`
+    """
+    reachable = set()
+    pending = [tip_sha]
+    while pending:
+        sha = pending.pop()
+        if sha in reachable or sha not in commits:
+            continue
+        reachable.add(sha)
+        pending.extend(commits[sha]['parents'])
+    return [commits[sha] for sha in reachable]
+
+def branch_tips(mirror_repo, branches):
+    from lib import mirror
+    return dict((branch, str(branch_tip(mirror_repo, branch).id)) for branch in mirror.branch_list(branches))
+
+def revert_cache_key(branches, tips, prev_release_commit_date, prev_release_sha=None):
+    return [[tips[branch] for branch in branches], prev_release_sha or prev_release_commit_date]
+
+def get_revert_indexes(repo, branches, prev_release_commit_date, mirror_dir, prev_release_sha=None,
+                       mirror_repo=None):
+    """
+    Build a revert index per branch for the release window from one mirror fetch and
+    one walk over all the branch tips, or reuse the cached ones if none of the tips
+    has moved since they were built. Pass `mirror_repo` if the mirror has already been
+    updated in this run. Returns {branch: RevertIndex}.
+    """
+    from lib import mirror
+    from lib import reverts
+    branches = mirror.branch_list(branches)
+    if mirror_repo is None:
+        mirror_repo = update_mirror(repo, branches, mirror_dir)
+    tips = branch_tips(mirror_repo, branches)
+    cache_key = revert_cache_key(branches, tips, prev_release_commit_date, prev_release_sha)
+    indexes = reverts.load_cached(mirror_dir, cache_key)
+    if indexes is not None:
+        print("- Reusing revert index for %s" % ', '.join(cache_key[0]))
+        return indexes
+    previous_commit_date = datetime.strptime(prev_release_commit_date, '%Y-%m-%d')
+    with metrics.phase('revert_walk'):
+        commits = walk_commits(mirror_repo, branches, prev_release_sha, previous_commit_date)
+        if len(branches) == 1:
+            indexes = {branches[0]: reverts.build(commits, mirror_repo)}
+        else:
+            # a revert only counts on the branches it was committed to
+            commits = dict((commit['hash'], commit) for commit in commits)
+            indexes = dict((branch, reverts.build(branch_commits(commits, tips[branch]), mirror_repo))
+                           for branch in branches)
+    reverts.save_cached(mirror_dir, cache_key, indexes)
+    return indexes
+
+def extend_revert_indexes(mirror_repo, indexes, tips):
+    """
+    Add the commits each branch gained since its index was built at `tips` ({branch: sha})
+    to its revert index. Returns the new tips and the SHAs whose reverted state changed.
+    """
+    new_tips = branch_tips(mirror_repo, list(indexes))
+    changed = set()
+    for branch, index in indexes.items():
+        if new_tips[branch] == tips[branch]:
+            continue
+        reverted = set(index.reverted)
+        for commit in walk_commits(mirror_repo, branch, tips[branch]):
+            index.add_commit(commit, mirror_repo)
+        index.resolve()
+        changed |= reverted ^ index.reverted
+    return new_tips, changed
+
+def get_revert_index(repo, branch, prev_release_commit_date, mirror_dir, prev_release_sha=None, mirror_repo=None):
+    """
+    Build the revert index for the release window, or reuse the cached one if the
+    branch tip hasn't moved since it was built.
+    """
+    return get_revert_indexes(repo, [branch], prev_release_commit_date, mirror_dir, prev_release_sha,
+                              mirror_repo)[branch]
+
+def get_reverted_commits(repo, branch, prev_release_commit_date, mirror_dir, prev_release_sha=None):
+
+    index = get_revert_index(repo, branch, prev_release_commit_date, mirror_dir, prev_release_sha)
+    return sorted(index.reverted)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Local SQLite store of compact PR records.
+
+The first run fills the store from the open PR search and the merged PR search
+since the previous release, or the merged PRs found in the mirror fetched by number
+(lib.discover). Later runs only search for PRs updated since the
+last sync watermark, so the number of API calls follows the number of PRs that
+changed rather than the size of the repository.
+
+Records are plain dicts:
+
+    number, title, body, body_hash, labels (list of names), draft, state
+    ('open', 'closed' or 'merged'), created_at, updated_at, merged_at
+    (naive UTC datetimes), merge_commit_sha, base_ref, author
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from lib import metrics
+
+GH_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prs (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    title TEXT,
+    body TEXT,
+    body_hash TEXT,
+    labels TEXT,
+    draft INTEGER,
+    state TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    merged_at TEXT,
+    merge_commit_sha TEXT,
+    base_ref TEXT,
+    author TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE INDEX IF NOT EXISTS prs_state ON prs (repo, state, merged_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS checkboxes (
+    scanner TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    labels TEXT,
+    PRIMARY KEY (scanner, body_hash)
+);
+"""
+
+FIELDS = ('number', 'title', 'body', 'body_hash', 'labels', 'draft', 'state', 'created_at',
+          'updated_at', 'merged_at', 'merge_commit_sha', 'base_ref', 'author')
+
+DATE_FIELDS = ('created_at', 'updated_at', 'merged_at')
+
+
+def body_hash(body):
+    return hashlib.sha1((body or '').encode('utf-8')).hexdigest()
+
+
+def to_utc(value):
+    """
+    Normalise a datetime to naive UTC, PyGithub returns either depending on its version.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def format_date(value):
+    if value is None:
+        return None
+    return to_utc(value).strftime(GH_DATE_FORMAT)
+
+
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.strptime(value, GH_DATE_FORMAT)
+
+
+def record_from_pull(pr):
+    """
+    Build a compact record from a PyGithub PullRequest.
+    """
+    if pr.merged:
+        state = 'merged'
+    else:
+        state = pr.state
+    return {
+        'number': pr.number,
+        'title': pr.title,
+        'body': pr.body,
+        'body_hash': body_hash(pr.body),
+        'labels': [l.name for l in pr.labels],
+        'draft': bool(pr.draft),
+        'state': state,
+        'created_at': to_utc(pr.created_at),
+        'updated_at': to_utc(pr.updated_at),
+        'merged_at': to_utc(pr.merged_at),
+        'merge_commit_sha': pr.merge_commit_sha,
+        'base_ref': pr.base.ref,
+        'author': pr.user.login if pr.user else None,
+    }
+
+
+class PRStore:
+
+    def __init__(self, path, repo_name):
+        self.path = path
+        self.repo_name = repo_name
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # the REST searcher looks up known PRs from the lib.shards worker threads, the writes
+        # all happen on the thread that made the store
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get_meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?',
+                              (self.repo_name + ':' + key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                            (self.repo_name + ':' + key, value))
+
+    def updated_at(self, number):
+        row = self.db.execute('SELECT updated_at FROM prs WHERE repo = ? AND number = ?',
+                              (self.repo_name, number)).fetchone()
+        return parse_date(row[0]) if row else None
+
+    def upsert(self, records):
+        rows = []
+        for record in records:
+            row = [self.repo_name]
+            for field in FIELDS:
+                value = record.get(field)
+                if field in DATE_FIELDS:
+                    value = format_date(value)
+                elif field == 'labels':
+                    value = json.dumps(sorted(value or []))
+                elif field == 'draft':
+                    value = int(bool(value))
+                elif field == 'body_hash' and value is None:
+                    value = body_hash(record.get('body'))
+                row.append(value)
+            rows.append(row)
+        placeholders = ', '.join(['?'] * (len(FIELDS) + 1))
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO prs (repo, %s) VALUES (%s)'
+                                % (', '.join(FIELDS), placeholders), rows)
+
+    def _records(self, where, params):
+        cursor = self.db.execute('SELECT %s FROM prs WHERE repo = ? AND %s ORDER BY number'
+                                 % (', '.join(FIELDS), where), (self.repo_name,) + tuple(params))
+        for row in cursor:
+            record = dict(zip(FIELDS, row))
+            for field in DATE_FIELDS:
+                record[field] = parse_date(record[field])
+            record['labels'] = json.loads(record['labels'] or '[]')
+            record['draft'] = bool(record['draft'])
+            yield record
+
+    def checkboxes(self, scanner):
+        """
+        Memoised checkbox scan results, body hash -> frozenset of labels
+        """
+        cursor = self.db.execute('SELECT body_hash, labels FROM checkboxes WHERE scanner = ?', (scanner,))
+        return dict((row[0], frozenset(json.loads(row[1]))) for row in cursor)
+
+    def save_checkboxes(self, scanner, results):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO checkboxes (scanner, body_hash, labels) VALUES (?, ?, ?)',
+                                [(scanner, digest, json.dumps(sorted(labels))) for digest, labels in results.items()])
+
+    def get(self, number):
+        for record in self._records('number = ?', (number,)):
+            return record
+        return None
+
+    def open_prs(self):
+        return list(self._records("state = 'open'", ()))
+
+    def merged_numbers(self):
+        return set(row[0] for row in self.db.execute("SELECT number FROM prs WHERE repo = ? AND state = 'merged'",
+                                                     (self.repo_name,)))
+
+    def merged_prs(self, since_date):
+        """
+        Merged PRs with a merge date on or after `since_date` (YYYY-MM-DD).
+        """
+        return list(self._records("state = 'merged' AND merged_at >= ?", (since_date,)))
+
+
+def rest_searcher(gh, repo, store, workers=None):
+    """
+    Search function for `sync` using the REST search API, one `repo` get_pull call per changed PR.
+    The get_pull calls of all its searches, including the date windows lib.shards runs in
+    parallel, share one rate limit aware worker pool of `workers`.
+    """
+    from lib import hydrate
+    scheduler = hydrate.RateLimitScheduler(workers or hydrate.DEFAULT_WORKERS)
+
+    def search(search_string):
+        changed = []
+        with metrics.phase('search'):
+            for issue in gh.search_issues(search_string):
+                known_updated_at = store.updated_at(issue.number)
+                if known_updated_at is not None and known_updated_at >= to_utc(issue.updated_at):
+                    continue
+                changed.append(issue)
+        with metrics.phase('hydrate', len(changed)):
+            pulls = hydrate.hydrate(changed, lambda issue: repo.get_pull(issue.number), scheduler)
+        for pr in pulls:
+            yield record_from_pull(pr)
+    return search
+
+
+def sync_queries(store, since_date, merged_search=True):
+    """
+    The searches `sync` runs to bring `store` up to date, see there. Without `merged_search`
+    the merged PRs come from the mirror (lib.discover) and aren't searched for.
+    """
+    repo_name = store.repo_name
+    watermark = store.get_meta('watermark')
+    merged_since = store.get_meta('merged_since')
+
+    queries = []
+    if watermark is None:
+        queries.append(f"repo:{repo_name} is:pr is:open")
+        if merged_search:
+            queries.append(f"repo:{repo_name} is:pr is:merged merged:>={since_date}")
+    else:
+        queries.append(f"repo:{repo_name} is:pr updated:>={watermark}")
+        if merged_search and store.get_meta('pr_discovery') == 'mirror':
+            # the mirror misses PRs merged without their number in the commit, search them all again
+            queries.append(f"repo:{repo_name} is:pr is:merged merged:>={since_date}")
+        elif merged_search and merged_since and since_date < merged_since:
+            queries.append(f"repo:{repo_name} is:pr is:merged merged:{since_date}..{merged_since}")
+    return queries
+
+
+def sync(store, since_date, search, fetch=None, numbers=None):
+    """
+    Bring the store up to date with Github.
+
+    `search` takes a Github search string and yields PR records, see `rest_searcher`
+    and `lib.graphql.searcher`.
+
+    On the first run every open PR and every PR merged since `since_date` is fetched.
+    After that only PRs updated since the last watermark are searched for, plus any
+    merged PRs older than what has already been fetched if `since_date` moved back.
+
+    With `numbers`, the merged PRs found in the mirror the store is missing (see
+    lib.discover.numbers_to_fetch), the merged PRs aren't searched for and `fetch` (see `fetcher`)
+    gets those PRs by number instead. The first search run after a mirror run searches for
+    every PR merged since `since_date` again, for the ones the mirror couldn't name.
+    """
+    sync_started = datetime.now(timezone.utc)
+    merged_since = store.get_meta('merged_since')
+    if store.get_meta('pr_discovery') == 'mirror':
+        merged_since = None
+
+    fetched = 0
+    for search_string in sync_queries(store, since_date, numbers is None):
+        print("- Syncing PR store: " + search_string)
+        records = []
+        for record in search(search_string):
+            records.append(record)
+        store.upsert(records)
+        fetched += len(records)
+    if numbers:
+        print("- Syncing PR store: %s merged PRs found in the mirror" % len(numbers))
+        records = list(fetch(numbers))
+        store.upsert(records)
+        fetched += len(records)
+        if len(records) < len(numbers):
+            print("- %s of the numbers found in the mirror aren't PRs" % (len(numbers) - len(records)))
+
+    store.set_meta('watermark', format_date(sync_started))
+    if numbers is None and (merged_since is None or since_date < merged_since):
+        store.set_meta('merged_since', since_date)
+    store.set_meta('pr_discovery', 'search' if numbers is None else 'mirror')
+    print("- PR store synced, %s PRs fetched from Github\n" % str(fetched))
+    return fetched
+
+
+def rest_fetcher(repo, workers=None):
+    """
+    Fetch function for `sync` using one get_pull call per PR number on the rate limit aware
+    worker pool, numbers that aren't PRs are skipped
+    """
+    from github import UnknownObjectException
+    from lib import hydrate
+
+    def get_pull(number):
+        try:
+            return repo.get_pull(number)
+        except UnknownObjectException:
+            return None
+
+    def fetch(numbers):
+        scheduler = hydrate.RateLimitScheduler(workers or hydrate.DEFAULT_WORKERS)
+        with metrics.phase('hydrate', len(numbers)):
+            pulls = hydrate.hydrate(numbers, get_pull, scheduler)
+        return [record_from_pull(pr) for pr in pulls if pr is not None]
+    return fetch
+
+
+def fetcher(repo, fetch_mode, api_url, gh_token, workers=None):
+    """
+    Pick the function fetching PRs by number for `sync` from the `--fetch_mode` config value
+    """
+    if fetch_mode == 'rest':
+        return rest_fetcher(repo, workers)
+    from lib import graphql
+    return graphql.fetcher(api_url, gh_token, repo.full_name)
+
+
+def counter(gh, fetch_mode, api_url, gh_token):
+    """
+    Function returning the result count of a Github search, through the REST search API
+    or GraphQL as picked by `--fetch_mode`
+    """
+    if fetch_mode == 'rest':
+        return lambda search_string: gh.search_issues(search_string).totalCount
+    from lib import graphql
+    return lambda search_string: graphql.count_prs(api_url, gh_token, search_string)
+
+
+def searcher(gh, repo, store, fetch_mode, api_url, gh_token, workers=None, counts=None):
+    """
+    Pick the search function for `sync` from the `--fetch_mode` config value. Either
+    one splits searches over Github's 1000 result cap into date windows, see lib.shards.
+    `counts` holds search counts already made, eg by lib.costplan, so they aren't made twice.
+    """
+    from lib import shards
+    count = counter(gh, fetch_mode, api_url, gh_token)
+    if counts:
+        uncounted = count
+
+        def count(search_string):
+            if search_string in counts:
+                return counts[search_string]
+            return uncounted(search_string)
+    if fetch_mode == 'rest':
+        return shards.sharded(rest_searcher(gh, repo, store, workers), count)
+    from lib import graphql
+    return shards.sharded(graphql.searcher(api_url, gh_token), count)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Which merged PRs landed on the report branches, answered from the mirror.
+
+The merged search returns PRs merged into any branch. A PR landed on a branch when
+its merge commit is reachable from the branch tip and not from the previous release
+commit, which makes it one of the commits of the branch's release window. Each window
+is walked once, commit ids only, into a set, so checking thousands of PRs is a set
+lookup each and makes no API calls.
+
+A merge commit the mirror doesn't have is a PR merged into another branch, or one
+merged after the mirror was fetched. A PR based on the branch and merged after its
+tip was committed is taken to be the latter and kept.
+"""
+
+from datetime import datetime
+
+
+class Windows:
+
+    def __init__(self, mirror_repo, branches, stop_sha):
+        """
+        The release window commits of each of `branches`, back to but not including `stop_sha`
+        """
+        from lib import mirror
+        self.branches = mirror.branch_list(branches)
+        self.stop_sha = stop_sha
+        self.tips = {}
+        self.tip_times = {}
+        self.commits = dict((branch, set()) for branch in self.branches)
+        self.update(mirror_repo)
+
+    def update(self, mirror_repo):
+        """
+        Add the commits the branches gained since the last update, eg after a mirror fetch
+        """
+        import pygit2
+        from lib import mirror
+        self.mirror_repo = mirror_repo
+        for branch in self.branches:
+            tip = mirror_repo.lookup_reference(mirror.branch_ref(branch)).peel(pygit2.Commit)
+            if str(tip.id) == self.tips.get(branch):
+                continue
+            walker = mirror_repo.walk(tip.id, pygit2.GIT_SORT_NONE)
+            walker.hide(self.stop_sha)
+            if branch in self.tips:
+                walker.hide(self.tips[branch])
+            self.commits[branch].update(str(commit.id) for commit in walker)
+            self.tips[branch] = str(tip.id)
+            self.tip_times[branch] = datetime.utcfromtimestamp(tip.commit_time)
+
+    def landed_on(self, pr, branch):
+        sha = pr['merge_commit_sha']
+        if sha in self.commits[branch]:
+            return True
+        if sha and sha in self.mirror_repo:
+            return False
+        # not fetched yet, or a record without its merge commit
+        return pr['base_ref'] == branch and (not sha or pr['merged_at'] is None or
+                                             pr['merged_at'] >= self.tip_times[branch])
+
+    def branches_of(self, pr):
+        """
+        The branches the merged PR `pr` landed on
+        """
+        return [branch for branch in self.branches if self.landed_on(pr, branch)]
+
+    def landed(self, merged_prs):
+        """
+        {branch: the PRs of `merged_prs` that landed on it}
+        """
+        landed = dict((branch, [pr for pr in merged_prs if self.landed_on(pr, branch)]) for branch in self.branches)
+        for branch in self.branches:
+            left_out = len(merged_prs) - len(landed[branch])
+            if left_out:
+                print("- %s merged PRs aren't on %s since the previous release, leaving them out" % (left_out, branch))
+        return landed
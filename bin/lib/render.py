@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Report tables and the renderers that write them.
+
+Rows are kept as plain tuples with a typed sort key next to them, and each
+renderer streams the sorted rows straight into the output file. `--output_format`
+picks the renderer:
+
+    table     ASCII grid through PrettyTable, the original output
+    rst       RST headings and list-tables
+    markdown  Markdown headings and pipe tables
+    csv       one CSV with a section column, for machine consumption
+    json      {"title": ..., "sections": [{"name", "title", "columns", "rows", "summary"}]}
+
+A `Document` keeps the rendered text of each section, so a long running process can
+render only the sections that changed and write the file from the rest.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+
+FORMATS = ('table', 'rst', 'markdown', 'csv', 'json')
+
+
+class Table:
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.rows = []
+
+    def add_row(self, row, sort_key=None):
+        self.rows.append((sort_key, tuple(row)))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def sorted_rows(self):
+        keyed = [entry for entry in self.rows if entry[0] is not None]
+        if not keyed:
+            return [row for key, row in self.rows]
+        return [row for key, row in sorted(self.rows, key=lambda entry: entry[0])]
+
+
+def renderer_class(output_format):
+    if output_format not in FORMATS:
+        raise ValueError("Unknown output format '%s', use one of %s" % (output_format, ', '.join(FORMATS)))
+    return {'table': TableRenderer, 'rst': RstRenderer, 'markdown': MarkdownRenderer,
+            'csv': CsvRenderer, 'json': JsonRenderer}[output_format]
+
+
+def renderer(output_format, file, col_title_width=60):
+    report = renderer_class(output_format)(file, col_title_width)
+    report.start()
+    return report
+
+
+class Renderer:
+
+    # written between sections that were rendered on their own, see `Document`
+    separator = ''
+
+    def __init__(self, file, col_title_width=60):
+        self.file = file
+        self.col_title_width = col_title_width
+
+    def start(self):
+        pass
+
+    def heading(self, title):
+        self.file.write(title + '\n' + '=' * len(title) + '\n\n')
+
+    def text(self, name, message):
+        self.file.write(message + '\n\n')
+
+    def section(self, name, title, table, summary=None):
+        self.file.write(title + '\n\n')
+        self.write_table(table)
+        if summary:
+            self.file.write(summary + '\n')
+        self.file.write('\n')
+
+    def close(self):
+        pass
+
+
+class TableRenderer(Renderer):
+
+    def write_table(self, table):
+        from prettytable import PrettyTable
+        grid = PrettyTable(table.columns)
+        for column in table.columns:
+            if column in ('Title', 'Result', 'PR Type'):
+                grid.align[column] = "l"
+        grid._max_width = {"Title": self.col_title_width}
+        for row in table.sorted_rows():
+            grid.add_row(list(row))
+        self.file.write(grid.get_string())
+        self.file.write('\n')
+
+
+# a cell starting with punctuation or an enumerator ("1.", "a)", "#.") would be read as
+# a nested bullet list, enumerated list, field list, comment, ... rather than text
+RST_BLOCK_START_RE = re.compile(r'^(?:[^\w\s\\]|\w+[.)](?:\s|$))')
+
+
+def rst_escape(value):
+    value = str(value).replace('\\', '\\\\')
+    for char in '`*|_':
+        value = value.replace(char, '\\' + char)
+    if RST_BLOCK_START_RE.match(value):
+        value = '\\' + value
+    return value
+
+
+class RstRenderer(Renderer):
+
+    def section(self, name, title, table, summary=None):
+        self.file.write(title + '\n' + '-' * len(title) + '\n\n')
+        if len(table):
+            self.write_table(table)
+        if summary:
+            self.file.write(summary + '\n')
+        self.file.write('\n')
+
+    def write_table(self, table):
+        self.file.write('.. list-table::\n   :header-rows: 1\n\n')
+        for row in [table.columns] + table.sorted_rows():
+            for i, value in enumerate(row):
+                self.file.write('   %s %s\n' % ('* -' if i == 0 else '  -', rst_escape(value) or ' '))
+        self.file.write('\n')
+
+
+def markdown_escape(value):
+    return str(value).replace('\\', '\\\\').replace('|', '\\|').replace('\n', ' ')
+
+
+class MarkdownRenderer(Renderer):
+
+    def heading(self, title):
+        self.file.write('# ' + title + '\n\n')
+
+    def section(self, name, title, table, summary=None):
+        self.file.write('## ' + title + '\n\n')
+        if len(table):
+            self.write_table(table)
+            self.file.write('\n')
+        if summary:
+            self.file.write(summary + '\n')
+        self.file.write('\n')
+
+    def write_table(self, table):
+        self.file.write('| ' + ' | '.join(table.columns) + ' |\n')
+        self.file.write('|' + '|'.join(['---'] * len(table.columns)) + '|\n')
+        for row in table.sorted_rows():
+            self.file.write('| ' + ' | '.join(markdown_escape(value) for value in row) + ' |\n')
+
+
+class CsvRenderer(Renderer):
+
+    def __init__(self, file, col_title_width=60):
+        Renderer.__init__(self, file, col_title_width)
+        self.writer = csv.writer(file)
+
+    def start(self):
+        self.writer.writerow(['section', 'pr_number', 'title', 'type', 'detail'])
+
+    def heading(self, title):
+        pass
+
+    def text(self, name, message):
+        pass
+
+    def section(self, name, title, table, summary=None):
+        for row in table.sorted_rows():
+            row = list(row) + [''] * (4 - len(row))
+            self.writer.writerow([name] + row)
+
+
+class JsonRenderer(Renderer):
+
+    separator = ','
+
+    def __init__(self, file, col_title_width=60):
+        Renderer.__init__(self, file, col_title_width)
+        self.title = None
+        self.first = True
+
+    def start(self):
+        self.file.write('{"sections": [')
+
+    def heading(self, title):
+        self.title = title
+
+    def write_section(self, section):
+        if not self.first:
+            self.file.write(',')
+        self.first = False
+        self.file.write('\n  ' + json.dumps(section))
+
+    def text(self, name, message):
+        self.write_section({'name': name, 'title': None, 'columns': [], 'rows': [], 'summary': message})
+
+    def section(self, name, title, table, summary=None):
+        self.write_section({'name': name, 'title': title, 'columns': table.columns,
+                            'rows': [list(row) for row in table.sorted_rows()], 'summary': summary})
+
+    def close(self):
+        self.file.write('\n], "title": %s}\n' % json.dumps(self.title))
+
+
+class Document:
+    """
+    A report kept as the rendered text of each of its sections
+    """
+
+    def __init__(self, output_format, col_title_width=60, title=None):
+        renderer_class(output_format)
+        self.output_format = output_format
+        self.col_title_width = col_title_width
+        self.title = title
+        self.sections = {}
+
+    def update(self, name, write):
+        """
+        Render section `name` on its own with `write(renderer)`, returns True if its text changed
+        """
+        buffer = io.StringIO()
+        write(renderer_class(self.output_format)(buffer, self.col_title_width))
+        text = buffer.getvalue()
+        changed = self.sections.get(name) != text
+        self.sections[name] = text
+        return changed
+
+    def write(self, path, names):
+        """
+        Write the sections in `names` order to `path`, swapping the file in whole
+        """
+        with open(path + '.tmp', 'w') as file:
+            report = renderer(self.output_format, file, self.col_title_width)
+            if self.title:
+                report.heading(self.title)
+            file.write(report.separator.join(self.sections[name] for name in names if self.sections.get(name)))
+            report.close()
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Index of reverted commits in the release window.
+
+Every "This reverts commit <sha>" line maps the reverted SHA to the commit that
+reverted it. A commit only counts as reverted if one of its reverting commits is
+itself still live, so a revert that was later reverted ("Revert "Revert ..."")
+puts the original change back. SHAs that are abbreviated in the message and can't
+be expanded from the mirror are matched by prefix.
+"""
+
+import json
+import os
+import re
+
+import pygit2
+
+REVERTS_RE = re.compile(r'This reverts commit ([0-9a-fA-F]{7,40})')
+
+CACHE_FILE = 'acsn-revert-index.json'
+
+
+class RevertIndex:
+
+    def __init__(self, reverters=None):
+        # reverted sha (full or abbreviated) -> list of full reverting shas
+        self.reverters = reverters or {}
+        self.resolve()
+
+    def add_commit(self, commit, mirror_repo=None):
+        for sha in REVERTS_RE.findall(commit['message']):
+            sha = sha.lower()
+            if len(sha) < 40 and mirror_repo is not None:
+                sha = expand_sha(mirror_repo, sha)
+            self.reverters.setdefault(sha, []).append(commit['hash'])
+
+    def resolve(self):
+        """
+        Work out which commits are still reverted once revert chains are followed
+        """
+        self.full = {}
+        self.prefixes = {}
+        for sha, reverting in self.reverters.items():
+            if len(sha) == 40:
+                self.full[sha] = reverting
+            else:
+                self.prefixes.setdefault(len(sha), {})[sha] = reverting
+        self.memo = {}
+        self.reverted = set()
+        for sha in self.reverters:
+            if self._is_reverted(sha):
+                self.reverted.add(sha)
+
+    def _reverting(self, sha):
+        if len(sha) < 40:
+            return self.prefixes[len(sha)][sha]
+        reverting = list(self.full.get(sha, ()))
+        for length, table in self.prefixes.items():
+            reverting.extend(table.get(sha[:length], ()))
+        return reverting
+
+    def _is_reverted(self, sha):
+        if sha not in self.memo:
+            # a commit can't revert itself or anything newer, so chains always end
+            self.memo[sha] = False
+            self.memo[sha] = any(not self._is_reverted(r) for r in self._reverting(sha))
+        return self.memo[sha]
+
+    def is_reverted(self, sha):
+        if not sha:
+            return False
+        sha = sha.lower()
+        if sha in self.reverted:
+            return True
+        for length, table in self.prefixes.items():
+            if sha[:length] in self.reverted:
+                return True
+        return False
+
+    def __contains__(self, sha):
+        return self.is_reverted(sha)
+
+
+def expand_sha(mirror_repo, sha):
+    try:
+        return str(mirror_repo.revparse_single(sha).peel(pygit2.Commit).id)
+    except (KeyError, ValueError, pygit2.GitError):
+        return sha
+
+
+def build(commits, mirror_repo=None):
+    index = RevertIndex()
+    for commit in commits:
+        index.add_commit(commit, mirror_repo)
+    index.resolve()
+    return index
+
+
+def load_cached(mirror_dir, key):
+    """
+    The cached {branch: RevertIndex} if it was saved under `key`, otherwise None
+    """
+    path = os.path.join(mirror_dir, CACHE_FILE)
+    try:
+        with open(path) as cache_file:
+            cached = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if cached.get('key') != key or 'branches' not in cached:
+        return None
+    return dict((branch, RevertIndex(reverters)) for branch, reverters in cached['branches'].items())
+
+
+def save_cached(mirror_dir, key, indexes):
+    path = os.path.join(mirror_dir, CACHE_FILE)
+    with open(path + '.tmp', 'w') as cache_file:
+        json.dump({'key': key, 'branches': dict((branch, index.reverters) for branch, index in indexes.items())},
+                  cache_file)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Splits PR searches into date windows that stay under Github's search result cap.
+
+Github search (REST and GraphQL) stops at 1000 results without saying so. Before a
+search runs its result count is checked, and a search over the cap has its
+`merged:` / `updated:` / `created:` range (or a `created:` range added for searches
+without one) halved until every window fits. The windows run in parallel and the
+records are merged, keeping one per PR number.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from lib import prstore
+
+SEARCH_CAP = 1000
+DEFAULT_WORKERS = 4
+# no PR on Github is older than this
+EARLIEST = datetime(2008, 1, 1)
+
+RANGE_RE = re.compile(r'(?:^|\s)(merged|updated|created|closed):(\S+)')
+
+
+def parse_date(value, end=False):
+    """
+    Parse a search date, a plain date as an upper bound means the end of that day
+    """
+    if 'T' in value:
+        return prstore.parse_date(value)
+    day = datetime.strptime(value, '%Y-%m-%d')
+    if end:
+        return day + timedelta(days=1, seconds=-1)
+    return day
+
+
+def date_range(search_string, now):
+    """
+    Find the date range qualifier in a search, returns (qualifier, start, end) with
+    inclusive datetime bounds, or None when the search doesn't have one
+    """
+    match = RANGE_RE.search(search_string)
+    if not match:
+        return None
+    qualifier, condition = match.groups()
+    start, end = EARLIEST, now
+    if condition.startswith('>='):
+        start = parse_date(condition[2:])
+    elif condition.startswith('>'):
+        start = parse_date(condition[1:], end=True) + timedelta(seconds=1)
+    elif condition.startswith('<='):
+        end = parse_date(condition[2:], end=True)
+    elif condition.startswith('<'):
+        end = parse_date(condition[1:]) - timedelta(seconds=1)
+    elif '..' in condition:
+        low, high = condition.split('..', 1)
+        if low != '*':
+            start = parse_date(low)
+        if high != '*':
+            end = parse_date(high, end=True)
+    else:
+        start, end = parse_date(condition), parse_date(condition, end=True)
+    return qualifier, start, end
+
+
+def window(search_string, qualifier, start, end):
+    """
+    The search limited to [start, end] on `qualifier`
+    """
+    condition = '%s:%s..%s' % (qualifier, prstore.format_date(start), prstore.format_date(end))
+    terms = [term for term in search_string.split() if not term.startswith(qualifier + ':')]
+    return ' '.join(terms + [condition])
+
+
+def plan(search_string, count, now=None, workers=DEFAULT_WORKERS, cap=SEARCH_CAP):
+    """
+    Split `search_string` into searches that each return fewer than `cap` results.
+    `count` returns the number of results of a search, the windows of each round
+    are counted in parallel.
+    """
+    now = now or datetime.utcnow().replace(microsecond=0)
+    total = count(search_string)
+    if total < cap:
+        return [search_string]
+    found = date_range(search_string, now)
+    if found:
+        qualifier, start, end = found
+    else:
+        qualifier, start, end = 'created', EARLIEST, now
+    print("- %s results for '%s', splitting it into %s windows" % (total, search_string, qualifier))
+
+    windows = []
+    pending = [(start, end)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending:
+            halves = []
+            for low, high in pending:
+                middle = low + (high - low) / 2
+                middle = middle.replace(microsecond=0)
+                halves.append((low, middle))
+                halves.append((middle + timedelta(seconds=1), high))
+            searches = [window(search_string, qualifier, low, high) for low, high in halves]
+            counts = list(executor.map(count, searches))
+            pending = []
+            for (low, high), search, total in zip(halves, searches, counts):
+                if total == 0:
+                    continue
+                if total < cap or high - low < timedelta(seconds=2):
+                    if total >= cap:
+                        print("- WARNING: '%s' still has %s results, some will be missing" % (search, total))
+                    windows.append(search)
+                else:
+                    pending.append((low, high))
+    return windows
+
+
+def sharded(search, count, workers=DEFAULT_WORKERS, cap=SEARCH_CAP):
+    """
+    Wrap a `prstore.sync` search function so searches over the cap are split into
+    date windows, run in parallel and merged, one record per PR number
+    """
+    def sharded_search(search_string):
+        searches = plan(search_string, count, workers=workers, cap=cap)
+        if len(searches) == 1:
+            return search(searches[0])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda s: list(search(s)), searches))
+        records = {}
+        for result in results:
+            for record in result:
+                known = records.get(record['number'])
+                if known is None or (record['updated_at'] or EARLIEST) > (known['updated_at'] or EARLIEST):
+                    records[record['number']] = record
+        print("- %s windows merged into %s PRs" % (len(searches), len(records)))
+        return [records[number] for number in sorted(records)]
+    return sharded_search
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Local stand-in for the Github API so the fetch code can be run offline.
+
+It serves either canned GraphQL search pages, or a whole corpus of PR records
+through GraphQL search, GraphQL PRs by number and the REST endpoints the scripts
+use (repo, commit, search/issues, issue, pull, labels, tags). Every request is
+counted per endpoint and answered with X-RateLimit headers, GETs carry an ETag and
+get a 304 (which doesn't use up the rate limit) when If-None-Match matches it. Like
+Github, corpus searches report their full count but only serve the first 1000 results.
+
+Usage:
+  python -m lib.standin <pages.json> [<port>]
+
+The pages file maps a search string to a list of PullRequest nodes, eg:
+
+{
+    "repo:apache/cloudstack is:pr is:open": [
+        {"number": 1, "title": "...", "body": "...", "isDraft": false, "state": "OPEN",
+         "createdAt": "2020-01-01T00:00:00Z", "updatedAt": "2020-01-02T00:00:00Z",
+         "mergedAt": null, "mergeCommit": null, "baseRefName": "main",
+         "author": {"login": "someone"}, "labels": {"nodes": [{"name": "type:bug"}]}}
+    ]
+}
+
+Point `--gh_api_url` at http://127.0.0.1:<port> to use it.
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from lib import prstore
+
+RATE_LIMIT = 5000
+RESOURCES = ('core', 'search', 'graphql')
+
+PULL_ALIAS_RE = re.compile(r'(\w+): pullRequest\(number: (\d+)\)')
+
+# like Github, searches report their full count but only serve this many results
+SEARCH_CAP = 1000
+
+
+def iso(value):
+    return prstore.format_date(value) if isinstance(value, datetime) else value
+
+
+def search_page(nodes, first, cursor):
+    """
+    Slice a canned node list into one search connection page, cursors are offsets
+    """
+    start = int(cursor) if cursor else 0
+    end = start + first
+    return {
+        'issueCount': len(nodes),
+        'pageInfo': {'hasNextPage': end < len(nodes), 'endCursor': str(end)},
+        'nodes': nodes[start:end],
+    }
+
+
+def node_from_record(record):
+    if record['state'] == 'merged':
+        state = 'MERGED'
+    else:
+        state = record['state'].upper()
+    return {
+        'number': record['number'],
+        'title': record['title'],
+        'body': record['body'],
+        'isDraft': record['draft'],
+        'state': state,
+        'createdAt': iso(record['created_at']),
+        'updatedAt': iso(record['updated_at']),
+        'mergedAt': iso(record['merged_at']),
+        'mergeCommit': {'oid': record['merge_commit_sha']} if record['merge_commit_sha'] else None,
+        'baseRefName': record['base_ref'],
+        'author': {'login': record['author']},
+        'labels': {'nodes': [{'name': l} for l in record['labels']]},
+    }
+
+
+def qualifier_matches(value, condition):
+    if value is None:
+        return False
+    value = iso(value)
+    if condition.startswith('>='):
+        return value >= condition[2:]
+    if condition.startswith('>'):
+        return value[:len(condition) - 1] > condition[1:]
+    if condition.startswith('<='):
+        return value[:len(condition) - 2] <= condition[2:]
+    if condition.startswith('<'):
+        return value < condition[1:]
+    if '..' in condition:
+        start, end = condition.split('..', 1)
+        return start <= value and value[:len(end)] <= end
+    return value.startswith(condition)
+
+
+def record_matches(record, search_string):
+    for term in search_string.split():
+        key, _, condition = term.partition(':')
+        if key == 'is':
+            if condition == 'open' and record['state'] != 'open':
+                return False
+            if condition == 'closed' and record['state'] == 'open':
+                return False
+            if condition == 'merged' and record['state'] != 'merged':
+                return False
+        elif key == 'label':
+            if condition not in record['labels']:
+                return False
+        elif key in ('merged', 'created', 'updated'):
+            if not qualifier_matches(record[key + '_at'], condition):
+                return False
+    return True
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None, resource='core'):
+        body = json.dumps(payload).encode('utf-8')
+        server = self.server
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        # like Github, a GET answered with 304 is free
+        not_modified = self.command == 'GET' and status == 200 and self.headers.get('If-None-Match') == etag
+        with server.lock:
+            if not not_modified:
+                server.remaining[resource] = max(0, server.remaining[resource] - 1)
+            remaining = server.remaining[resource]
+        if not_modified:
+            status, body = 304, b''
+        self.send_response(status)
+        if self.command == 'GET':
+            self.send_header('ETag', etag)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-RateLimit-Limit', str(RATE_LIMIT))
+        self.send_header('X-RateLimit-Remaining', str(remaining))
+        self.send_header('X-RateLimit-Reset', str(server.reset_at))
+        self.send_header('X-RateLimit-Resource', resource)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def count(self, endpoint):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+            self.server.endpoints[endpoint] += 1
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+
+    def do_POST(self):
+        payload = self.read_json()
+        variables = payload.get('variables') or {}
+        if self.path.endswith('/graphql') and 'owner' in variables:
+            self.count('graphql')
+            self.send_json(200, self.pulls_by_number(payload.get('query') or ''), resource='graphql')
+            return
+        if not self.path.endswith('/graphql') or 'q' not in variables:
+            self.count('other')
+            self.send_json(404, {'message': 'Not Found'})
+            return
+        self.count('graphql')
+        first = variables.get('first') or 100
+        if variables['q'] in self.server.pages:
+            page = search_page(self.server.pages[variables['q']], first, variables.get('cursor'))
+        else:
+            records = self.server.search(variables['q'])
+            page = search_page(records[:SEARCH_CAP], first, variables.get('cursor'))
+            page['issueCount'] = len(records)
+            page['nodes'] = [node_from_record(r) for r in page['nodes']]
+        self.send_json(200, {'data': {'search': page}}, resource='graphql')
+
+    def pulls_by_number(self, query):
+        """
+        Answer `pullRequest(number: N)` aliases, like Github a number without a PR is null
+        with a NOT_FOUND error
+        """
+        repository = {}
+        errors = []
+        for alias, number in PULL_ALIAS_RE.findall(query):
+            record = self.server.prs.get(int(number))
+            repository[alias] = node_from_record(record) if record else None
+            if record is None:
+                errors.append({'type': 'NOT_FOUND', 'path': ['repository', alias],
+                               'message': 'Could not resolve to a PullRequest with the number of %s.' % number})
+        result = {'data': {'repository': repository}}
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        base = self.server.url
+        repo_path = '/repos/' + self.server.repo_name
+        repo_url = base + repo_path
+        path = url.path
+
+        if path == '/search/issues':
+            self.count('search')
+            records = self.server.search(query['q'][0])
+            served = records[:SEARCH_CAP]
+            per_page = int(query.get('per_page', ['30'])[0])
+            page = int(query.get('page', ['1'])[0])
+            items = [self.issue_json(r) for r in served[(page - 1) * per_page:page * per_page]]
+            headers = {}
+            if page * per_page < len(served):
+                next_query = dict((k, v[0]) for k, v in query.items())
+                next_query['page'] = str(page + 1)
+                headers['Link'] = '<%s/search/issues?%s>; rel="next"' % (base, urlencode(next_query))
+            self.send_json(200, {'total_count': len(records), 'incomplete_results': False, 'items': items},
+                           headers, 'search')
+        elif path == '/rate_limit':
+            self.count('rate_limit')
+            resources = dict((name, {'limit': RATE_LIMIT, 'remaining': remaining, 'reset': self.server.reset_at,
+                                     'used': RATE_LIMIT - remaining})
+                             for name, remaining in self.server.remaining.items())
+            self.send_json(200, {'resources': resources, 'rate': resources['core']})
+        elif path == repo_path:
+            self.count('repo')
+            self.send_json(200, {'id': 1, 'name': self.server.repo_name.split('/')[1],
+                                 'full_name': self.server.repo_name, 'url': repo_url,
+                                 'git_url': self.server.git_url, 'clone_url': self.server.git_url})
+        elif path == repo_path + '/tags':
+            # releases are looked up in the mirror, the corpus has no tags of its own
+            self.count('tags')
+            self.send_json(200, [])
+        elif path.startswith(repo_path + '/commits/'):
+            self.count('commit')
+            sha = path.rsplit('/', 1)[1]
+            date = self.server.commits.get(sha)
+            if date is None:
+                self.send_json(404, {'message': 'Not Found'})
+                return
+            person = {'name': 'someone', 'email': 'someone@example.com', 'date': iso(date)}
+            self.send_json(200, {'sha': sha, 'url': repo_url + '/commits/' + sha,
+                                 'commit': {'author': person, 'committer': person, 'message': ''}})
+        elif re.match(re.escape(repo_path) + r'/(issues|pulls)/\d+$', path):
+            kind, number = path.rsplit('/', 2)[1:]
+            self.count(kind[:-1])
+            record = self.server.prs.get(int(number))
+            if record is None:
+                self.send_json(404, {'message': 'Not Found'})
+            elif kind == 'issues':
+                self.send_json(200, self.issue_json(record))
+            else:
+                self.send_json(200, self.pull_json(record))
+        else:
+            self.count('other')
+            self.send_json(404, {'message': 'Not Found'})
+
+    def do_PUT(self):
+        match = re.match(re.escape('/repos/' + self.server.repo_name) + r'/issues/(\d+)/labels$', self.path)
+        if not match or int(match.group(1)) not in self.server.prs:
+            self.count('other')
+            self.send_json(404, {'message': 'Not Found'})
+            return
+        self.count('labels')
+        labels = self.read_json().get('labels', [])
+        record = self.server.prs[int(match.group(1))]
+        with self.server.lock:
+            record['labels'] = list(labels)
+            record['updated_at'] = datetime.utcnow().replace(microsecond=0)
+            self.server.searches = {}
+        self.send_json(200, [{'name': l} for l in labels])
+
+    def issue_json(self, record):
+        repo_url = self.server.url + '/repos/' + self.server.repo_name
+        return {
+            'number': record['number'],
+            'title': record['title'],
+            'body': record['body'],
+            'state': 'open' if record['state'] == 'open' else 'closed',
+            'labels': [{'name': l} for l in record['labels']],
+            'created_at': iso(record['created_at']),
+            'updated_at': iso(record['updated_at']),
+            'url': '%s/issues/%s' % (repo_url, record['number']),
+            'repository_url': repo_url,
+            'user': {'login': record['author']},
+            'pull_request': {'url': '%s/pulls/%s' % (repo_url, record['number'])},
+        }
+
+    def pull_json(self, record):
+        repo_url = self.server.url + '/repos/' + self.server.repo_name
+        return {
+            'number': record['number'],
+            'title': record['title'],
+            'body': record['body'],
+            'state': 'open' if record['state'] == 'open' else 'closed',
+            'merged': record['state'] == 'merged',
+            'draft': record['draft'],
+            'labels': [{'name': l} for l in record['labels']],
+            'created_at': iso(record['created_at']),
+            'updated_at': iso(record['updated_at']),
+            'merged_at': iso(record['merged_at']),
+            'merge_commit_sha': record['merge_commit_sha'],
+            'base': {'ref': record['base_ref']},
+            'user': {'login': record['author']},
+            'url': '%s/pulls/%s' % (repo_url, record['number']),
+        }
+
+
+class StandinServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, port, pages=None, prs=None, repo_name='apache/cloudstack', git_url=None, commits=None):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), StandinHandler)
+        self.pages = pages or {}
+        self.prs = dict((r['number'], r) for r in (prs or []))
+        self.repo_name = repo_name
+        self.git_url = git_url
+        self.commits = commits or {}
+        self.requests = []
+        self.endpoints = Counter()
+        self.remaining = dict((name, RATE_LIMIT) for name in RESOURCES)
+        self.reset_at = int(time.time()) + 3600
+        self.searches = {}
+        self.lock = threading.Lock()
+        self.url = 'http://127.0.0.1:%s' % self.server_address[1]
+
+    def search(self, search_string):
+        with self.lock:
+            if search_string not in self.searches:
+                self.searches[search_string] = [r for n, r in sorted(self.prs.items())
+                                                if record_matches(r, search_string)]
+            return self.searches[search_string]
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = []
+            self.endpoints = Counter()
+            self.remaining = dict((name, RATE_LIMIT) for name in RESOURCES)
+            self.reset_at = int(time.time()) + 3600
+
+
+def start(pages=None, port=0, **corpus):
+    """
+    Serve on a background thread and return the server. `server.url` is the api url to
+    use, `server.requests` records every request path and `server.endpoints` counts
+    requests per endpoint. `corpus` takes prs (records), repo_name, git_url and commits
+    (sha -> author datetime) for the REST endpoints and unmatched GraphQL searches.
+    """
+    server = StandinServer(port, pages, **corpus)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as pages_file:
+        pages = json.load(pages_file)
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    server = StandinServer(port, pages)
+    print("Serving canned GraphQL pages on http://127.0.0.1:%s" % port)
+    server.serve_forever()
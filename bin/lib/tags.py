@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Index of the release tags in the repo mirror.
+
+Every refs/tags/* ref is peeled (annotated tags point at a tag object) to its
+commit, and the commit SHA and author date are kept per tag name, so a version
+resolves to its release commit with a dict lookup instead of paging through the
+tags API. The index is cached in the mirror next to the revert index, and only
+tags whose target changed since the last run are peeled again.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import pygit2
+
+CACHE_FILE = 'acsn-tag-index.json'
+TAGS_PREFIX = 'refs/tags/'
+
+
+class TagIndex:
+
+    def __init__(self, tags=None):
+        # tag name -> {'target': ref target, 'sha': commit sha, 'date': author date (GH_DATE_FORMAT, UTC)}
+        self.tags = tags or {}
+
+    def __len__(self):
+        return len(self.tags)
+
+    def resolve(self, name):
+        """
+        (commit sha, author datetime) of the tag, or None
+        """
+        tag = self.tags.get(name)
+        if tag is None:
+            return None
+        return tag['sha'], datetime.strptime(tag['date'], '%Y-%m-%dT%H:%M:%SZ')
+
+
+def commit_date(commit):
+    return datetime.fromtimestamp(commit.author.time, timezone.utc).replace(tzinfo=None)
+
+
+def build(mirror_repo, cached=None):
+    """
+    Index the tags of `mirror_repo`, reusing the entries of `cached` whose target hasn't moved
+    """
+    known = cached.tags if cached else {}
+    tags = {}
+    for ref_name in mirror_repo.references:
+        if not ref_name.startswith(TAGS_PREFIX):
+            continue
+        name = ref_name[len(TAGS_PREFIX):]
+        reference = mirror_repo.references[ref_name]
+        target = str(reference.target)
+        if name in known and known[name]['target'] == target:
+            tags[name] = known[name]
+            continue
+        try:
+            commit = reference.peel(pygit2.Commit)
+        except (pygit2.GitError, KeyError, ValueError):
+            # tags of trees or blobs are no use as release points
+            continue
+        tags[name] = {'target': target, 'sha': str(commit.id),
+                      'date': commit_date(commit).strftime('%Y-%m-%dT%H:%M:%SZ')}
+    return TagIndex(tags)
+
+
+def load(mirror_repo, mirror_dir):
+    """
+    The up to date tag index of the mirror, built on top of the cached one
+    """
+    path = os.path.join(mirror_dir, CACHE_FILE)
+    cached = None
+    try:
+        with open(path) as cache_file:
+            cached = TagIndex(json.load(cache_file))
+    except (OSError, ValueError):
+        pass
+    index = build(mirror_repo, cached)
+    if cached is None or index.tags != cached.tags:
+        with open(path + '.tmp', 'w') as cache_file:
+            json.dump(index.tags, cache_file)
+        os.replace(path + '.tmp', path)
+    return index
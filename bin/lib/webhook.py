@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Receives Github webhook deliveries for the daemon mode (acs_daemon.py).
+
+A delivery is checked against the shared secret (X-Hub-Signature-256) and the repo
+it is for, answered with a 202 straight away and queued as (event, payload), so Github's 10 second
+delivery timeout never waits on a label write. The daemon applies the queue in
+order on one thread. `GET /health` answers with the queue length.
+
+Recorded deliveries can be replayed without a server, one JSON object per line:
+
+    {"event": "pull_request", "payload": {"action": "labeled", "pull_request": {...}}}
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lib import prstore
+
+EVENTS = ('pull_request', 'label', 'ping')
+
+
+def signature(secret, body):
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify(secret, body, received):
+    """
+    True if `received` (the X-Hub-Signature-256 header) signs `body`, never without a secret
+    """
+    if not secret:
+        return False
+    return bool(received) and hmac.compare_digest(signature(secret, body), received)
+
+
+def for_repo(payload, repo_name):
+    """
+    True if the delivery `payload` is for the repo `repo_name` (owner/name)
+    """
+    full_name = (payload.get('repository') or {}).get('full_name') or ''
+    return full_name.lower() == repo_name.lower()
+
+
+def record_from_pull_request(pull):
+    """
+    Compact lib.prstore record from the `pull_request` object of a webhook payload
+    """
+    if pull.get('merged') or pull.get('merged_at'):
+        state = 'merged'
+    else:
+        state = pull['state']
+    return {
+        'number': pull['number'],
+        'title': pull['title'],
+        'body': pull.get('body'),
+        'body_hash': prstore.body_hash(pull.get('body')),
+        'labels': [label['name'] for label in pull.get('labels') or []],
+        'draft': bool(pull.get('draft')),
+        'state': state,
+        'created_at': prstore.parse_date(pull.get('created_at')),
+        'updated_at': prstore.parse_date(pull.get('updated_at')),
+        'merged_at': prstore.parse_date(pull.get('merged_at')),
+        'merge_commit_sha': pull.get('merge_commit_sha'),
+        'base_ref': pull['base']['ref'],
+        'author': (pull.get('user') or {}).get('login'),
+    }
+
+
+def read_recorded(path):
+    """
+    Yield (event, payload) from a file of recorded deliveries
+    """
+    with open(path) as recorded:
+        for line in recorded:
+            if line.strip():
+                delivery = json.loads(line)
+                yield delivery['event'], delivery['payload']
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self.send_json(200, {'queued': self.server.events.qsize()})
+        else:
+            self.send_json(404, {'message': 'Not Found'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not verify(self.server.secret, body, self.headers.get('X-Hub-Signature-256')):
+            self.send_json(401, {'message': 'Bad signature'})
+            return
+        event = self.headers.get('X-GitHub-Event')
+        if event not in EVENTS:
+            self.send_json(202, {'ignored': event})
+            return
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self.send_json(400, {'message': 'Payload is not JSON'})
+            return
+        if not for_repo(payload, self.server.repo_name):
+            self.send_json(403, {'message': 'Not a delivery for ' + self.server.repo_name})
+            return
+        if event != 'ping':
+            self.server.events.put((event, payload))
+        self.send_json(202, {'queued': event})
+
+
+class WebhookServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, host, port, secret, events, repo_name):
+        ThreadingHTTPServer.__init__(self, (host, port), WebhookHandler)
+        self.secret = secret
+        self.events = events
+        self.repo_name = repo_name
+
+
+def start(host, port, secret, events, repo_name):
+    """
+    Serve on a background thread, deliveries for `repo_name` signed with `secret` go onto
+    the `events` queue. Returns the server.
+    """
+    if not secret:
+        raise ValueError("A webhook secret is required to receive deliveries")
+    server = WebhookServer(host, port, secret, events, repo_name)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
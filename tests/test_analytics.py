@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from lib import analytics  # noqa: E402 numpy is imported by analytics
+
+NOW = datetime(2024, 6, 1, 12)
+SECOND = timedelta(seconds=1)
+YEAR = timedelta(days=365)
+
+
+@pytest.mark.parametrize('created_at, age', [
+    (NOW, 0),
+    (NOW - YEAR, 0),
+    (NOW - YEAR - SECOND, 1),
+    (NOW - 2 * YEAR, 1),
+    (NOW - 2 * YEAR - SECOND, 2),
+    (NOW - 10 * YEAR, 2),
+])
+def test_old_pr_age_boundaries(created_at, age):
+    assert analytics.old_pr_age(created_at, NOW) == age
+    assert list(analytics.old_pr_ages([{'created_at': created_at}], NOW)) == [age]
+
+
+def test_old_pr_ages_of_many_records():
+    created = [NOW - timedelta(days=days, hours=hours) for days in range(0, 800, 7) for hours in (0, 11)]
+    ages = analytics.old_pr_ages([{'created_at': value} for value in created], NOW)
+    assert list(ages) == [analytics.old_pr_age(value, NOW) for value in created]
+
+
+def test_age_histogram_counts_open_prs_only():
+    records = [{'number': n, 'state': state, 'created_at': NOW - timedelta(days=days), 'merged_at': None}
+               for n, (state, days) in enumerate([('open', 1), ('open', 45), ('open', 400), ('open', 800),
+                                                  ('closed', 1), ('merged', 800)])]
+    histogram = analytics.PRColumns(records).age_histogram(NOW)
+    assert histogram == [('< 1 month', 1), ('1-3 months', 1), ('3-6 months', 0), ('6-12 months', 0),
+                         ('1-2 years', 1), ('2+ years', 1)]
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+
+import acs_github_label_reconciler
+from lib import labelplan
+from lib import prstore
+from lib import standin
+
+REPO = 'apache/cloudstack'
+BUG = '- [x] Bug fix (non-breaking change)'
+
+
+def record(number, labels=(), draft=False, body=BUG):
+    created = datetime.now().replace(microsecond=0) - timedelta(days=number)
+    return {'number': number, 'title': 'PR %s' % number, 'body': body, 'body_hash': prstore.body_hash(body),
+            'labels': list(labels), 'draft': draft, 'state': 'open', 'created_at': created, 'updated_at': created,
+            'merged_at': None, 'merge_commit_sha': None, 'base_ref': 'main', 'author': 'someone'}
+
+
+class Repo:
+
+    def __init__(self, server):
+        self.url = server.url + '/repos/' + REPO
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def server():
+    # drafts get the WIP label, the others the type label their ticked checkbox asks for
+    server = standin.start(prs=[record(n, draft=n % 3 == 0, labels=['type:bug'] if n % 4 == 0 else [])
+                                for n in range(1, 13)])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def records(server):
+    return [copy.deepcopy(server.prs[number]) for number in sorted(server.prs)]
+
+
+def reconcile(server, tmp_path, store, prs, name):
+    labels_file = str(tmp_path / name)
+    acs_github_label_reconciler.reconcile_labels(Repo(server), REPO, prs, [], labels_file, True, store=store,
+                                                 gh_token='token', write_workers=1, checkpoint_seconds=1e-6)
+    with open(labels_file) as file:
+        return file.read()
+
+
+def reference(tmp_path, prs):
+    """
+    The labels file of an uninterrupted run over `prs`
+    """
+    server = standin.start(prs=copy.deepcopy(prs))
+    store = prstore.PRStore(str(tmp_path / 'reference.db'), REPO)
+    try:
+        return reconcile(server, tmp_path, store, records(server), 'reference.txt')
+    finally:
+        store.close()
+        server.shutdown()
+        server.server_close()
+
+
+def crash_after(monkeypatch, module, name, calls):
+    real = getattr(module, name)
+    made = []
+
+    def crashing(*args, **kwargs):
+        made.append(1)
+        if len(made) > calls:
+            raise Crash()
+        return real(*args, **kwargs)
+    monkeypatch.setattr(module, name, crashing)
+
+
+def test_resumes_after_its_own_label_writes(server, tmp_path, monkeypatch, capsys):
+    expected = reference(tmp_path, records(server))
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), REPO)
+    monkeypatch.setattr(labelplan, 'WRITE_BATCH', 1)
+    with monkeypatch.context() as patch:
+        crash_after(patch, labelplan, 'put_labels', 2)
+        with pytest.raises(Crash):
+            reconcile(server, tmp_path, store, records(server), 'labels.txt')
+    assert server.endpoints['labels'] == 2
+
+    # the next run reads the PRs again, with the labels the crashed run wrote
+    capsys.readouterr()
+    assert reconcile(server, tmp_path, store, records(server), 'labels.txt') == expected
+    assert "Resuming from checkpoint: 12 PRs checked, labels written on 2 PRs" in capsys.readouterr().out
+    # each of the 10 label changes is written once
+    assert server.endpoints['labels'] == 10
+    assert store.get_meta('label_checkpoint') is None
+    store.close()
+
+
+def test_starts_over_when_labels_changed_since(server, tmp_path, monkeypatch, capsys):
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), REPO)
+    with monkeypatch.context() as patch:
+        crash_after(patch, acs_github_label_reconciler, 'check_pr', 6)
+        with pytest.raises(Crash):
+            reconcile(server, tmp_path, store, records(server), 'labels.txt')
+    assert store.get_meta('label_checkpoint') is not None
+    assert server.endpoints['labels'] == 0
+
+    # someone labelled a PR the crashed run had already checked
+    server.prs[4]['labels'] = ['type:enhancement']
+    prs = records(server)
+    expected = reference(tmp_path, prs)
+    capsys.readouterr()
+    assert reconcile(server, tmp_path, store, prs, 'labels.txt') == expected
+    out = capsys.readouterr().out
+    assert "The labels of PRs changed since the checkpoint, starting over" in out
+    assert "Resuming" not in out
+    store.close()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import pytest
+
+from lib import classify
+
+TABLES = str(['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs'])
+RULES_EXAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'classifier_rules.example')
+
+
+def pr(number, *labels, merge_commit_sha=None):
+    return {'number': number, 'title': ' PR %s ' % number, 'labels': list(labels), 'merge_commit_sha': merge_commit_sha}
+
+
+def test_merged_prs_by_type_and_severity():
+    rows = list(classify.default().classify([
+        pr(1, 'type:bug', 'Severity:Critical'),
+        pr(2, 'type:new-feature', 'type:enhancement'),
+        pr(3, 'type:cleanup', 'Severity:Minor', 'Severity:Major'),
+        pr(4, 'docs'),
+    ], 'merged', TABLES))
+    assert rows == [
+        ('merged_fixes', [1, 'PR 1', 'Bug Fix', 'Critical'], (2, 1)),
+        ('merged_features', [2, 'PR 2', 'New Feature', '-'], (1, 2)),
+        ('merged_features', [2, 'PR 2', 'Enhancement', '-'], (2, 2)),
+        ('merged_fixes', [3, 'PR 3', 'Bug Fix', 'unmatched'], (99, 3)),
+        ('dontknow', [4, 'PR 4'], 4),
+    ]
+
+
+def test_open_prs_and_required_tables():
+    classifier = classify.default()
+    assert classifier.rows(pr(1, 'wip', 'type:bug'), 'open', TABLES) == \
+        [('wip_features', [1, 'PR 1', '-', '-'], (1, 1))]
+    assert classifier.rows(pr(2, 'type:bug'), 'open', TABLES) == []
+    assert classifier.rows(pr(3, 'type:bug'), 'merged', str(['merged_features'])) == []
+
+
+def test_reverted_prs_are_skipped():
+    prs = [pr(1, 'type:bug', merge_commit_sha='a' * 40), pr(2, 'type:bug', merge_commit_sha='b' * 40)]
+    rows = list(classify.default().classify(prs, 'merged', TABLES, {'a' * 40}))
+    assert [row[1][0] for row in rows] == [2]
+
+
+def test_rules_file():
+    classifier = classify.load(RULES_EXAMPLE, ['wip_features', 'merged_fixes', 'merged_features', 'dontknow'])
+    assert classifier.rows(pr(1, 'type:experimental-feature'), 'merged', TABLES) == \
+        [('merged_features', [1, 'PR 1', 'Experimental Feature', '-'], (3, 1))]
+
+
+def test_unknown_section_is_refused():
+    with pytest.raises(ValueError):
+        classify.Classifier({'rules': [{'section': 'nope', 'labels': ['x'], 'type': 'X'}]}, ['dontknow'])
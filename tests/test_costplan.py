@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import pytest
+
+from lib import costplan
+
+RESET = 1700000000
+
+
+def limits(core=5000, search=30, graphql=5000, limit=None, reset=RESET):
+    remaining = {'core': core, 'search': search, 'graphql': graphql}
+    return dict((resource, {'limit': limit or max(left, 5000), 'remaining': left, 'reset': reset + i})
+                for i, (resource, left) in enumerate(sorted(remaining.items())))
+
+
+def test_fetch_calls():
+    counts = {'is:open': 250, 'is:merged': 2500}
+    # 2500 results are split into 4 windows, counting 6 halves
+    assert costplan.fetch_calls('graphql', counts, numbers=150) == {'core': 0, 'search': 0,
+                                                                    'graphql': 2 + 3 + 6 + 4 * 7}
+    assert costplan.fetch_calls('rest', counts, numbers=150) == {'core': 150 + 250 + 2500, 'graphql': 0,
+                                                                 'search': 9 + 6 + 4 * 21}
+
+
+@pytest.mark.parametrize('preferred, kwargs, fetch_mode, wait_until', [
+    # both fit, the preferred one is used
+    ('graphql', {}, 'graphql', None),
+    ('rest', {}, 'rest', None),
+    ('bogus', {}, 'graphql', None),
+    # the preferred one is short, the other one fits
+    ('graphql', {'graphql': 2}, 'rest', None),
+    ('rest', {'core': 100}, 'graphql', None),
+    # neither fits now, wait for the reset of the resource that is short, core resets first
+    ('graphql', {'graphql': 2, 'core': 100}, 'rest', RESET),
+    ('rest', {'graphql': 2, 'core': 100}, 'rest', RESET),
+    # neither fits a full budget either
+    ('rest', {'graphql': 2, 'core': 100, 'limit': 2}, 'rest', None),
+])
+def test_choose(preferred, kwargs, fetch_mode, wait_until):
+    run_plan = costplan.RunPlan({'is:open': 250}, 0, limits(**kwargs), preferred)
+    assert (run_plan.fetch_mode, run_plan.wait_until) == (fetch_mode, wait_until)
+
+
+def test_choose_waits_for_the_earliest_reset():
+    # rest is short of core, graphql of graphql, whichever resets first is waited for
+    late_core = limits(core=100, graphql=2)
+    late_core['core']['reset'] = RESET + 100
+    run_plan = costplan.RunPlan({'is:open': 250}, 0, late_core, 'rest')
+    assert (run_plan.fetch_mode, run_plan.wait_until) == ('graphql', RESET + 1)
+    late_graphql = limits(core=100, graphql=2)
+    late_graphql['graphql']['reset'] = RESET + 100
+    run_plan = costplan.RunPlan({'is:open': 250}, 0, late_graphql, 'graphql')
+    assert (run_plan.fetch_mode, run_plan.wait_until) == ('rest', RESET)
+
+
+def test_label_writes_count_against_core():
+    run_plan = costplan.RunPlan({'is:open': 250}, 250, limits(core=200), 'graphql')
+    assert run_plan.estimates['graphql']['core'] == 250
+    assert (run_plan.fetch_mode, run_plan.wait_until) == ('graphql', RESET)
+
+
+def test_nothing_to_fetch_or_no_rate_limit():
+    run_plan = costplan.RunPlan({'is:open': 0}, 0, limits(core=0, search=0, graphql=0), 'rest')
+    assert (run_plan.fetch_mode, run_plan.strategy, run_plan.wait_until) == (None, 'cached', None)
+    run_plan = costplan.RunPlan({'is:open': 0}, 0, None, 'rest', numbers=3)
+    assert (run_plan.fetch_mode, run_plan.wait_until) == ('rest', None)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import acs_daemon
+from lib import prstore
+from lib import webhook
+
+REPO = 'apache/cloudstack'
+SINCE = '2024-01-01'
+TABLES = str(['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs'])
+NOW = datetime.now().replace(microsecond=0)
+
+
+class Windows:
+    """
+    Every merged PR landed on the one branch
+    """
+
+    def branches_of(self, pr):
+        return ['main']
+
+
+def pull(number, state='open', labels=(), draft=False, merged=False, age_days=10, updated=None):
+    created = NOW - timedelta(days=age_days)
+    return {'number': number, 'title': 'PR %s' % number, 'body': '- [x] Bug fix (non-breaking change)',
+            'labels': [{'name': l} for l in labels], 'draft': draft, 'state': 'closed' if merged else state,
+            'merged': merged,
+            'created_at': prstore.format_date(created), 'updated_at': prstore.format_date(updated or created),
+            'merged_at': prstore.format_date(NOW) if merged else None,
+            'merge_commit_sha': '%040x' % number if merged else None, 'base': {'ref': 'main'},
+            'user': {'login': 'someone'}}
+
+
+def delivery(event, action, **payload):
+    payload.update(action=action, repository={'full_name': REPO})
+    return {'event': event, 'payload': payload}
+
+
+@pytest.fixture
+def live(tmp_path):
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), REPO)
+    live = acs_daemon.LiveReports(None, ['main'], SINCE, {'main': set()}, {}, Windows(), store,
+                                  str(tmp_path / 'prs.txt'), str(tmp_path / 'labels.txt'), TABLES, False, 'token',
+                                  2, 'table', 60, str(tmp_path / 'mirror'), 'sha', None)
+    # a merge would fetch the mirror for new reverts, there are none here
+    live.update_reverts = lambda pr: set()
+    prs = [webhook.record_from_pull_request(pull(1, labels=['wip', 'type:bug'], draft=True)),
+           webhook.record_from_pull_request(pull(2, labels=['type:bug'])),
+           webhook.record_from_pull_request(pull(3, labels=['wip'], age_days=400))]
+    store.upsert(prs)
+    live.load(prs)
+    yield live
+    store.close()
+
+
+def replay(live, tmp_path, deliveries):
+    """
+    Apply recorded deliveries one at a time, returns the sections rendered for each
+    """
+    path = tmp_path / 'deliveries.jsonl'
+    path.write_text(''.join(json.dumps(d) + '\n' for d in deliveries))
+    rendered = []
+    for event, payload in webhook.read_recorded(str(path)):
+        live.handle(event, payload)
+        rendered.append(sorted(live.dirty, key=lambda entry: (entry[0] or '', entry[1])))
+        assert live.render() == len(rendered[-1])
+    return rendered
+
+
+def report(live):
+    return dict((name, sorted(rows)) for name, rows in live.report_rows['main'].items() if rows)
+
+
+def test_replay_renders_only_the_sections_events_change(live, tmp_path):
+    assert report(live) == {'wip_features': [1, 3], 'old_prs': [3]}
+    rendered = replay(live, tmp_path, [
+        delivery('pull_request', 'opened', pull_request=pull(4, labels=['wip'], updated=NOW + timedelta(seconds=1))),
+        # a new title only changes the rows PR 4 is in
+        delivery('pull_request', 'edited',
+                 pull_request=dict(pull(4, labels=['wip'], updated=NOW + timedelta(seconds=2)), title='Renamed')),
+        delivery('pull_request', 'labeled', pull_request=pull(2, labels=['type:bug', 'type:enhancement'],
+                                                              updated=NOW + timedelta(seconds=3))),
+        delivery('pull_request', 'closed', pull_request=pull(1, labels=['wip', 'type:bug'], merged=True,
+                                                             updated=NOW + timedelta(seconds=4))),
+        delivery('pull_request', 'closed', pull_request=pull(2, state='closed', updated=NOW + timedelta(seconds=5))),
+    ])
+    assert rendered == [
+        [(None, 'labels_added'), ('main', 'wip_features')],
+        [(None, 'labels_added'), ('main', 'wip_features')],
+        # PR 2 has no report rows and its type label still matches
+        [],
+        [('main', 'merged_fixes'), ('main', 'wip_features')],
+        # a closed PR leaves the window
+        [(None, 'labels_matched')],
+    ]
+    assert report(live) == {'wip_features': [3, 4], 'old_prs': [3], 'merged_fixes': [1]}
+    assert [row[1] for row, key in live.report_rows['main']['wip_features'][4]] == ['Renamed']
+    assert live.store.get(2)['state'] == 'closed'
+    with open(live.report_files['main']) as report_file:
+        text = report_file.read()
+    assert 'Renamed' in text and 'PR 2' not in text
+
+
+def test_label_events_relabel_the_prs_with_the_label(live, tmp_path):
+    rendered = replay(live, tmp_path, [
+        delivery('label', 'created', label={'name': 'needs-review'}),
+        delivery('label', 'edited', label={'name': 'work-in-progress'}, changes={'name': {'from': 'wip'}}),
+        delivery('label', 'deleted', label={'name': 'type:bug'}),
+    ])
+    assert rendered[0] == []
+    # PR 1 and 3 lose their wip rows, 1 is a draft without the wip label now
+    assert ('main', 'wip_features') in rendered[1] and ('main', 'old_prs') in rendered[1]
+    assert report(live) == {}
+    assert [live.store.get(n)['labels'] for n in (1, 2, 3)] == [['work-in-progress'], [], ['work-in-progress']]
+
+
+def test_older_deliveries_are_skipped(live):
+    stale = pull(2, labels=[], updated=NOW - timedelta(days=30))
+    assert live.handle('pull_request', {'action': 'unlabeled', 'pull_request': stale}) == 0
+    assert live.store.get(2)['labels'] == ['type:bug']
+    assert live.dirty == set()
+
+
+def test_refuses_to_listen_without_a_secret():
+    with pytest.raises(SystemExit):
+        acs_daemon.main({'--gh_token': 'token', '--prev_release_commit_sha': 'abc'})
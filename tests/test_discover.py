@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from datetime import datetime
+
+import pytest
+
+from lib import discover
+from lib import prstore
+
+
+def commit(title, message='', sha='a' * 40):
+    return {'hash': sha, 'title': title, 'message': message, 'date': datetime(2024, 2, 1), 'parents': []}
+
+
+@pytest.mark.parametrize('title, message, pr', [
+    ('Merge pull request #123 from someone/fix-vm', 'Fix the VM start\n\nDetails', (123, 'Fix the VM start')),
+    ('Fix the VM start (#124)', '', (124, 'Fix the VM start')),
+    ('Fix the VM start (#125)  ', '', (125, 'Fix the VM start')),
+    # a PR number that isn't at the end is a reference, not a squash merge
+    ('Follow up to (#126) for volumes', '', None),
+    ('Merge branch \'4.19\' into main', '', None),
+    ('Revert "Fix the VM start (#124)"', '', None),
+    ('Fix the VM start', '', None),
+])
+def test_pr_of_commit(title, message, pr):
+    assert discover.pr_of_commit(commit(title, message)) == pr
+
+
+def test_merged_prs_keeps_the_newest_merge_of_a_pr():
+    found = discover.merged_prs([commit('Redo (#7)', sha='b' * 40), commit('Do (#7)', sha='c' * 40),
+                                 commit('Merge pull request #8 from x/y', 'Other', sha='d' * 40),
+                                 commit('Unrelated')])
+    assert found == {7: {'title': 'Redo', 'merge_commit_sha': 'b' * 40, 'merged_at': datetime(2024, 2, 1)},
+                     8: {'title': 'Other', 'merge_commit_sha': 'd' * 40, 'merged_at': datetime(2024, 2, 1)}}
+
+
+def build_repo(path, titles):
+    """
+    A bare repo with a release commit then one commit per title on main, returns the release SHA
+    """
+    pygit2 = pytest.importorskip('pygit2')
+    repo = pygit2.init_repository(str(path), bare=True)
+    tree = repo.TreeBuilder().write()
+    signature = pygit2.Signature('Someone', 'someone@example.com', 1700000000, 0)
+    parent = repo.create_commit(None, signature, signature, 'Release\n', tree, [])
+    release = str(parent)
+    for title in titles:
+        parent = repo.create_commit(None, signature, signature, title + '\n', tree, [parent])
+    repo.create_reference('refs/heads/main', parent)
+    return repo, release
+
+
+def merged(number):
+    return {'number': number, 'title': 'PR %s' % number, 'body': '', 'body_hash': prstore.body_hash(''),
+            'labels': [], 'draft': False, 'state': 'merged', 'created_at': datetime(2024, 1, 1),
+            'updated_at': datetime(2024, 2, 1), 'merged_at': datetime(2024, 2, 1), 'merge_commit_sha': None,
+            'base_ref': 'main', 'author': 'someone'}
+
+
+def test_numbers_to_fetch_skips_the_merged_prs_in_the_store(tmp_path):
+    repo, release = build_repo(tmp_path / 'repo.git',
+                               ['One (#1)', 'Two (#2)', 'Docs', 'Merge pull request #3 from x/y'])
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), 'apache/cloudstack')
+    store.upsert([merged(2)])
+    assert discover.numbers_to_fetch(store, repo, ['main'], release) == [1, 3]
+    store.close()
+
+
+def test_numbers_to_fetch_searches_when_no_commit_names_a_pr(tmp_path):
+    repo, release = build_repo(tmp_path / 'repo.git', ['Rebased one', 'Rebased two'])
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), 'apache/cloudstack')
+    assert discover.numbers_to_fetch(store, repo, ['main'], release) is None
+    # an empty window has nothing to fetch
+    repo, release = build_repo(tmp_path / 'empty.git', [])
+    assert discover.numbers_to_fetch(store, repo, ['main'], release) == []
+    store.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from lib import graphql
+from lib import prstore
+from lib import standin
+
+
+def record(number, state='open', labels=()):
+    created = datetime(2023, 6, 1) + timedelta(hours=number)
+    merged_at = created + timedelta(days=1) if state == 'merged' else None
+    return {'number': number, 'title': 'PR %s' % number, 'body': 'Body of %s' % number,
+            'body_hash': prstore.body_hash('Body of %s' % number), 'labels': list(labels), 'draft': False,
+            'state': state, 'created_at': created, 'updated_at': merged_at or created, 'merged_at': merged_at,
+            'merge_commit_sha': '%040x' % number if merged_at else None, 'base_ref': 'main', 'author': 'someone'}
+
+
+@pytest.fixture
+def server():
+    # 250 PRs, every third one merged, so searches and fetches span three 100 PR pages
+    server = standin.start(prs=[record(n, 'merged' if n % 3 == 0 else 'open', ['type:bug'] if n % 2 else [])
+                                for n in range(1, 251)])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_prs_pages_through_the_results(server):
+    records = list(graphql.search_prs(server.url, 'token', 'repo:apache/cloudstack is:pr is:open'))
+    assert [r['number'] for r in records] == [n for n in range(1, 251) if n % 3]
+    assert server.endpoints['graphql'] == 2
+
+    server.reset_counts()
+    records = list(graphql.search_prs(server.url, 'token', 'repo:apache/cloudstack is:pr'))
+    assert len(records) == 250
+    assert server.endpoints['graphql'] == 3
+    assert records[2] == server.prs[3]
+    assert records[0]['labels'] == ['type:bug'] and records[1]['labels'] == []
+
+
+def test_fetch_prs_batches_numbers_and_skips_missing_ones(server):
+    # 300 and up aren't PRs, Github answers those aliases with null and a NOT_FOUND error
+    numbers = list(range(1, 251, 2)) + [300, 301] + list(range(2, 201, 2))
+    records = list(graphql.fetch_prs(server.url, 'token', 'apache/cloudstack', numbers))
+    assert [r['number'] for r in records] == [n for n in numbers if n < 300]
+    assert records == [server.prs[n] for n in numbers if n < 300]
+    assert server.endpoints['graphql'] == 3
+
+
+def test_not_found_only_passes_with_missing_ok(server):
+    query = graphql.PULLS_QUERY % (graphql.PULL_ALIAS % (300, 300, graphql.PR_FIELDS))
+    variables = {'owner': 'apache', 'name': 'cloudstack'}
+    assert graphql.post(server.url, 'token', query, variables, missing_ok=True) == {'repository': {'pr300': None}}
+    with pytest.raises(graphql.GraphQLError):
+        graphql.post(server.url, 'token', query, variables)
+
+
+def test_count_prs_costs_one_request(server):
+    assert graphql.count_prs(server.url, 'token', 'repo:apache/cloudstack is:pr is:merged') == 83
+    assert server.endpoints['graphql'] == 1
+
+
+@pytest.mark.parametrize('api_url, url', [
+    ('https://api.github.com', 'https://api.github.com/graphql'),
+    ('https://api.github.com/', 'https://api.github.com/graphql'),
+    ('https://github.example.com/api/v3', 'https://github.example.com/api/graphql'),
+    ('https://github.example.com/api/v3/', 'https://github.example.com/api/graphql'),
+])
+def test_graphql_url(api_url, url):
+    assert graphql.graphql_url(api_url) == url
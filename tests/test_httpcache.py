@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import threading
+
+import pytest
+
+from lib import httpcache
+from lib import metrics
+from lib import standin
+
+
+@pytest.fixture
+def server():
+    server = standin.start(repo_name='apache/cloudstack')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def requester(monkeypatch):
+    """
+    Put PyGithub's request function back after each test
+    """
+    from github.Requester import Requester
+    monkeypatch.setattr(Requester, 'requestJson', Requester.requestJson)
+    return Requester
+
+
+def test_revalidates_with_conditional_requests(server, requester, tmp_path):
+    from github import Github
+    metrics.start('test')
+    metrics.instrument_pygithub()
+    cache = httpcache.install(httpcache.HTTPCache(str(tmp_path / 'cache.db'), 'token'))
+    # a second run in the same process doesn't wrap the cache in the metrics again
+    metrics.instrument_pygithub()
+    assert requester.requestJson.instrumented
+
+    for _ in range(3):
+        repo = Github('token', base_url=server.url).get_repo('apache/cloudstack')
+        assert repo.full_name == 'apache/cloudstack'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    # the 304s don't count against the rate limit, and each request is recorded once
+    assert server.remaining['core'] == standin.RATE_LIMIT - 1
+    assert sum(entry['count'] for entry in metrics.current.requests.values()) == 3
+
+    # another token doesn't share the entries
+    other = httpcache.install(httpcache.HTTPCache(str(tmp_path / 'cache.db'), 'other'))
+    Github('other', base_url=server.url).get_repo('apache/cloudstack')
+    assert (other.stats()['hits'], other.stats()['entries']) == (0, 2)
+    cache.close()
+    other.close()
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+def test_evicts_the_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(httpcache, 'time', Clock())
+    cache = httpcache.HTTPCache(str(tmp_path / 'cache.db'), 'token', max_bytes=300)
+    for name in 'abc':
+        cache.put(cache.key('', '/' + name), {'ETag': '"%s"' % name}, name * 100)
+    cache.touch(cache.key('', '/a'))
+    cache.put(cache.key('', '/d'), {'ETag': '"d"'}, 'd' * 100)
+    assert [name for name in 'abcd' if cache.get(cache.key('', '/' + name))] == ['a', 'c', 'd']
+    assert cache.stats()['evictions'] == 1
+    # without a validator or bigger than the cache, nothing is kept
+    cache.put(cache.key('', '/e'), {}, 'e')
+    cache.put(cache.key('', '/f'), {'ETag': '"f"'}, 'f' * 301)
+    assert cache.stats()['entries'] == 3
+    cache.close()
+
+
+def test_counts_and_writes_under_the_lock(tmp_path):
+    cache = httpcache.HTTPCache(str(tmp_path / 'cache.db'), 'token')
+
+    def request_json(requester, verb, url, parameters, headers, *args, **kwargs):
+        if headers.get('If-None-Match'):
+            return 304, {}, ''
+        return 200, {'ETag': '"%s"' % url}, url
+
+    def worker(n):
+        for i in range(50):
+            assert cache.request(request_json, None, 'GET', '/pulls/%s' % (i % 10)) == (
+                200, {'ETag': '"/pulls/%s"' % (i % 10)}, '/pulls/%s' % (i % 10))
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 8 * 50
+    assert stats['misses'] >= 10 and stats['entries'] == 10
+    cache.close()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import time
+
+import pytest
+
+from lib import hydrate
+
+
+def test_limit_halves_under_pressure_and_grows_back():
+    scheduler = hydrate.RateLimitScheduler(8, min_remaining=50)
+    scheduler.observe({'X-RateLimit-Remaining': '150', 'X-RateLimit-Reset': '0'})
+    assert scheduler.limit == 4
+    scheduler.observe({'X-RateLimit-Remaining': '200'})
+    assert scheduler.limit == 2
+    for limit in (3, 4, 5, 6, 7, 8, 8):
+        scheduler.observe({'x-ratelimit-remaining': '4000'})
+        assert scheduler.limit == limit
+    # never below one worker
+    for _ in range(5):
+        scheduler.throttle()
+    assert scheduler.limit == 1
+    assert scheduler.paused_until == 0
+
+
+def test_pauses_for_the_reset_when_the_budget_runs_out():
+    scheduler = hydrate.RateLimitScheduler(8, min_remaining=50)
+    reset = time.time() + 30
+    scheduler.observe({'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(reset)})
+    assert scheduler.limit == 4
+    # a second past the reset
+    assert reset + 1 <= scheduler.paused_until < reset + 2
+
+
+def test_retry_after_pauses_the_workers():
+    scheduler = hydrate.RateLimitScheduler(4)
+    scheduler.observe({'Retry-After': '0.3', 'X-RateLimit-Remaining': '4000'})
+    assert scheduler.limit == 2
+    started = time.time()
+    scheduler.acquire()
+    assert time.time() - started >= 0.25
+    scheduler.release()
+
+
+class RateLimited(Exception):
+    status = 403
+    headers = {'Retry-After': '0.1'}
+
+
+def test_hydrate_retries_rate_limited_calls_in_order():
+    failed = set()
+
+    def fetch(item):
+        if item % 3 == 0 and item not in failed:
+            failed.add(item)
+            raise RateLimited()
+        return item * 10
+
+    scheduler = hydrate.RateLimitScheduler(4)
+    assert hydrate.hydrate(range(12), fetch, scheduler, lambda result: {}) == [n * 10 for n in range(12)]
+    assert failed == {0, 3, 6, 9}
+    assert scheduler.active == 0
+
+
+def test_other_errors_are_not_retried():
+    class Forbidden(Exception):
+        status = 403
+        headers = {'X-RateLimit-Remaining': '4000'}
+
+    def fetch(item):
+        raise Forbidden()
+
+    with pytest.raises(Forbidden):
+        hydrate.hydrate([1], fetch, hydrate.RateLimitScheduler(1), lambda result: {})
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from lib import labelplan
+
+
+def pr(number, *labels):
+    return {'number': number, 'labels': list(labels)}
+
+
+def test_only_real_changes_are_written():
+    plan = labelplan.LabelPlan()
+    plan.add(pr(1, 'type:bug'), 'type:bug')
+    plan.remove(pr(2, 'wip'), 'age:1year_plus')
+    plan.add(pr(3, 'wip'), 'type:enhancement')
+    plan.remove(pr(4, 'wip', 'type:bug'), 'wip')
+    assert plan.changes() == [(3, ['type:enhancement', 'wip'], ['type:enhancement'], []),
+                              (4, ['type:bug'], [], ['wip'])]
+
+
+def test_last_call_wins():
+    plan = labelplan.LabelPlan()
+    plan.add(pr(1), 'type:bug')
+    plan.remove(pr(1), 'type:bug')
+    plan.remove(pr(2, 'wip'), 'wip')
+    plan.add(pr(2, 'wip'), 'wip')
+    assert plan.changes() == []
+
+
+def test_labels_come_from_the_first_record():
+    plan = labelplan.LabelPlan()
+    plan.add(pr(1, 'wip'), 'type:bug')
+    plan.add(pr(1, 'something else'), 'age:1year_plus')
+    assert plan.changes() == [(1, ['age:1year_plus', 'type:bug', 'wip'], ['age:1year_plus', 'type:bug'], [])]
+
+
+def test_state_keeps_the_intents_and_reads_labels_from_the_records():
+    plan = labelplan.LabelPlan()
+    plan.add(pr(1, 'wip'), 'type:bug')
+    plan.remove(pr(2, 'wip'), 'wip')
+    # someone labelled PR 1 and took wip off PR 2 since
+    resumed = labelplan.LabelPlan.from_state(plan.state(), {1: pr(1, 'wip', 'blocker'), 2: pr(2)})
+    assert resumed.changes() == [(1, ['blocker', 'type:bug', 'wip'], ['type:bug'], [])]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pygit2 = pytest.importorskip('pygit2')
+
+from lib import mirror  # noqa: E402 pygit2 is imported by mirror
+
+START = datetime(2024, 1, 1)
+
+
+class Origin:
+    """
+    Bare repo to mirror, a commit a day on main with the release tagged on day 20 and
+    4.19 branching off at the release
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.url = 'file://' + self.path
+        self.repo = pygit2.init_repository(self.path, bare=True)
+        self.repo.config['uploadpack.allowFilter'] = 'true'
+        self.day = 0
+        parents = []
+        for day in range(40):
+            parents = [self.commit('refs/heads/main', 'Day %s' % day, parents)]
+            if day == 20:
+                self.release = str(parents[0])
+                self.repo.create_reference('refs/tags/4.19.0.0', parents[0])
+                self.repo.create_reference('refs/heads/4.19', parents[0])
+
+    def commit(self, ref, message, parents):
+        self.day += 1
+        when = int((START + timedelta(days=self.day) - datetime(1970, 1, 1)).total_seconds())
+        signature = pygit2.Signature('Someone', 'someone@example.com', when, 0)
+        blob = self.repo.create_blob(message.encode())
+        builder = self.repo.TreeBuilder()
+        builder.insert('file', blob, pygit2.GIT_FILEMODE_BLOB)
+        return self.repo.create_commit(ref, signature, signature, message + '\n', builder.write(), parents)
+
+    def tip(self, branch):
+        return self.repo.lookup_reference(mirror.branch_ref(branch)).target
+
+
+@pytest.fixture
+def origin(tmp_path):
+    return Origin(tmp_path / 'origin.git')
+
+
+def tips(repo, branches):
+    return [repo.lookup_reference(mirror.branch_ref(branch)).target for branch in branches]
+
+
+def test_full_mirror_is_cloned_then_fetched(origin, tmp_path):
+    mirror_dir = str(tmp_path / 'mirror')
+    branches = ['main', '4.19']
+    repo = mirror.ensure_mirror(origin.url, mirror_dir, branches, object_filter=None)
+    assert mirror.partial_filter(repo) is None
+    assert tips(repo, branches) == [origin.tip('main'), origin.tip('4.19')]
+    new = origin.commit('refs/heads/4.19', 'Fix', [origin.tip('4.19')])
+    repo = mirror.ensure_mirror(origin.url, mirror_dir, branches, object_filter=None)
+    assert tips(repo, branches) == [origin.tip('main'), new]
+    assert 'refs/tags/4.19.0.0' in repo.references
+
+
+def test_mirror_of_another_repo_is_cloned_again(origin, tmp_path, capsys):
+    mirror_dir = str(tmp_path / 'mirror')
+    other = Origin(tmp_path / 'other.git')
+    mirror.ensure_mirror(other.url, mirror_dir, 'main', object_filter=None)
+    repo = mirror.ensure_mirror(origin.url, mirror_dir, 'main', object_filter=None)
+    assert 'is not a mirror of %s' % origin.url in capsys.readouterr().out
+    assert tips(repo, ['main']) == [origin.tip('main')]
+    assert mirror.check_mirror(mirror_dir, origin.url, 'main') is not None
+
+
+@pytest.mark.parametrize('release', ['4.19.0.0', 'sha'])
+def test_partial_mirror_reaches_back_to_the_release(origin, tmp_path, release):
+    release = origin.release if release == 'sha' else release
+    mirror_dir = str(tmp_path / 'mirror')
+    branches = ['main', '4.19']
+    repo = mirror.ensure_mirror(origin.url, mirror_dir, branches, release=release)
+    assert mirror.partial_filter(repo) == mirror.DEFAULT_FILTER
+    assert tips(repo, branches) == [origin.tip('main'), origin.tip('4.19')]
+    assert str(mirror.lookup_commit(repo, release).id) == origin.release
+    assert mirror.window_complete(mirror_dir, branches, pygit2.Oid(hex=origin.release))
+    # only the days since the release were fetched
+    assert mirror.shallow_commits(mirror_dir)
+    assert len(list(repo.walk(origin.tip('main')))) < 40
+    new = origin.commit('refs/heads/main', 'Day 40', [origin.tip('main')])
+    repo = mirror.ensure_mirror(origin.url, mirror_dir, branches, release=release)
+    assert tips(repo, ['main']) == [new]
+    assert os.path.isfile(os.path.join(mirror_dir, 'shallow'))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from lib import prstore
+from lib import standin
+
+SINCE = '2024-01-01'
+
+
+def record(number, state='open', labels=(), merged_at=None):
+    created = datetime(2023, 6, 1) + timedelta(days=number)
+    return {'number': number, 'title': 'PR %s' % number, 'body': 'Body of %s' % number,
+            'body_hash': prstore.body_hash('Body of %s' % number), 'labels': list(labels), 'draft': False,
+            'state': state, 'created_at': created, 'updated_at': merged_at or created, 'merged_at': merged_at,
+            'merge_commit_sha': '%040x' % number if merged_at else None, 'base_ref': 'main', 'author': 'someone'}
+
+
+@pytest.fixture
+def server():
+    prs = [record(1, labels=['wip']), record(2, labels=['type:bug']),
+           record(3, 'merged', ['type:bug'], datetime(2024, 2, 1)),
+           record(4, 'merged', ['type:enhancement'], datetime(2024, 3, 1)),
+           # merged before the release window
+           record(5, 'merged', ['type:bug'], datetime(2023, 12, 1)),
+           record(6, 'closed')]
+    server = standin.start(prs=prs)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def searcher(server, store, fetch_mode):
+    from github import Github
+    gh = Github(base_url=server.url)
+    repo = Github(base_url=server.url, lazy=True).get_repo('apache/cloudstack')
+    return prstore.searcher(gh, repo, store, fetch_mode, server.url, 'token')
+
+
+@pytest.mark.parametrize('fetch_mode', ['graphql', 'rest'])
+def test_cold_then_incremental_sync(server, tmp_path, fetch_mode):
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), 'apache/cloudstack')
+    assert prstore.sync(store, SINCE, searcher(server, store, fetch_mode)) == 4
+    assert [pr['number'] for pr in store.open_prs()] == [1, 2]
+    assert [pr['number'] for pr in store.merged_prs(SINCE)] == [3, 4]
+    assert store.get(1)['labels'] == ['wip']
+    assert store.get(3)['merge_commit_sha'] == '%040x' % 3
+
+    # PR 1 gets a label, PR 2 is merged and PR 7 is opened, after the last sync started
+    touched = prstore.parse_date(store.get_meta('watermark'))
+    server.prs[1].update(labels=['wip', 'type:bug'], updated_at=touched)
+    server.prs[2].update(state='merged', merged_at=touched, merge_commit_sha='%040x' % 2, updated_at=touched)
+    server.prs[7] = dict(record(7), updated_at=touched)
+    server.reset_counts()
+    # the next watermark is past the changes
+    time.sleep(1)
+    assert prstore.sync(store, SINCE, searcher(server, store, fetch_mode)) == 3
+    assert [pr['number'] for pr in store.open_prs()] == [1, 7]
+    assert [pr['number'] for pr in store.merged_prs(SINCE)] == [2, 3, 4]
+    assert store.get(1)['labels'] == ['type:bug', 'wip']
+    # one search for the updated PRs, nothing is fetched again and REST gets each changed PR once
+    assert dict((endpoint, count) for endpoint, count in server.endpoints.items()
+                if endpoint not in ('graphql', 'search')) == ({} if fetch_mode == 'graphql' else {'pull': 3})
+
+    server.reset_counts()
+    assert prstore.sync(store, SINCE, searcher(server, store, fetch_mode)) == 0
+
+
+def test_release_moved_back_searches_the_older_merges(server, tmp_path):
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), 'apache/cloudstack')
+    prstore.sync(store, SINCE, searcher(server, store, 'graphql'))
+    assert prstore.sync_queries(store, '2023-11-01')[1] == \
+        'repo:apache/cloudstack is:pr is:merged merged:2023-11-01..%s' % SINCE
+    assert prstore.sync(store, '2023-11-01', searcher(server, store, 'graphql')) == 1
+    assert [pr['number'] for pr in store.merged_prs('2023-11-01')] == [3, 4, 5]
+
+
+def test_mirror_discovery_fetches_by_number_then_searches_all_merges_again(server, tmp_path):
+    from github import Github
+    store = prstore.PRStore(str(tmp_path / 'prs.db'), 'apache/cloudstack')
+    repo = Github(base_url=server.url, lazy=True).get_repo('apache/cloudstack')
+    fetch = prstore.fetcher(repo, 'graphql', server.url, 'token')
+    # the mirror named PR 3 and a number that isn't a PR, PR 4 was merged without its number
+    assert prstore.sync_queries(store, SINCE, merged_search=False) == ['repo:apache/cloudstack is:pr is:open']
+    assert prstore.sync(store, SINCE, searcher(server, store, 'graphql'), fetch, [3, 99]) == 3
+    assert [pr['number'] for pr in store.merged_prs(SINCE)] == [3]
+    assert store.get_meta('pr_discovery') == 'mirror'
+
+    assert prstore.sync_queries(store, SINCE)[1] == 'repo:apache/cloudstack is:pr is:merged merged:>=%s' % SINCE
+    prstore.sync(store, SINCE, searcher(server, store, 'graphql'))
+    assert [pr['number'] for pr in store.merged_prs(SINCE)] == [3, 4]
+    assert store.get_meta('pr_discovery') == 'search'
+    assert len(prstore.sync_queries(store, SINCE)) == 1
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from lib import reach
+
+pygit2 = pytest.importorskip('pygit2')
+
+# commit times, the release then the window commits an hour apart
+START = datetime(2024, 1, 1)
+
+
+def when(hours):
+    return int((START + timedelta(hours=hours) - datetime(1970, 1, 1)).total_seconds())
+
+
+class Repo:
+    """
+    Bare repo in which `old` precedes the release commit, main has `a` and `b` after the
+    release and 4.19 has `c`
+    """
+
+    def __init__(self, path):
+        self.repo = pygit2.init_repository(str(path), bare=True)
+        self.tree = self.repo.TreeBuilder().write()
+        self.old = self.commit('Old', [], 0)
+        self.release = self.commit('Release', [self.old], 1)
+        self.a = self.commit('A (#1)', [self.release], 2)
+        self.b = self.commit('B (#2)', [self.a], 3)
+        self.c = self.commit('C (#3)', [self.release], 4)
+        self.repo.create_reference('refs/heads/main', self.b)
+        self.repo.create_reference('refs/heads/4.19', self.c)
+
+    def commit(self, message, parents, hours):
+        signature = pygit2.Signature('Someone', 'someone@example.com', when(hours), 0)
+        return str(self.repo.create_commit(None, signature, signature, message + '\n', self.tree, parents))
+
+
+def pr(sha, base_ref='main', merged_hours=None):
+    return {'number': 1, 'merge_commit_sha': sha, 'base_ref': base_ref,
+            'merged_at': START + timedelta(hours=merged_hours) if merged_hours is not None else None}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return Repo(tmp_path / 'repo.git')
+
+
+def test_merge_commits_in_the_window(repo):
+    windows = reach.Windows(repo.repo, ['main', '4.19'], repo.release)
+    assert windows.branches_of(pr(repo.a)) == ['main']
+    assert windows.branches_of(pr(repo.c, base_ref='main')) == ['4.19']
+    # merged before the release, or the release commit itself
+    assert windows.branches_of(pr(repo.old)) == []
+    assert windows.branches_of(pr(repo.release)) == []
+
+
+def test_merge_commits_the_mirror_doesnt_have(repo):
+    windows = reach.Windows(repo.repo, ['main', '4.19'], repo.release)
+    missing = 'f' * 40
+    # merged after the tip was committed, the next fetch will bring it
+    assert windows.branches_of(pr(missing, merged_hours=5)) == ['main']
+    assert windows.branches_of(pr(missing, base_ref='4.19', merged_hours=5)) == ['4.19']
+    # merged before the tip and not in the mirror, so it was merged somewhere else
+    assert windows.branches_of(pr(missing, merged_hours=2)) == []
+    assert windows.branches_of(pr(missing, base_ref='feature', merged_hours=5)) == []
+    # without a merge commit or merge date the base branch is all there is to go on
+    assert windows.branches_of(pr(None)) == ['main']
+    assert windows.branches_of(pr(missing)) == ['main']
+
+
+def test_update_adds_the_new_commits(repo):
+    windows = reach.Windows(repo.repo, ['main'], repo.release)
+    d = repo.commit('D (#4)', [repo.b], 5)
+    assert not windows.landed_on(pr(d, merged_hours=4), 'main')
+    repo.repo.references['refs/heads/main'].set_target(d)
+    windows.update(repo.repo)
+    assert windows.landed_on(pr(d, merged_hours=4), 'main')
+    assert windows.landed([pr(repo.a), pr(repo.c), pr(d)]) == {'main': [pr(repo.a), pr(d)]}
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import io
+
+import pytest
+
+from lib import render
+
+# cell text docutils would read as markup if it wasn't escaped
+CELLS = ['-', '+', '* x', '#. x', '1. Fix', '(2) x', 'a) x', 'iv. x', ':field: x', '.. comment', '>>> x',
+         '----', '--option', '|x|', '`x`', 'snake_case', 'back\\slash', '1.5 GB', 'Fix the thing (#123)']
+
+
+def parse_rst(text):
+    core = pytest.importorskip('docutils.core')
+    return core.publish_doctree(text, settings_overrides={'report_level': 5, 'halt_level': 5})
+
+
+def test_rst_table_cells_round_trip():
+    table = render.Table(['PR Number', 'Title'])
+    for n, cell in enumerate(CELLS):
+        table.add_row([str(n), cell])
+    buffer = io.StringIO()
+    report = render.renderer('rst', buffer)
+    report.section('cells', 'Cells', table)
+    report.close()
+
+    doctree = parse_rst(buffer.getvalue())
+    entries = list(doctree.findall(lambda node: node.tagname == 'entry'))
+    assert len(entries) == 2 * (len(CELLS) + 1)
+    for entry in entries:
+        assert [child.tagname for child in entry.children] == ['paragraph']
+    assert [entry.astext() for entry in entries[3::2]] == CELLS
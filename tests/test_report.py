@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import json
+from datetime import datetime, timedelta
+
+import acs_report_prs
+
+TABLES = str(['wip_features', 'merged_fixes', 'merged_features', 'dontknow', 'old_prs'])
+
+
+def pr(number, age_days, *labels):
+    return {'number': number, 'title': 'PR %s' % number, 'labels': list(labels), 'draft': False,
+            'created_at': datetime.now() - timedelta(days=age_days), 'merge_commit_sha': None}
+
+
+def test_old_prs_lists_only_the_old_wip_prs():
+    open_prs = [pr(1, 800, 'wip'), pr(2, 800, 'type:bug'), pr(3, 400, 'wip', 'type:bug'), pr(4, 400),
+                pr(5, 10, 'wip')]
+    sections = {}
+    for p in open_prs:
+        for section, row, sort_key in acs_report_prs.open_pr_rows(p, TABLES):
+            sections.setdefault(section, []).append(row[0])
+    assert sections == {'wip_features': [1, 3, 5], 'old_prs': [1, 3]}
+
+
+def test_report_old_prs_section(tmp_path):
+    output_file = str(tmp_path / 'prs.json')
+    acs_report_prs.write_report(output_file, [pr(1, 800, 'wip'), pr(2, 800), pr(3, 400, 'wip'), pr(4, 400)],
+                                [], set(), TABLES, 60, output_format='json')
+    with open(output_file) as file:
+        sections = dict((section['name'], section) for section in json.load(file)['sections'])
+    assert [row[0] for row in sections['wip_features']['rows']] == [1, 3]
+    assert sections['old_prs']['rows'] == [[3, 'PR 3', 'Old PR', 'Add label age:1year_plus'],
+                                           [1, 'PR 1', 'Very old PR', 'Add label age:2years_plus']]
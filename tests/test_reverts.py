@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from lib import reverts
+
+A, B, C, D = ('a' * 40, 'b' * 40, 'c' * 40, 'd' * 40)
+
+
+def revert(sha, reverted, short=False):
+    message = 'Revert "..."\n\nThis reverts commit %s.\n' % (reverted[:10] if short else reverted)
+    return {'hash': sha, 'message': message}
+
+
+def test_revert():
+    index = reverts.build([revert(B, A)])
+    assert A in index
+    assert B not in index
+
+
+def test_revert_of_a_revert_puts_the_change_back():
+    index = reverts.build([revert(C, B), revert(B, A)])
+    assert A not in index
+    assert B in index
+    assert C not in index
+
+
+def test_revert_revert_revert():
+    index = reverts.build([revert(D, C), revert(C, B), revert(B, A)])
+    assert A in index
+    assert B not in index
+    assert C in index
+    assert D not in index
+
+
+def test_any_live_revert_counts():
+    # B was reverted, but E reverts A again
+    index = reverts.build([revert(C, B), revert(B, A), revert('e' * 40, A)])
+    assert A in index
+
+
+def test_abbreviated_shas_match_by_prefix():
+    index = reverts.build([revert(C, B, short=True), revert(B, A, short=True)])
+    assert A not in index
+    assert B in index
+
+
+def test_reverts_outside_the_window():
+    # the commit B reverts is older than the window, and the revert of C is newer
+    index = reverts.build([revert(B, A), revert(C, 'f' * 40)])
+    assert A in index
+    assert 'f' * 40 in index
+    assert C not in index
+    assert not index.is_reverted(None)
+
+
+def test_resolve_from_saved_reverters():
+    index = reverts.build([revert(D, C), revert(C, B), revert(B, A)])
+    assert reverts.RevertIndex(index.reverters).reverted == index.reverted
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from lib import prstore
+from lib import shards
+
+NOW = datetime(2024, 6, 1)
+START = datetime(2024, 1, 1)
+
+
+def counter(dates):
+    """
+    A search count over PRs merged at `dates`
+    """
+    def count(search_string):
+        found = shards.date_range(search_string, NOW)
+        if not found:
+            return len(dates)
+        qualifier, start, end = found
+        return len([date for date in dates if start <= date <= end])
+    return count
+
+
+def windows_of(searches):
+    return [shards.date_range(search, NOW)[1:] for search in searches]
+
+
+def test_under_the_cap_is_one_search():
+    count = counter([START] * 10)
+    assert shards.plan('repo:a/b is:pr merged:>=2024-01-01', count, NOW, cap=11) == \
+        ['repo:a/b is:pr merged:>=2024-01-01']
+
+
+def test_windows_cover_the_range_once():
+    dates = [START + timedelta(hours=7 * n) for n in range(500)]
+    count = counter(dates)
+    searches = shards.plan('repo:a/b is:pr merged:>=2024-01-01', count, NOW, workers=1, cap=100)
+    assert len(searches) > 1
+    assert all(count(search) < 100 for search in searches)
+    assert sum(count(search) for search in searches) == len(dates)
+    windows = sorted(windows_of(searches))
+    for (low, high), (next_low, next_high) in zip(windows, windows[1:]):
+        assert next_low > high
+    assert all(search.startswith('repo:a/b is:pr merged:') for search in searches)
+
+
+def test_dates_on_the_boundaries():
+    # the first split is at the middle of the range, put PRs on it and a second either side
+    middle = START + (NOW - START) / 2
+    dates = [middle - timedelta(seconds=1), middle, middle + timedelta(seconds=1)] * 4
+    count = counter(dates)
+    searches = shards.plan('repo:a/b is:pr merged:2024-01-01..2024-05-31', count, NOW, workers=1, cap=10)
+    assert sum(count(search) for search in searches) == len(dates)
+
+
+def test_search_without_a_range_is_split_on_created():
+    dates = [START + timedelta(days=n) for n in range(30)]
+    searches = shards.plan('repo:a/b is:pr is:open', counter(dates), NOW, workers=1, cap=10)
+    assert all('created:' in search for search in searches)
+
+
+def test_window_over_the_cap_is_kept_when_it_cant_be_split():
+    dates = [START] * 20
+    searches = shards.plan('repo:a/b is:pr merged:>=2024-01-01', counter(dates), NOW, workers=1, cap=10)
+    assert len(searches) == 1
+    low, high = windows_of(searches)[0]
+    assert low <= START <= high
+
+
+class Issue:
+
+    def __init__(self, number):
+        self.number = number
+        self.updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class Github:
+
+    def search_issues(self, search_string):
+        return [Issue(n) for n in range(40)]
+
+
+class Store:
+
+    def updated_at(self, number):
+        return None
+
+
+class Repo:
+    """
+    Records how many get_pull calls run at once
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def get_pull(self, number):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return number
+
+
+def test_windows_share_one_get_pull_pool(monkeypatch):
+    monkeypatch.setattr(prstore, 'record_from_pull', lambda number: {'number': number, 'updated_at': None})
+    repo = Repo()
+    # 5000 results are split into two windows of 900, which run their searches in parallel
+    counts = iter([5000] + [900] * 100)
+    search = shards.sharded(prstore.rest_searcher(Github(), repo, Store(), 8), lambda search_string: next(counts))
+    assert len(search('repo:a/b is:pr is:open')) == 40
+    # one pool of 8 for both windows, not 8 each
+    assert 1 < repo.peak <= 8
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from datetime import datetime
+
+import pytest
+
+pygit2 = pytest.importorskip('pygit2')
+
+from lib import tags  # noqa: E402 pygit2 is imported by tags
+
+
+def when(value):
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = pygit2.init_repository(str(tmp_path / 'repo.git'), bare=True)
+    tree = repo.TreeBuilder().write()
+    signature = pygit2.Signature('Someone', 'someone@example.com', when(datetime(2024, 1, 1, 12)), 0)
+    repo.release = repo.create_commit('refs/heads/main', signature, signature, 'Release\n', tree, [])
+    tagger = pygit2.Signature('Tagger', 'tagger@example.com', when(datetime(2024, 2, 1)), 0)
+    repo.create_tag('4.19.0.0', repo.release, pygit2.GIT_OBJECT_COMMIT, tagger, '4.19.0.0\n')
+    repo.create_reference('refs/tags/4.19.0.1', repo.release)
+    repo.create_tag('tree-tag', tree, pygit2.GIT_OBJECT_TREE, tagger, 'tree\n')
+    return repo
+
+
+def test_tags_peel_to_their_commit(repo):
+    index = tags.build(repo)
+    release = (str(repo.release), datetime(2024, 1, 1, 12))
+    # annotated tags resolve to the commit, and its author date rather than the tagger's
+    assert index.resolve('4.19.0.0') == release
+    assert index.resolve('4.19.0.1') == release
+    assert index.resolve('tree-tag') is None
+    assert index.resolve('4.20.0.0') is None
+    assert len(index) == 2
+
+
+def test_only_moved_tags_are_peeled_again(repo, tmp_path):
+    mirror_dir = str(tmp_path)
+    index = tags.load(repo, mirror_dir)
+    cached = tags.TagIndex(dict(index.tags, **{'4.19.0.0': dict(index.tags['4.19.0.0'], sha='cached')}))
+    assert tags.build(repo, cached).resolve('4.19.0.0')[0] == 'cached'
+    repo.references['refs/tags/4.19.0.1'].delete()
+    tree = repo.TreeBuilder().write()
+    signature = pygit2.Signature('Someone', 'someone@example.com', when(datetime(2024, 3, 1)), 0)
+    fix = repo.create_commit('refs/heads/main', signature, signature, 'Fix\n', tree, [repo.release])
+    repo.create_reference('refs/tags/4.19.0.1', fix)
+    index = tags.load(repo, mirror_dir)
+    assert index.resolve('4.19.0.1') == (str(fix), datetime(2024, 3, 1))
+    assert tags.load(repo, mirror_dir).tags == index.tags
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import json
+import queue
+import urllib.error
+import urllib.request
+
+import pytest
+
+from lib import webhook
+
+REPO = 'apache/cloudstack'
+SECRET = 'secret'
+
+
+def test_verify():
+    body = b'{"action": "opened"}'
+    assert webhook.verify(SECRET, body, webhook.signature(SECRET, body))
+    assert not webhook.verify(SECRET, body, webhook.signature('other', body))
+    assert not webhook.verify(SECRET, body + b' ', webhook.signature(SECRET, body))
+    assert not webhook.verify(SECRET, body, None)
+    # never without a secret, even if the delivery is signed with an empty one
+    assert not webhook.verify('', body, webhook.signature('', body))
+    assert not webhook.verify(None, body, webhook.signature('', body))
+
+
+def test_for_repo():
+    assert webhook.for_repo({'repository': {'full_name': REPO}}, REPO)
+    assert webhook.for_repo({'repository': {'full_name': 'Apache/CloudStack'}}, REPO)
+    assert not webhook.for_repo({'repository': {'full_name': 'someone/cloudstack'}}, REPO)
+    assert not webhook.for_repo({}, REPO)
+
+
+def test_start_requires_a_secret():
+    with pytest.raises(ValueError):
+        webhook.start('127.0.0.1', 0, '', queue.Queue(), REPO)
+
+
+@pytest.fixture
+def server():
+    server = webhook.start('127.0.0.1', 0, SECRET, queue.Queue(), REPO)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def deliver(server, event, payload, secret=SECRET):
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'X-GitHub-Event': event, 'Content-Type': 'application/json'}
+    if secret is not None:
+        headers['X-Hub-Signature-256'] = webhook.signature(secret, body)
+    request = urllib.request.Request('http://127.0.0.1:%s/' % server.server_address[1], data=body, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_deliveries(server):
+    payload = {'action': 'deleted', 'label': {'name': 'wip'}, 'repository': {'full_name': REPO}}
+    assert deliver(server, 'label', payload) == 202
+    assert server.events.get_nowait() == ('label', payload)
+
+    assert deliver(server, 'label', payload, secret=None) == 401
+    assert deliver(server, 'label', payload, secret='other') == 401
+    assert deliver(server, 'label', dict(payload, repository={'full_name': 'someone/cloudstack'})) == 403
+    # answered but not queued
+    assert deliver(server, 'ping', {'zen': 'Keep it simple.', 'repository': {'full_name': REPO}}) == 202
+    assert deliver(server, 'push', payload) == 202
+    assert server.events.empty()